@@ -14,7 +14,8 @@ import numpy as np
 from typing import Dict, List, Optional, Any
 from collections import Counter
 
-from preprocessing.data_preprocessor import load_data_from_db, preprocess_product_data
+from preprocessing.data_preprocessor import preprocess_product_data
+from preprocessing.snapshot import load_products
 
 
 def calculate_statistics(df: pd.DataFrame) -> Dict[str, Any]:
@@ -86,38 +87,56 @@ def category_analysis(df: pd.DataFrame) -> Dict[str, Any]:
     return analysis
 
 
-def characteristics_analysis(df: pd.DataFrame) -> Dict[str, Any]:
-    """Анализ характеристик товаров."""
+def characteristics_analysis(
+    df: pd.DataFrame, attributes: Optional[pd.DataFrame] = None
+) -> Dict[str, Any]:
+    """
+    Анализ характеристик товаров.
+
+    Каждая строка разбирается один раз: значения считаются Counter по
+    ключу, а покрытие ключа — это число его значений (в строке ключ
+    встречается не больше раза).
+
+    attributes — уже разложенные характеристики (product_id, key, value),
+    например load_attribute_values(); тогда JSON не разбирается вовсе.
+    Пустые значения в product_attributes не хранятся.
+    """
+    if attributes is not None:
+        return _attributes_analysis(attributes, len(df))
+
     analysis = {}
     
     if 'characteristics' not in df.columns:
         return analysis
     
-    # Собираем все характеристики
-    all_chars = {}
+    # Один проход: счетчики значений по ключам
+    counters: Dict[str, Counter] = {}
     for char_str in df['characteristics'].dropna():
-        try:
-            char_dict = json.loads(char_str) if isinstance(char_str, str) else char_str
-            if isinstance(char_dict, dict):
-                for key, value in char_dict.items():
-                    if key not in all_chars:
-                        all_chars[key] = []
-                    all_chars[key].append(str(value))
-        except:
-            pass
+        if isinstance(char_str, str):
+            try:
+                char_dict = json.loads(char_str)
+            except ValueError:
+                continue
+        else:
+            char_dict = char_str
+        if not isinstance(char_dict, dict):
+            continue
+        for key, value in char_dict.items():
+            counter = counters.get(key)
+            if counter is None:
+                counter = counters[key] = Counter()
+            counter[str(value)] += 1
     
     # Анализ наиболее частых значений
-    analysis['most_common_characteristics'] = {}
-    for key, values in all_chars.items():
-        counter = Counter(values)
-        analysis['most_common_characteristics'][key] = dict(counter.most_common(10))
+    analysis['most_common_characteristics'] = {
+        key: dict(counter.most_common(10)) for key, counter in counters.items()
+    }
     
     # Статистика по характеристикам
     analysis['characteristics_coverage'] = {}
     total_products = len(df)
-    for key in all_chars.keys():
-        count = sum(1 for char_str in df['characteristics'].dropna() 
-                   if _has_characteristic(char_str, key))
+    for key, counter in counters.items():
+        count = sum(counter.values())
         analysis['characteristics_coverage'][key] = {
             'count': count,
             'percentage': (count / total_products * 100) if total_products > 0 else 0
@@ -126,15 +145,27 @@ def characteristics_analysis(df: pd.DataFrame) -> Dict[str, Any]:
     return analysis
 
 
-def _has_characteristic(char_str: Any, key: str) -> bool:
-    """Проверка наличия характеристики."""
-    try:
-        char_dict = json.loads(char_str) if isinstance(char_str, str) else char_str
-        if isinstance(char_dict, dict):
-            return key in char_dict
-    except:
-        pass
-    return False
+def _attributes_analysis(attributes: pd.DataFrame, total_products: int) -> Dict[str, Any]:
+    """characteristics_analysis по разложенным характеристикам (value_counts)."""
+    # sort=False и стабильная сортировка: при равных частотах — порядок появления
+    counts = attributes.groupby(['key', 'value'], sort=False).size()
+    top = counts.sort_values(ascending=False, kind='stable').groupby(level=0, sort=False).head(10)
+    coverage = attributes.groupby('key', sort=False).size()
+
+    most_common: Dict[str, Dict[str, int]] = {key: {} for key in coverage.index}
+    for (key, value), count in top.items():
+        most_common[key][str(value)] = int(count)
+
+    return {
+        'most_common_characteristics': most_common,
+        'characteristics_coverage': {
+            key: {
+                'count': int(count),
+                'percentage': (count / total_products * 100) if total_products > 0 else 0,
+            }
+            for key, count in coverage.items()
+        },
+    }
 
 
 def generate_insights(df: pd.DataFrame) -> List[str]:
@@ -171,7 +202,7 @@ def generate_insights(df: pd.DataFrame) -> List[str]:
 def analyze_products(df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
     """Комплексный анализ продуктов."""
     if df is None:
-        df = load_data_from_db()
+        df = load_products()
         df = preprocess_product_data(df)
     
     analysis = {
@@ -0,0 +1,79 @@
+"""Замер скорости пакетной и поштучной очистки товаров.
+
+Товары похожи на каталог: названия и характеристики сильно повторяются.
+Совпадение результатов проверяет tests/check_batch_cleaning.py.
+
+Запуск: python benchmarks/batch_cleaning.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from cleaners.data_cleaner import clean_product, clean_products_batch
+
+BENCHMARK_RECORDS = 100_000
+
+
+def catalog_products(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Товары, похожие на каталог: сотни вариантов названий и характеристик."""
+    rng = random.Random(seed)
+    kinds = ['Кольцо', 'Серьги', 'Подвеска', 'Браслет', 'Цепь']
+    metals = ['Золото 585', 'Серебро 925', 'Белое золото 585', 'Платина 950']
+    inserts = ['фианит', 'бриллиант', 'топаз', 'жемчуг', 'без вставки']
+    return [
+        {
+            'url': f'https://example.com/product/{i}',
+            'title': f'  {rng.choice(kinds)} из {rng.choice(metals)}\xa0с {rng.choice(inserts)} ',
+            'price': rng.randint(1_000, 300_000),
+            'description': (
+                f'{rng.choice(kinds)} — украшение на каждый день.\n'
+                f'Металл: {rng.choice(metals)}.\tВставка: {rng.choice(inserts)}.  '
+            ) * 3,
+            'characteristics': {
+                ' металл': rng.choice(metals),
+                'Проба\u200b': rng.choice(['585', '925', '950']),
+                'вставка': rng.choice(inserts),
+                'Вес ': f'{rng.randint(1, 200) / 10} г',
+            },
+            'image_url': f'https://example.com/{i}.jpg',
+        }
+        for i in range(count)
+    ]
+
+
+def benchmark(products: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Скорость (товаров в секунду) пакетной и поштучной очистки."""
+    started = time.perf_counter()
+    for product in products:
+        clean_product(product)
+    scalar_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    clean_products_batch(products)
+    batch_elapsed = time.perf_counter() - started
+
+    return {
+        'scalar': len(products) / scalar_elapsed,
+        'batch': len(products) / batch_elapsed,
+    }
+
+
+def main() -> int:
+    speed = benchmark(catalog_products(BENCHMARK_RECORDS))
+    print(
+        f"⏱️  {BENCHMARK_RECORDS} товаров: пачкой {speed['batch']:,.0f}/с, "
+        f"по одному {speed['scalar']:,.0f}/с (x{speed['batch'] / speed['scalar']:.1f})"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
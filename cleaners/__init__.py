@@ -7,6 +7,19 @@ from .data_cleaner import (
     clean_description,
     clean_characteristics,
     clean_product,
+    clean_text_series,
+    clean_characteristics_batch,
+    clean_products_batch,
+    clean_products_frame,
+    characteristics_cache_stats,
+    reset_characteristics_cache,
+    truncation_stats,
+)
+from .characteristics import (
+    canonical_key,
+    canonicalize_characteristics,
+    parse_characteristics,
+    parse_characteristics_frame,
 )
 
 __all__ = [
@@ -16,5 +29,16 @@ __all__ = [
     "clean_description",
     "clean_characteristics",
     "clean_product",
+    "clean_text_series",
+    "clean_characteristics_batch",
+    "clean_products_batch",
+    "clean_products_frame",
+    "characteristics_cache_stats",
+    "reset_characteristics_cache",
+    "truncation_stats",
+    "canonical_key",
+    "canonicalize_characteristics",
+    "parse_characteristics",
+    "parse_characteristics_frame",
 ]
 
@@ -0,0 +1,252 @@
+"""Типизированный разбор характеристик товаров.
+
+Ключи приводятся к каноническим названиям по словарю синонимов,
+значения — к типизированным полям: вес в граммах, проба, число камней,
+размер, металл и его цвет из фиксированных перечней.
+"""
+
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+# Канонические ключи
+METAL_KEY = "Металл"
+PROBE_KEY = "Проба"
+INSERT_KEY = "Вставка"
+WEIGHT_KEY = "Вес"
+SIZE_KEY = "Размер"
+METAL_COLOR_KEY = "Цвет металла"
+STONE_COUNT_KEY = "Количество камней"
+
+# Канонический ключ -> варианты написания (в нижнем регистре)
+KEY_SYNONYMS: Dict[str, List[str]] = {
+    METAL_KEY: ["металл", "материал", "металл изделия", "материал изделия"],
+    PROBE_KEY: ["проба", "проба металла", "проба изделия"],
+    INSERT_KEY: ["вставка", "вставки", "камень", "камни", "тип вставки"],
+    WEIGHT_KEY: ["вес", "вес изделия", "средний вес", "масса", "вес, г", "вес (г)"],
+    SIZE_KEY: ["размер", "размер изделия", "размер кольца"],
+    METAL_COLOR_KEY: ["цвет металла", "цвет покрытия"],
+    STONE_COUNT_KEY: ["количество камней", "кол-во камней", "количество вставок", "кол-во вставок"],
+}
+
+_SYNONYM_TO_KEY = {
+    synonym: canonical
+    for canonical, synonyms in KEY_SYNONYMS.items()
+    for synonym in synonyms
+}
+
+# Перечни значений: каноническое значение -> шаблон
+# Порядок важен: «Серебро с позолотой» — серебро
+METALS = {
+    "Серебро": re.compile(r"серебр|\bag\b", re.IGNORECASE),
+    "Золото": re.compile(r"золот|\bau\b", re.IGNORECASE),
+    "Платина": re.compile(r"платин|\bpt\b", re.IGNORECASE),
+    "Палладий": re.compile(r"паллади|\bpd\b", re.IGNORECASE),
+    "Сталь": re.compile(r"стал", re.IGNORECASE),
+    "Титан": re.compile(r"титан", re.IGNORECASE),
+}
+
+METAL_COLORS = {
+    "Белый": re.compile(r"бел", re.IGNORECASE),
+    "Желтый": re.compile(r"ж[её]лт", re.IGNORECASE),
+    "Красный": re.compile(r"красн", re.IGNORECASE),
+    "Розовый": re.compile(r"розов", re.IGNORECASE),
+    "Черный": re.compile(r"ч[её]рн", re.IGNORECASE),
+}
+
+_NUMBER_RE = re.compile(r"[0-9]+(?:[.,][0-9]+)?")
+_PROBE_RE = re.compile(r"(?<![0-9])([0-9]{3})(?![0-9])")
+# Целое число, не являющееся частью дробного
+_COUNT_RE = re.compile(r"(?<![0-9.,])([0-9]+)(?![.,]?[0-9])")
+# Единица — целым словом с любым окончанием («0.5 карата», «3 грамма»):
+# \b после кириллицы перед окончанием не срабатывает
+_WEIGHT_RE = re.compile(
+    r"([0-9]+(?:[.,][0-9]+)?)\s*(кг|мг|грамм[а-яё]*|гр|г|cts?|карат[а-яё]*|кар)?(?![а-яёa-z])",
+    re.IGNORECASE,
+)
+
+# Диапазон smallint (probe, stone_count в product_features и Int16 в DataFrame)
+_SMALLINT_MAX = 32767
+
+# Множители единиц веса к граммам
+_WEIGHT_UNITS = {
+    "кг": 1000.0,
+    "мг": 0.001,
+    "ct": 0.2,
+    "кар": 0.2,
+    "карат": 0.2,
+}
+
+# Типизированные поля: имя -> dtype в DataFrame
+FEATURE_DTYPES = {
+    "metal": "category",
+    "metal_color": "category",
+    "probe": "Int16",
+    "weight_g": "float32",
+    "stone_count": "Int16",
+    "size": "float32",
+}
+
+
+def canonical_key(key: Optional[str]) -> Optional[str]:
+    """Каноническое название ключа характеристики (неизвестные ключи не меняются)."""
+    if not key or not isinstance(key, str):
+        return key
+    return _SYNONYM_TO_KEY.get(key.strip().lower(), key)
+
+
+def canonicalize_characteristics(characteristics: Dict[str, str]) -> Dict[str, str]:
+    """Замена ключей характеристик на канонические."""
+    if not isinstance(characteristics, dict):
+        return {}
+    return {canonical_key(key): value for key, value in characteristics.items()}
+
+
+def _to_float(number: str) -> float:
+    return float(number.replace(",", "."))
+
+
+def parse_weight(value: Optional[str]) -> Optional[float]:
+    """Вес в граммах: "3,5 г" -> 3.5, "1.2 кг" -> 1200.0, "0.5 ct" -> 0.1."""
+    if not value:
+        return None
+    match = _WEIGHT_RE.search(value)
+    if not match:
+        return None
+    unit = (match.group(2) or "").lower()
+    if unit.startswith("карат") or unit == "cts":
+        unit = "карат"
+    return round(_to_float(match.group(1)) * _WEIGHT_UNITS.get(unit, 1.0), 3)
+
+
+def parse_probe(value: Optional[str]) -> Optional[int]:
+    """Проба металла: "585 проба" -> 585."""
+    if not value:
+        return None
+    match = _PROBE_RE.search(value)
+    return int(match.group(1)) if match else None
+
+
+def parse_stone_count(value: Optional[str]) -> Optional[int]:
+    """Количество камней: "12 шт" -> 12 (значения вне smallint отбрасываются)."""
+    if not value:
+        return None
+    match = _COUNT_RE.search(value)
+    if not match:
+        return None
+    count = int(match.group(1))
+    return count if count <= _SMALLINT_MAX else None
+
+
+def parse_size(value: Optional[str]) -> Optional[float]:
+    """Размер изделия: "17,5" -> 17.5."""
+    if not value:
+        return None
+    match = _NUMBER_RE.search(value)
+    return _to_float(match.group(0)) if match else None
+
+
+def _match_enum(value: Optional[str], patterns: Dict[str, re.Pattern]) -> Optional[str]:
+    if not value:
+        return None
+    for name, pattern in patterns.items():
+        if pattern.search(value):
+            return name
+    return None
+
+
+def parse_metal(value: Optional[str]) -> Optional[str]:
+    """Металл из перечня METALS: "Красное золото 585" -> "Золото"."""
+    return _match_enum(value, METALS)
+
+
+def parse_metal_color(value: Optional[str]) -> Optional[str]:
+    """Цвет металла из перечня METAL_COLORS: "Белое золото" -> "Белый"."""
+    return _match_enum(value, METAL_COLORS)
+
+
+def _get(characteristics: Dict[str, str], key: str) -> Optional[str]:
+    value = characteristics.get(key)
+    return value if isinstance(value, str) else None
+
+
+def parse_characteristics(characteristics: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Типизированные поля товара из характеристик.
+
+    Ключи предварительно приводятся к каноническим. Проба и цвет, если
+    их нет отдельными характеристиками, берутся из значения металла
+    («Белое золото 585»).
+    """
+    chars = canonicalize_characteristics(characteristics)
+    metal_value = _get(chars, METAL_KEY)
+
+    probe = parse_probe(_get(chars, PROBE_KEY))
+    if probe is None:
+        probe = parse_probe(metal_value)
+
+    metal_color = parse_metal_color(_get(chars, METAL_COLOR_KEY))
+    if metal_color is None:
+        metal_color = parse_metal_color(metal_value)
+
+    return {
+        "metal": parse_metal(metal_value),
+        "metal_color": metal_color,
+        "probe": probe,
+        "weight_g": parse_weight(_get(chars, WEIGHT_KEY)),
+        "stone_count": parse_stone_count(_get(chars, STONE_COUNT_KEY)),
+        "size": parse_size(_get(chars, SIZE_KEY)),
+    }
+
+
+def _map_distinct(values: pd.Series, parse: Callable[[Optional[str]], Any]) -> pd.Series:
+    """Разбор каждого уникального значения один раз (значения сильно повторяются)."""
+    table = {value: parse(value) for value in dict.fromkeys(values.dropna())}
+    return values.map(table)
+
+
+def parse_characteristics_frame(items: Iterable[Any], index: Optional[pd.Index] = None) -> pd.DataFrame:
+    """
+    Пакетный разбор характеристик (тот же результат, что parse_characteristics).
+
+    Значения каждого канонического ключа собираются в колонку, и каждая
+    уникальная строка разбирается один раз.
+
+    Returns:
+        pd.DataFrame: колонки FEATURE_DTYPES с компактными типами
+    """
+    items = list(items)
+    columns: Dict[str, List[Optional[str]]] = {
+        key: [None] * len(items)
+        for key in (METAL_KEY, PROBE_KEY, WEIGHT_KEY, SIZE_KEY, METAL_COLOR_KEY, STONE_COUNT_KEY)
+    }
+    for row, characteristics in enumerate(items):
+        if not isinstance(characteristics, dict):
+            continue
+        for key, value in characteristics.items():
+            canonical = canonical_key(key)
+            if canonical in columns:
+                columns[canonical][row] = value if isinstance(value, str) else None
+
+    values = {key: pd.Series(column, dtype=object) for key, column in columns.items()}
+    metal_value = values[METAL_KEY]
+
+    probe = _map_distinct(values[PROBE_KEY], parse_probe)
+    probe = probe.where(probe.notna(), _map_distinct(metal_value, parse_probe))
+
+    metal_color = _map_distinct(values[METAL_COLOR_KEY], parse_metal_color)
+    metal_color = metal_color.where(metal_color.notna(), _map_distinct(metal_value, parse_metal_color))
+
+    frame = pd.DataFrame({
+        "metal": _map_distinct(metal_value, parse_metal),
+        "metal_color": metal_color,
+        "probe": probe,
+        "weight_g": _map_distinct(values[WEIGHT_KEY], parse_weight),
+        "stone_count": _map_distinct(values[STONE_COUNT_KEY], parse_stone_count),
+        "size": _map_distinct(values[SIZE_KEY], parse_size),
+    })
+    frame = frame.astype(FEATURE_DTYPES)
+    if index is not None:
+        frame.index = index
+    return frame
@@ -1,9 +1,101 @@
 """Очистка и нормализация данных продуктов."""
 
+import json
 import re
-from typing import Optional, Dict
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
 
 from utils.helpers import normalize_text
+from cleaners.characteristics import canonical_key
+
+# Любая последовательность пробельных символов (включая \n, \r, \t) -> один пробел.
+# Одиночный обычный пробел не трогаем: результат тот же, что у \s+ -> ' ',
+# но без лишних замен
+_WHITESPACE_RE = re.compile(r'\s{2,}|[^\S ]')
+
+_INVISIBLE_RE = re.compile(r'[\u200b-\u200f\u202a-\u202e\u2060-\u206f]')
+
+# Невидимые символы (удаляются одним str.translate)
+_INVISIBLE_TABLE = dict.fromkeys(
+    [*range(0x200b, 0x2010), *range(0x202a, 0x202f), *range(0x2060, 0x2070)]
+)
+
+# Одиночные суррогаты — ровно то, что отбрасывает normalize_text
+# (encode/decode с errors="ignore")
+_SURROGATE_RE = re.compile(r'[\ud800-\udfff]')
+_SURROGATE_TABLE = dict.fromkeys(range(0xd800, 0xe000))
+
+MAX_TITLE_LENGTH = 500
+MAX_DESCRIPTION_LENGTH = 10000
+
+# Размер LRU-кэша очищенных ключей/значений характеристик
+CHARACTERISTICS_CACHE_SIZE = 4096
+
+
+class _CleaningMemo:
+    """
+    Ограниченный LRU-кэш очищенных строк с интернированием результатов.
+
+    Одинаковые очищенные строки разделяют один объект, поэтому записи
+    товаров в памяти не дублируют «Золото 585» тысячи раз.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def get(self, raw: Any, compute: Callable[[Any], Optional[str]]) -> Optional[str]:
+        try:
+            with self._lock:
+                if raw in self._data:
+                    self._data.move_to_end(raw)
+                    cached = self._data[raw]
+                    self.hits += 1
+                    if cached is not None:
+                        # Без кэша здесь была бы создана новая строка
+                        self.bytes_saved += sys.getsizeof(cached)
+                    return cached
+        except TypeError:
+            # Нехешируемое значение — очищаем без кэша
+            return compute(raw)
+
+        cleaned = compute(raw)
+        if cleaned is not None:
+            cleaned = sys.intern(cleaned)
+
+        with self._lock:
+            self.misses += 1
+            self._data[raw] = cleaned
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return cleaned
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.bytes_saved = 0
+
+
+_KEY_MEMO = _CleaningMemo(CHARACTERISTICS_CACHE_SIZE)
+_VALUE_MEMO = _CleaningMemo(CHARACTERISTICS_CACHE_SIZE)
+
+# Сколько названий и описаний обрезано по длине (метрики качества загрузки)
+_TRUNCATIONS = {'title': 0, 'description': 0}
+_TRUNCATIONS_LOCK = threading.Lock()
+
+
+def _count_truncations(field: str, count: int = 1) -> None:
+    if count:
+        with _TRUNCATIONS_LOCK:
+            _TRUNCATIONS[field] += count
 
 
 def clean_text(text: Optional[str]) -> Optional[str]:
@@ -21,17 +113,14 @@ def clean_text(text: Optional[str]) -> Optional[str]:
     # Нормализация кодировки
     text = normalize_text(text)
     
-    # Замена переносов и табуляций на пробелы
-    text = re.sub(r'[\n\r\t]+', ' ', text)
-    
-    # Удаление множественных пробелов
-    text = re.sub(r'\s+', ' ', text)
+    # Замена переносов, табуляций и множественных пробелов на один пробел
+    text = _WHITESPACE_RE.sub(' ', text)
     
     # Удаление пробелов в начале и конце
     text = text.strip()
     
     # Удаление невидимых символов (кроме обычных пробелов)
-    text = re.sub(r'[\u200b-\u200f\u202a-\u202e\u2060-\u206f]', '', text)
+    text = _INVISIBLE_RE.sub('', text)
     
     return text if text else None
 
@@ -59,8 +148,9 @@ def clean_title(title: Optional[str]) -> Optional[str]:
         return None
     
     # Обрезка слишком длинных названий
-    if len(title) > 500:
-        title = title[:497] + "..."
+    if len(title) > MAX_TITLE_LENGTH:
+        title = title[:MAX_TITLE_LENGTH - 3] + "..."
+        _count_truncations('title')
     
     return title
 
@@ -76,37 +166,79 @@ def clean_description(description: Optional[str]) -> Optional[str]:
         return None
     
     # Обрезка слишком длинных описаний
-    if len(description) > 10000:
-        description = description[:9997] + "..."
+    if len(description) > MAX_DESCRIPTION_LENGTH:
+        description = description[:MAX_DESCRIPTION_LENGTH - 3] + "..."
+        _count_truncations('description')
     
     return description
 
 
+def _normalize_characteristic_key(key: Optional[str]) -> Optional[str]:
+    """Очистка ключа характеристики (None — ключ пустой и пропускается)."""
+    clean_key = clean_text(key)
+    if not clean_key:
+        return None
+    
+    # Нормализация ключа (первая буква заглавная, синонимы -> канонический ключ)
+    clean_key = clean_key.strip()
+    if clean_key:
+        clean_key = clean_key[0].upper() + clean_key[1:] if len(clean_key) > 1 else clean_key.upper()
+    
+    return canonical_key(clean_key)
+
+
 def clean_characteristics(characteristics: Dict[str, str]) -> Dict[str, str]:
-    """Очистка характеристик товара."""
+    """
+    Очистка характеристик товара.
+    
+    Ключи и значения очищаются через LRU-кэш: их набор невелик
+    и постоянно повторяется от товара к товару.
+    """
     if not isinstance(characteristics, dict):
         return {}
     
     cleaned = {}
     for key, value in characteristics.items():
         # Очистка ключа и значения
-        clean_key = clean_text(key)
-        clean_value = clean_text(value)
+        clean_key = _KEY_MEMO.get(key, _normalize_characteristic_key)
+        clean_value = _VALUE_MEMO.get(value, clean_text)
         
         # Пропускаем пустые ключи или значения
-        if not clean_key or not clean_value:
+        if clean_key is None or not clean_value:
             continue
         
-        # Нормализация ключа (первая буква заглавная)
-        clean_key = clean_key.strip()
-        if clean_key:
-            clean_key = clean_key[0].upper() + clean_key[1:] if len(clean_key) > 1 else clean_key.upper()
-        
         cleaned[clean_key] = clean_value
     
     return cleaned
 
 
+def characteristics_cache_stats() -> Dict[str, Any]:
+    """Статистика кэша очистки характеристик (попадания, сэкономленная память)."""
+    hits = _KEY_MEMO.hits + _VALUE_MEMO.hits
+    misses = _KEY_MEMO.misses + _VALUE_MEMO.misses
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+        'cached_keys': len(_KEY_MEMO._data),
+        'cached_values': len(_VALUE_MEMO._data),
+        'bytes_saved': _KEY_MEMO.bytes_saved + _VALUE_MEMO.bytes_saved,
+    }
+
+
+def reset_characteristics_cache() -> None:
+    """Очистка кэша и счетчиков (например, после смены правил очистки)."""
+    _KEY_MEMO.clear()
+    _VALUE_MEMO.clear()
+
+
+def truncation_stats() -> Dict[str, int]:
+    """Число обрезанных по длине названий и описаний с начала процесса."""
+    with _TRUNCATIONS_LOCK:
+        return dict(_TRUNCATIONS)
+
+
 def clean_product(product: Dict) -> Dict:
     """
     Комплексная очистка данных продукта.
@@ -124,3 +256,166 @@ def clean_product(product: Dict) -> Dict:
     
     return cleaned
 
+
+# -------- Пакетная очистка --------
+
+
+def clean_text_series(texts: pd.Series) -> pd.Series:
+    """
+    Векторизованный аналог clean_text для Series строк.
+
+    Результат поэлементно совпадает с clean_text (пустые -> None).
+    Каждое уникальное значение очищается один раз; str.translate
+    применяется только к строкам, где поиск нашел что удалять.
+    """
+    present = (texts.notna() & (texts != '')).to_numpy()
+    result: List[Optional[str]] = [None] * len(texts)
+    if not present.any():
+        return pd.Series(result, index=texts.index, dtype=object)
+
+    # Дедупликация через dict: хеш-таблицы pandas не принимают суррогаты
+    positions: Dict[str, int] = {}
+    codes = [positions.setdefault(text, len(positions)) for text in texts[present].tolist()]
+    cleaned = pd.Series(list(positions), dtype=object)
+
+    with_surrogates = cleaned.str.contains(_SURROGATE_RE, regex=True)
+    if with_surrogates.any():
+        cleaned[with_surrogates] = cleaned[with_surrogates].str.translate(_SURROGATE_TABLE)
+
+    cleaned = cleaned.str.replace(_WHITESPACE_RE, ' ', regex=True).str.strip()
+
+    with_invisible = cleaned.str.contains(_INVISIBLE_RE, regex=True)
+    if with_invisible.any():
+        cleaned[with_invisible] = cleaned[with_invisible].str.translate(_INVISIBLE_TABLE)
+
+    cleaned_values = [text or None for text in cleaned.tolist()]
+    for position, code in zip(present.nonzero()[0], codes):
+        result[position] = cleaned_values[code]
+    return pd.Series(result, index=texts.index, dtype=object)
+
+
+def _truncate_series(texts: pd.Series, max_length: int, field: str) -> pd.Series:
+    too_long = texts.str.len() > max_length
+    if too_long.any():
+        _count_truncations(field, int(too_long.sum()))
+        texts = texts.copy()
+        texts[too_long] = texts[too_long].str[:max_length - 3] + "..."
+    return texts
+
+
+def clean_title_series(titles: pd.Series) -> pd.Series:
+    """Пакетная очистка названий (как clean_title)."""
+    return _truncate_series(clean_text_series(titles), MAX_TITLE_LENGTH, 'title')
+
+
+def clean_description_series(descriptions: pd.Series) -> pd.Series:
+    """Пакетная очистка описаний (как clean_description)."""
+    return _truncate_series(clean_text_series(descriptions), MAX_DESCRIPTION_LENGTH, 'description')
+
+
+def _clean_distinct(strings: Iterable[Any], as_key: bool = False) -> Dict[Any, Optional[str]]:
+    """Очистка каждой уникальной строки один раз: исходная -> очищенная."""
+    originals = list(strings)
+    cleaned = clean_text_series(pd.Series(originals, dtype=object)).tolist()
+    if as_key:
+        # Та же нормализация ключа, что в clean_characteristics
+        cleaned = [
+            None if key is None else canonical_key(key.strip()[:1].upper() + key.strip()[1:])
+            for key in cleaned
+        ]
+    return dict(zip(originals, cleaned))
+
+
+def clean_characteristics_batch(items: List[Any]) -> List[Dict[str, str]]:
+    """
+    Пакетная очистка характеристик (как clean_characteristics).
+
+    Ключи и значения сильно повторяются, поэтому каждая уникальная
+    строка очищается один раз, а словари собираются по готовым таблицам.
+    """
+    keys = set()
+    values = set()
+    for characteristics in items:
+        if isinstance(characteristics, dict):
+            keys.update(characteristics.keys())
+            values.update(characteristics.values())
+
+    key_map = _clean_distinct(keys, as_key=True)
+    value_map = _clean_distinct(values)
+
+    result = []
+    for characteristics in items:
+        cleaned = {}
+        if isinstance(characteristics, dict):
+            for key, value in characteristics.items():
+                clean_key = key_map[key]
+                clean_value = value_map[value]
+                if clean_key is None or clean_value is None:
+                    continue
+                cleaned[clean_key] = clean_value
+        result.append(cleaned)
+    return result
+
+
+def clean_products_batch(products: List[Dict]) -> List[Dict]:
+    """
+    Пакетная очистка списка продуктов.
+
+    Результат совпадает с [clean_product(p) for p in products],
+    но строки обрабатываются по колонкам.
+    """
+    if not products:
+        return []
+
+    titles = clean_title_series(
+        pd.Series([p.get("title") for p in products], dtype=object)
+    ).tolist()
+    descriptions = clean_description_series(
+        pd.Series([p.get("description") for p in products], dtype=object)
+    ).tolist()
+    characteristics = clean_characteristics_batch(
+        [p.get("characteristics", {}) for p in products]
+    )
+
+    return [
+        {
+            "url": product.get("url"),
+            "title": title,
+            "price": clean_price(product.get("price")),
+            "description": description,
+            "characteristics": chars,
+            "image_url": product.get("image_url"),
+        }
+        for product, title, description, chars in zip(
+            products, titles, descriptions, characteristics
+        )
+    ]
+
+
+def clean_products_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Пакетная очистка DataFrame продуктов (например, всего каталога из БД).
+
+    Обрабатываются присутствующие колонки title, description, price
+    и characteristics (словари или JSON-строки).
+    """
+    df = df.copy()
+
+    if 'title' in df.columns:
+        df['title'] = clean_title_series(df['title'])
+
+    if 'description' in df.columns:
+        df['description'] = clean_description_series(df['description'])
+
+    if 'price' in df.columns:
+        price = pd.to_numeric(df['price'], errors='coerce')
+        df['price'] = price.mask(price < 0)
+
+    if 'characteristics' in df.columns:
+        items = [
+            json.loads(value) if isinstance(value, str) else value
+            for value in df['characteristics']
+        ]
+        df['characteristics'] = clean_characteristics_batch(items)
+
+    return df
@@ -3,22 +3,36 @@
 from .settings import (
     BASE_URL,
     SHOP_NAME,
+    PROJECT_ROOT,
+    DATA_DIR,
     CATALOG_URLS,
     DB_CONFIG,
+    DB_POOL_CONFIG,
     MINIO_CONFIG,
     MINIO_BUCKET,
     PAUSE_CARD,
     PAUSE_CATALOG,
+    INGEST_BATCH_SIZE,
+    SNAPSHOT_CONFIG,
+    QUALITY_CONFIG,
+    NEAR_DUPLICATE_CONFIG,
 )
 
 __all__ = [
     "BASE_URL",
     "SHOP_NAME",
+    "PROJECT_ROOT",
+    "DATA_DIR",
     "CATALOG_URLS",
     "DB_CONFIG",
+    "DB_POOL_CONFIG",
     "MINIO_CONFIG",
     "MINIO_BUCKET",
     "PAUSE_CARD",
     "PAUSE_CATALOG",
+    "INGEST_BATCH_SIZE",
+    "SNAPSHOT_CONFIG",
+    "QUALITY_CONFIG",
+    "NEAR_DUPLICATE_CONFIG",
 ]
 
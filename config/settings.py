@@ -1,5 +1,12 @@
 """Настройки парсера."""
 
+from pathlib import Path
+
+# Локальные данные (снимок, кэши) — в data/ корня проекта, независимо
+# от текущего каталога запуска
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = PROJECT_ROOT / "data"
+
 BASE_URL = "https://www.585zolotoy.ru"
 SHOP_NAME = "585zolotoy"
 
@@ -26,6 +33,13 @@ DB_CONFIG = {
     "port": 5432,
 }
 
+DB_POOL_CONFIG = {
+    "max_size": 10,
+    "idle_timeout": 300,  # секунды простоя до закрытия соединения
+    "acquire_timeout": 30,  # секунды ожидания свободного соединения
+    "health_check_interval": 30,  # проверка SELECT 1 после такого простоя
+}
+
 MINIO_CONFIG = {
     "endpoint": "127.0.0.1:9000",
     "access_key": "admin",
@@ -38,3 +52,40 @@ MINIO_BUCKET = "jewelry-images"
 PAUSE_CARD = (3, 6)
 PAUSE_CATALOG = (6, 10)
 
+# Сколько товаров накапливать перед пакетной записью в БД
+INGEST_BATCH_SIZE = 50
+
+# Локальный снимок products в Parquet для анализа
+SNAPSHOT_CONFIG = {
+    "enabled": True,
+    "path": str(DATA_DIR / "snapshot"),
+    "max_parts": 20,  # после стольких инкрементальных частей снимок уплотняется
+}
+
+# Расчет метрик качества и их кэш по отпечатку данных
+QUALITY_CONFIG = {
+    "backend": "sql",  # sql — агрегаты в Postgres, pandas — загрузка товаров
+    "cache_path": str(DATA_DIR / "quality_cache.json"),
+    "cache_size": 8,  # сколько наборов метрик хранить
+    # Приближенная оценка (quality_gate): выборка и пороги
+    "sample_percent": 1.0,  # TABLESAMPLE для backend sql, % строк
+    # BERNOULLI — независимый отбор строк (на нем основаны интервалы Уилсона);
+    # SYSTEM быстрее, но берет страницы целиком, и интервалы выходят слишком узкими
+    "sample_method": "BERNOULLI",
+    "sample_rows": 100_000,  # размер резервуарной выборки для pandas
+    "confidence": 0.95,  # уровень доверительных интервалов
+    "thresholds": {
+        "completeness": 90.0,  # минимальная полнота колонки, %
+        "invalid": 5.0,  # максимальная доля строк с ошибками валидации, %
+    },
+}
+
+# Поиск почти дубликатов (MinHash + LSH)
+NEAR_DUPLICATE_CONFIG = {
+    "num_perm": 64,  # длина подписи MinHash
+    "bands": 16,  # LSH-полосы: num_perm / bands значений в полосе
+    "threshold": 0.7,  # минимальное сходство подписей пары
+    "shingle_size": 16,  # k-граммы в байтах UTF-8 (около 8 букв кириллицы)
+    "max_text_length": 2000,  # длина нормализованного текста товара
+    "batch_bytes": 1_000_000,  # объем текста в одной пачке расчета подписей
+}
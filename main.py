@@ -1,21 +1,117 @@
 """Главный файл для запуска парсера."""
 
 import os
+from typing import Dict, List, Optional
+
+from minio import Minio
 
 from src.selenium_utils import setup_driver
-from src.storage import init_db, init_minio, save_product, save_image
+from src.storage import (
+    db_cursor,
+    get_minio,
+    pool_stats,
+    close_pool,
+    save_products_batch,
+    save_image,
+)
+from src.schema import migrate
+from src.price_history import ensure_partitions
+from src.ingest_metrics import IngestMetrics
 from src.parser import parse_product_page, collect_product_links
 from utils.helpers import download_temp_image, sleep_rand
 from utils.validators import validate_product
-from cleaners.data_cleaner import clean_product
-from config.settings import SHOP_NAME, MINIO_BUCKET, PAUSE_CARD
+from cleaners.data_cleaner import clean_product, characteristics_cache_stats
+from config.settings import SHOP_NAME, MINIO_BUCKET, PAUSE_CARD, INGEST_BATCH_SIZE
+
+
+def _save_products(
+    cur, batch: List[Dict], metrics: Optional[IngestMetrics] = None
+) -> Dict[str, dict]:
+    """
+    Запись пачки товаров одним запросом; если пачка не записалась —
+    по одному товару, чтобы из-за одной плохой строки не терять остальные.
+    """
+    try:
+        return save_products_batch(cur, batch)
+    except Exception as e:
+        print(f"   ⚠️  Пачка не записана ({e}), запись по одному товару")
+        if metrics is not None:
+            metrics.record_batch_failure()
+
+    saved = {}
+    for product in batch:
+        try:
+            saved.update(save_products_batch(cur, [product]))
+        except Exception as e:
+            print(f"   ❌ Товар не сохранен {product['url']}: {e}")
+    return saved
+
+
+def _save_product_image(minio_client: Minio, product: Dict, pid: int) -> None:
+    """Скачивание изображения, загрузка в MinIO и запись о нем в БД."""
+    tmp = download_temp_image(product["image_url"])
+    try:
+        obj = f"{SHOP_NAME}/products/{pid}/main.jpg"
+        minio_client.fput_object(MINIO_BUCKET, obj, tmp, content_type="image/jpeg")
+    finally:
+        os.remove(tmp)
+    # Соединение нужно только на одну короткую вставку
+    with db_cursor() as (conn, cur):
+        save_image(cur, pid, product["image_url"], f"{MINIO_BUCKET}/{obj}")
+
+
+def flush_batch(
+    batch: List[Dict], minio_client: Minio, metrics: Optional[IngestMetrics] = None
+) -> None:
+    """Сохранение накопленной пачки товаров и их изображений (и счетчиков качества)."""
+    if not batch:
+        return
+
+    try:
+        # Соединение берется из пула только на время записи,
+        # а не на скачивание страниц и изображений
+        try:
+            with db_cursor() as (conn, cur):
+                saved = _save_products(cur, batch, metrics)
+        except Exception as e:
+            # Например, нет соединения с БД: пачка целиком не записана
+            print(f"   ❌ Пачка товаров не сохранена: {e}")
+            saved = {}
+            if metrics is not None:
+                metrics.record_batch_failure()
+        print(f"💾 Сохранено товаров: {len(saved)} из {len(batch)}")
+
+        # Счетчики качества — своей транзакцией после записи товаров
+        if metrics is not None:
+            metrics.record_saved(saved)
+            metrics.record_unsaved(len({p["url"] for p in batch} - saved.keys()))
+            try:
+                with db_cursor() as (conn, cur):
+                    metrics.flush(cur)
+            except Exception as e:
+                print(f"   ⚠️  Счетчики качества не записаны (попытка при следующей пачке): {e}")
+
+        # Сохранение изображений — вне транзакции с товарами
+        for product in batch:
+            if not product["image_url"] or product["url"] not in saved:
+                continue
+            try:
+                _save_product_image(minio_client, product, saved[product["url"]]["id"])
+            except Exception as e:
+                print(f"   ⚠️  Ошибка при сохранении изображения {product['url']}: {e}")
+    finally:
+        batch.clear()
 
 
 def main():
     """Основная функция парсера."""
+    migrate()
+    metrics = IngestMetrics()
+    with db_cursor() as (conn, cur):
+        ensure_partitions(cur)
+        metrics.start(cur)
     driver = setup_driver()
-    conn, cur = init_db()
-    minio_client = init_minio()
+    minio_client = get_minio()
 
     try:
         # Сбор ссылок на товары
@@ -23,52 +119,73 @@ def main():
         print(f"\n🧮 Всего уникальных товаров: {len(all_links)}")
 
         # Парсинг товаров
+        batch = []
         for i, link in enumerate(all_links, 1):
             print(f"🔍 [{i}/{len(all_links)}] {link}")
-            
+
             try:
                 # Парсинг страницы товара
                 product = parse_product_page(driver, link)
-                
+
                 # Очистка данных
                 product = clean_product(product)
-                
+
                 # Валидация данных
                 is_valid, errors = validate_product(product)
+                metrics.record_product(product, errors)
                 if not is_valid:
                     print(f"   ⚠️  Пропущен из-за ошибок валидации: {', '.join(errors)}")
                     continue
-                
-                # Сохранение товара в БД
-                pid = save_product(cur, product)
-                
-                # Сохранение изображения
-                if product["image_url"]:
-                    try:
-                        tmp = download_temp_image(product["image_url"])
-                        obj = f"{SHOP_NAME}/products/{pid}/main.jpg"
-                        minio_client.fput_object(
-                            MINIO_BUCKET, obj, tmp, content_type="image/jpeg"
-                        )
-                        save_image(cur, pid, product["image_url"], f"{MINIO_BUCKET}/{obj}")
-                        os.remove(tmp)
-                    except Exception as e:
-                        print(f"   ⚠️  Ошибка при сохранении изображения: {e}")
-                
+
+                batch.append(product)
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    flush_batch(batch, minio_client, metrics)
+
                 sleep_rand(*PAUSE_CARD)
-                
+
             except Exception as e:
                 print(f"   ❌ Ошибка при обработке товара: {e}")
+                metrics.record_error()
                 continue
 
+        try:
+            flush_batch(batch, minio_client, metrics)
+        except Exception as e:
+            print(f"   ❌ Ошибка при сохранении последней пачки товаров: {e}")
+
+        with db_cursor() as (conn, cur):
+            metrics.finish(cur)
+
         print("\n🎉 Парсинг завершён успешно")
-        
+
+        stats = pool_stats()
+        print(
+            f"🔌 Пул соединений: выдано {stats['acquired']}, "
+            f"создано {stats['created']}, "
+            f"пик загрузки {stats['peak_utilization']:.0%}, "
+            f"ожидание ср. {stats['wait_avg_sec'] * 1000:.1f} мс / "
+            f"макс. {stats['wait_max_sec'] * 1000:.1f} мс"
+        )
+
+        cache = characteristics_cache_stats()
+        print(
+            f"🧠 Кэш характеристик: попаданий {cache['hit_rate']:.0%} "
+            f"({cache['hits']} из {cache['hits'] + cache['misses']}), "
+            f"сэкономлено {cache['bytes_saved'] / 1024:.1f} КБ"
+        )
+
+        totals = metrics.totals
+        print(
+            f"📊 Качество загрузки: просмотрено {totals['products_seen']}, "
+            f"отклонено {totals['rejected']}, "
+            f"обрезано названий {totals['truncated:title']} / описаний {totals['truncated:description']}, "
+            f"уже в базе {totals['duplicates:existing']}"
+        )
+
     finally:
         driver.quit()
-        cur.close()
-        conn.close()
+        close_pool()
 
 
 if __name__ == "__main__":
     main()
-
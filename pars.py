@@ -23,6 +23,8 @@ from webdriver_manager.chrome import ChromeDriverManager
 
 from bs4 import BeautifulSoup
 
+from src.storage import save_product as storage_save_product
+
 
 # ---------------------------------------------------------------------
 # CONFIG
@@ -133,25 +135,9 @@ def init_minio():
 
 
 def save_product(cur, p: dict) -> int:
-    cur.execute("""
-        INSERT INTO products (
-            shop, product_url, title, price, description, characteristics
-        )
-        VALUES (%s, %s, %s, %s, %s, %s)
-        ON CONFLICT (product_url) DO UPDATE SET
-            price = EXCLUDED.price,
-            description = EXCLUDED.description,
-            characteristics = EXCLUDED.characteristics
-        RETURNING id;
-    """, (
-        SHOP,
-        p["url"],
-        p["title"],
-        p["price"],
-        p["description"],
-        json.dumps(p["characteristics"], ensure_ascii=False)
-    ))
-    return cur.fetchone()["id"]
+    # Запись по текущей схеме (описание — в product_texts, история цен,
+    # характеристики): колонки products.description после миграций нет
+    return storage_save_product(cur, p)
 
 
 def save_image(cur, product_id, image_url, storage_path):
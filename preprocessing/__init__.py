@@ -7,6 +7,24 @@ from .data_preprocessor import (
     encode_categorical,
     handle_missing_values,
     handle_outliers,
+    outlier_mask,
+    optimize_frame_dtypes,
+    memory_usage_report,
+)
+from .snapshot import (
+    load_products,
+    load_snapshot,
+    refresh_snapshot,
+    is_snapshot_stale,
+    snapshot_fingerprint,
+)
+from .sparse_features import SparseFeatureBuilder, build_sparse_features
+from .pipeline import PreprocessingPipeline, preprocess_updates
+from .out_of_core import (
+    QuantileSketch,
+    collect_statistics,
+    apply_statistics,
+    preprocess_out_of_core,
 )
 
 __all__ = [
@@ -16,5 +34,21 @@ __all__ = [
     "encode_categorical",
     "handle_missing_values",
     "handle_outliers",
+    "outlier_mask",
+    "optimize_frame_dtypes",
+    "memory_usage_report",
+    "load_products",
+    "load_snapshot",
+    "refresh_snapshot",
+    "is_snapshot_stale",
+    "snapshot_fingerprint",
+    "SparseFeatureBuilder",
+    "build_sparse_features",
+    "PreprocessingPipeline",
+    "preprocess_updates",
+    "QuantileSketch",
+    "collect_statistics",
+    "apply_statistics",
+    "preprocess_out_of_core",
 ]
 
@@ -1,42 +1,333 @@
 """Предобработка данных для анализа."""
 
 import json
+import time
+import tracemalloc
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterator, List, Optional, Any, Sequence, Tuple, Union
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.impute import SimpleImputer
 
-from src.storage import init_db
+from src.storage import db_cursor
+from cleaners.characteristics import FEATURE_DTYPES
 
 
-def load_data_from_db() -> pd.DataFrame:
-    """Загрузка данных из базы данных в DataFrame."""
-    conn, cur = init_db()
-    try:
+# Колонки, доступные загрузчикам: имя -> SQL-выражение
+PRODUCT_COLUMNS = {
+    'id': 'p.id',
+    'shop': 'p.shop',
+    'product_url': 'p.product_url',
+    'title': 'p.title',
+    'price': 'p.price',
+    'characteristics': 'p.characteristics',
+    'created_at': 'p.created_at',
+    'updated_at': 'p.updated_at',
+    'metal': 'p.metal',
+    'probe': 'p.probe',
+    'insert_type': 'p.insert_type',
+    'weight_g': 'p.weight_g',
+    # Холодная колонка: хранится в product_texts
+    'description': 't.description',
+    # Первое изображение товара (индекс product_images(product_id))
+    'image_url': (
+        '(SELECT i.image_url FROM product_images i '
+        'WHERE i.product_id = p.id ORDER BY i.id LIMIT 1)'
+    ),
+    # Категория из URL: /catalog/<категория>/
+    'category': "substring(p.product_url FROM '/catalog/([^/]+)/')",
+}
+
+# Колонки по умолчанию — без длинных описаний
+HOT_COLUMNS = ['id', 'shop', 'product_url', 'title', 'price', 'characteristics', 'created_at']
+
+# Компактные типы колонок
+COLUMN_DTYPES = {
+    'id': 'int32',
+    'shop': 'category',
+    'price': 'Int32',
+    'metal': 'category',
+    'probe': 'Int16',
+    'insert_type': 'category',
+    'weight_g': 'float32',
+    'category': 'category',
+    # Уникальные строки: Arrow-хранилище вместо Python-объектов
+    'product_url': 'string[pyarrow]',
+    'title': 'string[pyarrow]',
+    'description': 'string[pyarrow]',
+    'image_url': 'string[pyarrow]',
+}
+
+# Текстовые колонки с долей уникальных значений ниже порога -> category
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# Размер порции серверного курсора по умолчанию
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _select_list(columns: Sequence[str]) -> str:
+    unknown = [col for col in columns if col not in PRODUCT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Неизвестные колонки: {', '.join(unknown)}")
+    return ",\n            ".join(f"{PRODUCT_COLUMNS[col]} AS {col}" for col in columns)
+
+
+def _products_query(columns: Sequence[str]) -> str:
+    """SELECT по products с фильтрами; product_texts — только если нужно описание."""
+    join = ""
+    if 'description' in columns:
+        join = "LEFT JOIN product_texts t ON t.product_id = p.id"
+    return f"""
+        SELECT
+            {_select_list(columns)}
+        FROM products p
+        {join}
+        WHERE (%(shop)s::text IS NULL OR p.shop = %(shop)s)
+          AND (%(date_from)s::timestamptz IS NULL OR p.created_at >= %(date_from)s)
+          AND (%(date_to)s::timestamptz IS NULL OR p.created_at < %(date_to)s)
+          AND (%(category)s::text IS NULL OR {PRODUCT_COLUMNS['category']} = %(category)s)
+          AND (%(updated_after)s::timestamptz IS NULL OR p.updated_at >= %(updated_after)s)
+        ORDER BY p.created_at DESC
+    """
+
+
+def _is_text(values: pd.Series) -> bool:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return False
+    if pd.api.types.is_string_dtype(values.dtype) and values.dtype != object:
+        return True
+    return values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) == 'string'
+
+
+def _compact_price(values: pd.Series) -> pd.Series:
+    """Цена: Int32, если все значения целые, иначе float32 (после заполнения средним)."""
+    numeric = pd.to_numeric(values, errors='coerce')
+    as_float = numeric.to_numpy(dtype='float64', na_value=np.nan)
+    present = as_float[~np.isnan(as_float)]
+    if np.array_equal(present, np.round(present)) and (np.abs(present) < 2**31).all():
+        return numeric.astype('Int32')
+    return numeric.astype('float32')
+
+
+def _is_numeric(values: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype)
+
+
+def optimize_frame_dtypes(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    """
+    Приведение колонок к компактным типам.
+
+    - известные колонки — по COLUMN_DTYPES (цена — Int32 или float32)
+    - char_* и другой текст с небольшим числом различных значений — category
+    - float64 -> float32
+    """
+    if not inplace:
+        df = df.copy()
+    
+    for col in df.columns:
+        values = df[col]
+        dtype = COLUMN_DTYPES.get(col)
+        if col == 'price':
+            df[col] = _compact_price(values)
+        elif dtype in ('int32', 'Int16', 'float32'):
+            # numeric из PostgreSQL приходит Decimal
+            numeric = pd.to_numeric(values, errors='coerce')
+            if dtype == 'int32' and numeric.isna().any():
+                dtype = 'Int32'
+            df[col] = numeric.astype(dtype)
+        elif dtype is not None:
+            df[col] = values.astype(dtype)
+        elif _is_text(values):
+            if values.nunique(dropna=True) <= CATEGORY_MAX_UNIQUE_RATIO * max(len(values), 1):
+                df[col] = values.astype('category')
+        elif values.dtype == 'float64':
+            df[col] = values.astype('float32')
+    return df
+
+
+def memory_usage_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Байты по колонкам до и после оптимизации (с итоговой строкой total)."""
+    before_bytes = before.memory_usage(deep=True, index=False)
+    after_bytes = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.reindex(before.columns).astype(str),
+        'bytes_before': before_bytes,
+        'bytes_after': after_bytes.reindex(before.columns),
+    })
+    report.loc['total'] = ['', '', before_bytes.sum(), after_bytes.sum()]
+    report['ratio'] = report['bytes_before'] / report['bytes_after']
+    return report
+
+
+def iter_data_from_db(
+    columns: Optional[Sequence[str]] = None,
+    shop: Optional[str] = None,
+    date_from: Optional[Any] = None,
+    date_to: Optional[Any] = None,
+    category: Optional[str] = None,
+    chunksize: int = DEFAULT_CHUNK_SIZE,
+    optimize_dtypes: bool = True,
+    updated_after: Optional[Any] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Потоковая загрузка товаров порциями DataFrame.
+
+    Строки читаются именованным (серверным) курсором, поэтому в памяти
+    одновременно не больше chunksize строк. Фильтры: магазин, интервал
+    created_at [date_from, date_to), категория из URL (/catalog/<категория>/)
+    и updated_at не раньше updated_after (для инкрементальных выгрузок).
+    При optimize_dtypes колонки приводятся к компактным типам
+    (optimize_frame_dtypes; категории у каждой порции свои).
+    """
+    columns = list(columns or HOT_COLUMNS)
+    query = _products_query(columns)
+    params = {
+        'shop': shop,
+        'date_from': date_from,
+        'date_to': date_to,
+        'category': category,
+        'updated_after': updated_after,
+    }
+
+    with db_cursor() as (conn, _):
+        # Именованный курсор работает только внутри транзакции
+        conn.autocommit = False
+        with conn.cursor(name='load_products') as cur:
+            cur.itersize = chunksize
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(chunksize)
+                if not rows:
+                    break
+                chunk = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+                yield optimize_frame_dtypes(chunk, inplace=True) if optimize_dtypes else chunk
+        conn.rollback()
+
+
+def load_data_from_db(
+    columns: Optional[Sequence[str]] = None,
+    shop: Optional[str] = None,
+    date_from: Optional[Any] = None,
+    date_to: Optional[Any] = None,
+    category: Optional[str] = None,
+    optimize_dtypes: bool = True,
+) -> pd.DataFrame:
+    """
+    Загрузка данных из базы данных в DataFrame.
+
+    Загружаются только запрошенные колонки (по умолчанию HOT_COLUMNS);
+    product_texts присоединяется, только если запрошено описание.
+    Фильтры — как у iter_data_from_db. При optimize_dtypes колонки
+    приводятся к компактным типам после склейки порций.
+    """
+    columns = list(columns or HOT_COLUMNS)
+    chunks = list(iter_data_from_db(
+        columns, shop=shop, date_from=date_from, date_to=date_to,
+        category=category, optimize_dtypes=False,
+    ))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    return optimize_frame_dtypes(df, inplace=True) if optimize_dtypes else df
+
+
+def load_descriptions(product_ids: Optional[Sequence[int]] = None) -> pd.Series:
+    """Загрузка описаний товаров (Series, индекс — id товара)."""
+    with db_cursor() as (conn, cur):
+        if product_ids is None:
+            cur.execute("SELECT product_id, description FROM product_texts")
+        else:
+            cur.execute(
+                "SELECT product_id, description FROM product_texts WHERE product_id = ANY(%s)",
+                ([int(pid) for pid in product_ids],),
+            )
+        rows = cur.fetchall()
+    return pd.Series(
+        [row['description'] for row in rows],
+        index=pd.Index([row['product_id'] for row in rows], name='id'),
+        name='description',
+        dtype=object,
+    )
+
+
+def attach_descriptions(df: pd.DataFrame) -> pd.DataFrame:
+    """Добавление колонки description к уже загруженному DataFrame по id."""
+    if 'description' in df.columns or 'id' not in df.columns:
+        return df
+    descriptions = load_descriptions(df['id'].dropna().unique())
+    df = df.copy()
+    df['description'] = df['id'].map(descriptions)
+    return df
+
+
+def load_attributes_from_db(
+    keys: Optional[Sequence[str]] = None,
+    product_ids: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
+    """
+    Загрузка характеристик из product_attributes в «длинном» формате.
+
+    Колонки: product_id, key, value, value_num. Ключи и значения
+    возвращаются категориальными — они сильно повторяются.
+    """
+    with db_cursor() as (conn, cur):
         query = """
-            SELECT 
-                id,
-                shop,
-                product_url,
-                title,
-                price,
-                description,
-                characteristics,
-                created_at
-            FROM products
-            ORDER BY created_at DESC
+            SELECT a.product_id, k.name AS key, a.value, a.value_num
+            FROM product_attributes a
+            JOIN attr_keys k ON k.id = a.attr_key_id
+            WHERE (%(keys)s::text[] IS NULL OR k.name = ANY(%(keys)s::text[]))
+              AND (%(ids)s::integer[] IS NULL OR a.product_id = ANY(%(ids)s::integer[]))
         """
-        df = pd.read_sql_query(query, conn)
-        return df
-    finally:
-        cur.close()
-        conn.close()
+        params = {
+            'keys': list(keys) if keys is not None else None,
+            'ids': [int(pid) for pid in product_ids] if product_ids is not None else None,
+        }
+        df = pd.read_sql_query(query, conn, params=params)
+
+    return df.astype({
+        'product_id': 'int32',
+        'key': 'category',
+        'value': 'category',
+        'value_num': 'float64',
+    })
+
+
+def load_features_from_db(
+    product_ids: Optional[Sequence[int]] = None,
+    shop: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Загрузка типизированных признаков из product_features.
+
+    Кроме признаков возвращаются цена и цена за грамм — для числовой
+    аналитики без повторного разбора текста характеристик.
+    """
+    with db_cursor() as (conn, cur):
+        query = """
+            SELECT f.product_id, p.shop, p.price,
+                   f.metal, f.metal_color, f.probe, f.weight_g, f.stone_count, f.size
+            FROM product_features f
+            JOIN products p ON p.id = f.product_id
+            WHERE (%(ids)s::integer[] IS NULL OR f.product_id = ANY(%(ids)s::integer[]))
+              AND (%(shop)s::text IS NULL OR p.shop = %(shop)s)
+        """
+        params = {
+            'ids': [int(pid) for pid in product_ids] if product_ids is not None else None,
+            'shop': shop,
+        }
+        df = pd.read_sql_query(query, conn, params=params)
+
+    df = df.astype({'product_id': 'int32', 'shop': 'category', 'price': 'float64', **FEATURE_DTYPES})
+    weight = df['weight_g'].astype('float64')
+    df['price_per_gram'] = (df['price'] / weight.where(weight > 0)).astype('float32')
+    return df
 
 
-def normalize_data(df: pd.DataFrame) -> pd.DataFrame:
+def normalize_data(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
     """Нормализация данных (приведение к единому формату)."""
-    df = df.copy()
+    if not inplace:
+        df = df.copy()
     
     # Нормализация текстовых полей
     if 'title' in df.columns:
@@ -53,20 +344,25 @@ def normalize_data(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def standardize_data(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+def standardize_data(df: pd.DataFrame, columns: List[str], inplace: bool = False) -> pd.DataFrame:
     """Стандартизация числовых данных (z-score normalization)."""
-    df = df.copy()
+    if not inplace:
+        df = df.copy()
     scaler = StandardScaler()
     
     for col in columns:
-        if col in df.columns and df[col].dtype in ['int64', 'float64']:
-            df[col] = scaler.fit_transform(df[[col]])
+        if col in df.columns and _is_numeric(df[col]):
+            df[col] = scaler.fit_transform(df[[col]].astype('float64'))
     
     return df
 
 
-def encode_categorical(df: pd.DataFrame, columns: List[str]) -> Dict[str, LabelEncoder]:
-    """Кодирование категориальных данных."""
+def encode_categorical(df: pd.DataFrame, columns: List[str]) -> Tuple[pd.DataFrame, Dict[str, LabelEncoder]]:
+    """
+    Кодирование категориальных данных (порядковые коды LabelEncoder).
+
+    Для моделей удобнее разреженный one-hot: preprocessing.sparse_features.
+    """
     df = df.copy()
     encoders = {}
     
@@ -79,112 +375,358 @@ def encode_categorical(df: pd.DataFrame, columns: List[str]) -> Dict[str, LabelE
     return df, encoders
 
 
-def handle_missing_values(df: pd.DataFrame, strategy: str = 'mean') -> pd.DataFrame:
+def handle_missing_values(df: pd.DataFrame, strategy: str = 'mean', inplace: bool = False) -> pd.DataFrame:
     """Обработка пропущенных значений."""
-    df = df.copy()
+    if not inplace:
+        df = df.copy()
     
     # Для числовых колонок
     numeric_cols = df.select_dtypes(include=[np.number]).columns
     if len(numeric_cols) > 0:
         imputer = SimpleImputer(strategy=strategy)
-        df[numeric_cols] = imputer.fit_transform(df[numeric_cols])
+        # Nullable-типы (Int32 с pd.NA) -> float64 с NaN
+        df[numeric_cols] = imputer.fit_transform(df[numeric_cols].astype('float64'))
     
     # Для текстовых колонок - заполняем пустой строкой
-    text_cols = df.select_dtypes(include=['object']).columns
-    df[text_cols] = df[text_cols].fillna('')
+    fill_missing_text(df)
     
     return df
 
 
-def handle_outliers(df: pd.DataFrame, column: str, method: str = 'iqr') -> pd.DataFrame:
+def fill_missing_text(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Заполнение пропусков пустой строкой во всех текстовых колонках (на месте).
+
+    Текстовые — object, string (после optimize_frame_dtypes) и категории
+    со строковыми значениями; в категории добавляется ''.
+    """
+    text_cols = list(df.select_dtypes(include=['object', 'string']).columns)
+    for col in df.select_dtypes(include=['category']).columns:
+        if not pd.api.types.is_numeric_dtype(df[col].cat.categories.dtype):
+            text_cols.append(col)
+
+    for col in text_cols:
+        column = df[col]
+        if not column.isna().any():
+            continue
+        if isinstance(column.dtype, pd.CategoricalDtype) and '' not in column.cat.categories:
+            column = column.cat.add_categories([''])
+        df[col] = column.fillna('')
+    return df
+
+
+# Категория товара из URL: /catalog/<категория>/
+_CATEGORY_RE = r'/catalog/([^/]+)/'
+
+# Порог робастного z-score (Iglewicz, Hoaglin): 0.6745 * |x - медиана| / MAD
+_MAD_SCALE = 0.6745
+_MAD_THRESHOLD = 3.5
+
+
+def _outlier_group_keys(df: pd.DataFrame, group_by: Union[str, Sequence[str]]) -> List[pd.Series]:
+    """
+    Ключи групп для handle_outliers.
+
+    Имя — колонка df; 'category' без такой колонки берется из product_url;
+    иначе — ключ характеристики (колонка char_<ключ> или разбор characteristics).
+    """
+    names = [group_by] if isinstance(group_by, str) else list(group_by)
+    keys = []
+    for name in names:
+        if name in df.columns:
+            keys.append(df[name])
+        elif name == 'category' and 'product_url' in df.columns:
+            keys.append(df['product_url'].astype(object).str.extract(_CATEGORY_RE)[0].rename(name))
+        elif f'char_{name}' in df.columns:
+            keys.append(df[f'char_{name}'])
+        elif 'characteristics' in df.columns:
+            values = [
+                (_parse_characteristics(value) or {}).get(name)
+                for value in df['characteristics'].to_numpy(dtype=object)
+            ]
+            keys.append(pd.Series(values, index=df.index, dtype=object, name=name))
+        else:
+            raise KeyError(f"Нет колонки или характеристики для группировки: {name}")
+    return keys
+
+
+def outlier_mask(
+    df: pd.DataFrame,
+    column: str,
+    method: str = 'iqr',
+    group_by: Optional[Union[str, Sequence[str]]] = None,
+) -> pd.Series:
+    """
+    Маска выбросов (True — выброс) по всей колонке или внутри групп.
+
+    Границы групп считаются одним groupby по кодам групп (transform),
+    без цикла по группам. Строки с пропуском в column считаются выбросами,
+    как и раньше (handle_outliers их отбрасывал). Вырожденная группа
+    (std или MAD равны нулю) выбросов не содержит, кроме значений,
+    отличных от ее медианы при MAD.
+    """
+    values = pd.to_numeric(df[column], errors='coerce').astype('float64')
+    if group_by is None:
+        grouped = None
+    else:
+        codes = df.groupby(
+            _outlier_group_keys(df, group_by), sort=False, dropna=False, observed=True
+        ).ngroup()
+        grouped = values.groupby(codes.to_numpy(), sort=False)
+
+    def stat(name: str, *args: Any) -> pd.Series:
+        if grouped is None:
+            return pd.Series(getattr(values, name)(*args), index=values.index)
+        return grouped.transform(name, *args)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'iqr':
+            q1, q3 = stat('quantile', 0.25), stat('quantile', 0.75)
+            iqr = q3 - q1
+            keep = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+        elif method == 'zscore':
+            std = stat('std')
+            z_scores = np.abs((values - stat('mean')) / std)
+            keep = (z_scores < 3) | ((std.isna() | (std == 0)) & values.notna())
+        elif method == 'mad':
+            median = stat('median')
+            deviation = (values - median).abs()
+            if grouped is None:
+                mad = pd.Series(deviation.median(), index=values.index)
+            else:
+                mad = deviation.groupby(codes.to_numpy(), sort=False).transform('median')
+            robust_z = _MAD_SCALE * deviation / mad
+            keep = (robust_z <= _MAD_THRESHOLD) | ((mad == 0) & (deviation == 0))
+        else:
+            raise ValueError(f"Неподдерживаемый метод выбросов: {method}")
+    return ~keep.fillna(False).astype(bool)
+
+
+def handle_outliers(
+    df: pd.DataFrame,
+    column: str,
+    method: str = 'iqr',
+    inplace: bool = False,
+    group_by: Optional[Union[str, Sequence[str]]] = None,
+    flag_column: Optional[str] = None,
+) -> pd.DataFrame:
     """
     Обработка выбросов в данных.
     
     Methods:
         'iqr' - использует межквартильный размах
         'zscore' - использует z-score (|z| > 3)
-    """
-    df = df.copy()
+        'mad' - робастный z-score по медиане и MAD (> 3.5)
     
-    if column not in df.columns or df[column].dtype not in ['int64', 'float64']:
-        return df
+    group_by — колонка, категория из URL ('category') или ключ
+    характеристики (например, 'Металл'): границы считаются внутри каждой
+    группы. С flag_column строки не удаляются, а помечаются в этой
+    колонке (True — выброс).
     
-    if method == 'iqr':
-        Q1 = df[column].quantile(0.25)
-        Q3 = df[column].quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        df = df[(df[column] >= lower_bound) & (df[column] <= upper_bound)]
+    При inplace=True исходный DataFrame не копируется заранее: новый
+    создается только фильтрацией строк.
+    """
+    if not inplace:
+        df = df.copy()
     
-    elif method == 'zscore':
-        z_scores = np.abs((df[column] - df[column].mean()) / df[column].std())
-        df = df[z_scores < 3]
+    if column not in df.columns or not _is_numeric(df[column]):
+        return df
     
-    return df
+    mask = outlier_mask(df, column, method=method, group_by=group_by)
+    if flag_column:
+        df[flag_column] = mask
+        return df
+    return df[~mask]
 
 
-def extract_characteristics_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Извлечение признаков из JSON характеристик."""
-    df = df.copy()
+def _parse_characteristics(value: Any) -> Optional[Dict[str, Any]]:
+    """Словарь характеристик из значения колонки (JSON-строка или dict)."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    return value if isinstance(value, dict) else None
+
+
+def _to_categorical(values: pd.Series) -> pd.Series:
+    """Категориальная колонка через factorize (быстрее astype('category'))."""
+    try:
+        codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+        return pd.Series(pd.Categorical.from_codes(codes, uniques), index=values.index)
+    except (TypeError, UnicodeEncodeError):
+        # Нехешируемые значения (списки) или строки с суррогатами
+        try:
+            return values.astype('category')
+        except TypeError:
+            return values
+
+
+def extract_characteristics_features(
+    df: pd.DataFrame,
+    min_coverage: float = 0.0,
+    as_category: bool = True,
+    inplace: bool = False,
+) -> pd.DataFrame:
+    """
+    Извлечение признаков из JSON характеристик.
+
+    Каждая строка разбирается один раз, все колонки char_<ключ> строятся
+    вместе и добавляются одной операцией. Ключи, заполненные реже чем
+    в доле min_coverage строк, отбрасываются. При as_category колонки
+    категориальные — значения характеристик сильно повторяются.
+    """
+    if not inplace:
+        df = df.copy()
     
     if 'characteristics' not in df.columns:
         return df
     
-    # Попытка извлечь общие характеристики
-    common_keys = set()
-    for char_str in df['characteristics'].dropna():
-        try:
-            char_dict = json.loads(char_str) if isinstance(char_str, str) else char_str
-            if isinstance(char_dict, dict):
-                common_keys.update(char_dict.keys())
-        except:
-            pass
-    
-    # Создание колонок для каждой характеристики
-    for key in common_keys:
-        df[f'char_{key}'] = df['characteristics'].apply(
-            lambda x: _extract_char_value(x, key)
+    # Один разбор на строку; DataFrame из списка словарей собирает
+    # все колонки сразу (в порядке первого появления ключа)
+    parsed = [
+        _parse_characteristics(value) or {}
+        for value in df['characteristics'].to_numpy(dtype=object)
+    ]
+    features_df = pd.DataFrame(parsed, index=df.index, dtype=object)
+    if len(features_df.columns) == 0:
+        return df
+    
+    coverage = features_df.notna().mean()
+    features_df = features_df.loc[:, coverage >= min_coverage]
+    features_df.columns = [f'char_{key}' for key in features_df.columns]
+    
+    if as_category:
+        features_df = pd.DataFrame(
+            {col: _to_categorical(features_df[col]) for col in features_df.columns},
+            index=df.index,
         )
     
-    return df
+    # Повторный вызов заменяет уже извлеченные колонки
+    df = df.drop(columns=[col for col in features_df.columns if col in df.columns])
+    return pd.concat([df, features_df], axis=1)
 
 
-def _extract_char_value(char_str: Any, key: str) -> Optional[str]:
-    """Извлечение значения характеристики по ключу."""
-    try:
-        char_dict = json.loads(char_str) if isinstance(char_str, str) else char_str
-        if isinstance(char_dict, dict):
-            return char_dict.get(key)
-    except:
-        pass
-    return None
+# Хук инструментирования: получает статистику каждого шага
+StepHook = Callable[[Dict[str, Any]], None]
+
+
+def _run_step(
+    name: str,
+    step: Callable[[pd.DataFrame], pd.DataFrame],
+    df: pd.DataFrame,
+    hook: Optional[StepHook],
+) -> pd.DataFrame:
+    """Выполнение шага; с хуком — замер времени и пика памяти (tracemalloc)."""
+    if hook is None:
+        return step(df)
+    
+    rows_in = len(df)
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    result = step(df)
+    seconds = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    hook({
+        'step': name,
+        'seconds': seconds,
+        'rows_in': rows_in,
+        'rows_out': len(result),
+        # Сколько памяти шаг занимал сверх уже выделенной: в пике и после
+        'peak_bytes': peak - base,
+        'retained_bytes': current - base,
+        'frame_bytes': int(result.memory_usage(deep=False).sum()),
+    })
+    return result
+
+
+def print_step_stats(stats: Dict[str, Any]) -> None:
+    """Хук по умолчанию: строка статистики шага в stdout."""
+    print(
+        f"⏱ {stats['step']}: {stats['seconds'] * 1000:.0f} мс, "
+        f"строк {stats['rows_in']} -> {stats['rows_out']}, "
+        f"пик +{stats['peak_bytes'] / 2**20:.1f} МБ, "
+        f"DataFrame {stats['frame_bytes'] / 2**20:.1f} МБ"
+    )
 
 
 def preprocess_product_data(
     df: Optional[pd.DataFrame] = None,
     handle_missing: bool = True,
     handle_outliers_price: bool = True,
-    extract_features: bool = True
+    extract_features: bool = True,
+    with_description: bool = False,
+    inplace: bool = False,
+    step_hook: Optional[StepHook] = None,
+    optimize_dtypes: bool = True,
+    outlier_method: str = 'iqr',
+    outlier_group_by: Optional[Union[str, Sequence[str]]] = None,
 ) -> pd.DataFrame:
-    """Комплексная предобработка данных продуктов."""
+    """
+    Комплексная предобработка данных продуктов.
+
+    Описания загружаются только при with_description=True.
+
+    Шаги работают на одной рабочей копии, а не копируют DataFrame каждый:
+    переданный df копируется один раз в начале, а при inplace=True
+    изменяется сам. step_hook получает время и пик памяти каждого шага
+    (например, print_step_stats). При optimize_dtypes результат приводится
+    к компактным типам (optimize_frame_dtypes). outlier_method и
+    outlier_group_by передаются в handle_outliers (границы выбросов цены
+    внутри категорий, металлов и т.п.).
+    """
     if df is None:
-        df = load_data_from_db()
-    
-    # Нормализация
-    df = normalize_data(df)
-    
-    # Обработка пропущенных значений
-    if handle_missing:
-        df = handle_missing_values(df)
+        columns = HOT_COLUMNS + ['description'] if with_description else HOT_COLUMNS
+        df = load_data_from_db(columns)
+    else:
+        source = df
+        if with_description:
+            df = attach_descriptions(df)
+        # attach_descriptions уже вернул новый DataFrame — вторая копия не нужна
+        if not inplace and df is source:
+            df = df.copy()
     
-    # Обработка выбросов в цене
-    if handle_outliers_price and 'price' in df.columns:
-        df = handle_outliers(df, 'price', method='iqr')
-    
-    # Извлечение признаков из характеристик
-    if extract_features:
-        df = extract_characteristics_features(df)
+    tracing = step_hook is not None and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    try:
+        # Нормализация
+        df = _run_step('normalize', lambda d: normalize_data(d, inplace=True), df, step_hook)
+        
+        # Обработка пропущенных значений
+        if handle_missing:
+            df = _run_step(
+                'missing_values', lambda d: handle_missing_values(d, inplace=True), df, step_hook
+            )
+        
+        # Обработка выбросов в цене
+        if handle_outliers_price and 'price' in df.columns:
+            df = _run_step(
+                'outliers',
+                lambda d: handle_outliers(
+                    d, 'price', method=outlier_method, inplace=True, group_by=outlier_group_by
+                ),
+                df,
+                step_hook,
+            )
+        
+        # Извлечение признаков из характеристик
+        if extract_features:
+            df = _run_step(
+                'characteristics_features',
+                lambda d: extract_characteristics_features(d, inplace=True),
+                df,
+                step_hook,
+            )
+        
+        # Компактные типы (после заполнения пропусков цена снова float64)
+        if optimize_dtypes:
+            df = _run_step(
+                'optimize_dtypes', lambda d: optimize_frame_dtypes(d, inplace=True), df, step_hook
+            )
+    finally:
+        if tracing:
+            tracemalloc.stop()
     
     return df
-
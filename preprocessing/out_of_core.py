@@ -0,0 +1,409 @@
+"""Предобработка данных больше оперативной памяти.
+
+Два прохода по порциям вместо одного DataFrame в памяти:
+
+1. collect_statistics — объединяемая статистика по числовым колонкам
+   (число значений и пропусков, среднее и дисперсия по Чану, квантили
+   по скетчу KLL) и набор ключей характеристик;
+2. apply_statistics — заполнение пропусков, отсечение выбросов (IQR или
+   z-score) и признаки char_* по готовой статистике, порция за порцией.
+
+preprocess_out_of_core связывает оба прохода и пишет результат в
+Parquet. Память ограничена размером порции и скетчей (~k значений на
+колонку), а не числом строк.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from preprocessing.data_preprocessor import (
+    HOT_COLUMNS,
+    DEFAULT_CHUNK_SIZE,
+    iter_data_from_db,
+    normalize_data,
+    extract_characteristics_features,
+    fill_missing_text,
+)
+
+# Размер компактора KLL: ошибка ранга порядка долей процента, память ~3k значений
+DEFAULT_SKETCH_SIZE = 1000
+
+
+class QuantileSketch:
+    """
+    Объединяемый скетч квантилей KLL.
+
+    Значения хранятся по уровням: элемент уровня h представляет 2**h
+    исходных значений. Переполненный уровень сортируется, и каждый второй
+    элемент (со случайным сдвигом) переносится уровнем выше. Пока сжатий
+    не было, квантили точные (как Series.quantile).
+    """
+
+    def __init__(self, k: int = DEFAULT_SKETCH_SIZE, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # Нечетный остаток остается на своем уровне
+                keep = items[len(items) - len(items) % 2:]
+                items = items[:len(items) - len(items) % 2]
+                promoted = items[int(self._rng.integers(2))::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: Any) -> 'QuantileSketch':
+        """Добавление пачки значений (NaN пропускаются)."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.count += len(values)
+            self._compress()
+        return self
+
+    def update_constant(self, value: float, count: int) -> 'QuantileSketch':
+        """Добавление count одинаковых значений за O(log count)."""
+        if count <= 0 or np.isnan(value):
+            return self
+        # Двоичное разложение: по одному элементу на уровень с нужным весом
+        for level in range(int(count).bit_length()):
+            if count >> level & 1:
+                while len(self.levels) <= level:
+                    self.levels.append(np.empty(0))
+                self.levels[level] = np.append(self.levels[level], float(value))
+        self.count += int(count)
+        self._compress()
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Объединение со скетчем другой порции."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def copy(self) -> 'QuantileSketch':
+        return QuantileSketch.from_dict(self.to_dict())
+
+    def quantile(self, q: float) -> float:
+        """Квантиль q (0..1); NaN для пустого скетча."""
+        if self.count == 0:
+            return float('nan')
+        if all(len(items) == 0 for items in self.levels[1:]):
+            return float(np.quantile(self.levels[0], q))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind='stable')
+        values, weights = values[order], weights[order]
+        # Ранг элемента — середина его веса
+        ranks = (np.cumsum(weights) - weights / 2) / weights.sum()
+        return float(np.interp(q, ranks, values))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'k': self.k,
+            'count': self.count,
+            'levels': [items.tolist() for items in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(k=state['k'])
+        sketch.count = state['count']
+        sketch.levels = [np.asarray(items, dtype=float) for items in state['levels']]
+        return sketch
+
+
+class ColumnStatistics:
+    """Объединяемая статистика числовой колонки."""
+
+    def __init__(self, sketch_size: int = DEFAULT_SKETCH_SIZE):
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch(sketch_size)
+
+    def update(self, values: pd.Series) -> 'ColumnStatistics':
+        array = values.to_numpy(dtype=float, na_value=np.nan)
+        present = array[~np.isnan(array)]
+        self.missing += len(array) - len(present)
+        if len(present):
+            mean_b = float(present.mean())
+            self._merge_moments(len(present), mean_b, float(((present - mean_b) ** 2).sum()))
+            self.sketch.update(present)
+        return self
+
+    def _merge_moments(self, n_b: int, mean_b: float, m2_b: float) -> None:
+        # Объединение по Чану: точно для любого разбиения на порции
+        n = self.count + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * self.count * n_b / n
+        self.count = n
+
+    def merge(self, other: 'ColumnStatistics') -> 'ColumnStatistics':
+        self.missing += other.missing
+        if other.count:
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.sketch.merge(other.sketch)
+        return self
+
+    def std(self, ddof: int = 1) -> float:
+        """Стандартное отклонение (ddof=1, как Series.std)."""
+        if self.count - ddof <= 0:
+            return float('nan')
+        return math.sqrt(self.m2 / (self.count - ddof))
+
+    def quantile(self, q: float) -> float:
+        return self.sketch.quantile(q)
+
+    def fill_value(self, strategy: str = 'mean') -> float:
+        """Значение для пропусков (strategy — как у SimpleImputer)."""
+        if strategy == 'mean':
+            return self.mean if self.count else float('nan')
+        if strategy == 'median':
+            return self.quantile(0.5)
+        raise ValueError(f"Неподдерживаемая стратегия заполнения: {strategy}")
+
+    def imputed(self, value: float) -> 'ColumnStatistics':
+        """Статистика колонки после заполнения пропусков значением value."""
+        result = ColumnStatistics.from_dict(self.to_dict())
+        if self.missing and not np.isnan(value):
+            result._merge_moments(self.missing, value, 0.0)
+            result.sketch.update_constant(value, self.missing)
+            result.missing = 0
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'missing': self.missing,
+            'mean': self.mean,
+            'm2': self.m2,
+            'sketch': self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'ColumnStatistics':
+        stats = cls()
+        stats.count = state['count']
+        stats.missing = state['missing']
+        stats.mean = state['mean']
+        stats.m2 = state['m2']
+        stats.sketch = QuantileSketch.from_dict(state['sketch'])
+        return stats
+
+
+def collect_statistics(
+    chunks: Iterable[pd.DataFrame],
+    sketch_size: int = DEFAULT_SKETCH_SIZE,
+    extract_features: bool = True,
+) -> Dict[str, Any]:
+    """
+    Первый проход: статистика по потоку порций.
+
+    Returns:
+        Dict: rows, columns (колонка -> ColumnStatistics) и
+        feature_keys (ключи характеристик в порядке первого появления)
+    """
+    columns: Dict[str, ColumnStatistics] = {}
+    feature_keys: Dict[str, None] = {}
+    rows = 0
+    for chunk in chunks:
+        chunk = normalize_data(chunk)
+        rows += len(chunk)
+        for col in chunk.select_dtypes(include=[np.number]).columns:
+            columns.setdefault(col, ColumnStatistics(sketch_size)).update(chunk[col])
+        if extract_features and 'characteristics' in chunk.columns:
+            features = extract_characteristics_features(
+                chunk[['characteristics']], as_category=False, inplace=True
+            )
+            feature_keys.update(dict.fromkeys(
+                col[len('char_'):] for col in features.columns if col.startswith('char_')
+            ))
+    return {'rows': rows, 'columns': columns, 'feature_keys': list(feature_keys)}
+
+
+def outlier_bounds(stats: ColumnStatistics, method: str = 'iqr') -> Tuple[float, float]:
+    """Границы допустимых значений (как handle_outliers)."""
+    if method == 'iqr':
+        q1, q3 = stats.quantile(0.25), stats.quantile(0.75)
+        iqr = q3 - q1
+        return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    if method == 'zscore':
+        std = stats.std()
+        return stats.mean - 3 * std, stats.mean + 3 * std
+    raise ValueError(f"Неподдерживаемый метод выбросов: {method}")
+
+
+def apply_statistics(
+    df: pd.DataFrame,
+    statistics: Dict[str, Any],
+    handle_missing: bool = True,
+    strategy: str = 'mean',
+    outlier_column: Optional[str] = 'price',
+    method: str = 'iqr',
+    extract_features: bool = True,
+) -> pd.DataFrame:
+    """
+    Второй проход: обработка одной порции по готовой статистике.
+
+    Шаги — как у preprocess_product_data; набор колонок char_*
+    одинаков для всех порций (ключи из collect_statistics).
+    """
+    df = normalize_data(df)
+    columns: Dict[str, ColumnStatistics] = statistics['columns']
+
+    if handle_missing:
+        for col, stats in columns.items():
+            if col in df.columns:
+                df[col] = df[col].astype('float64').fillna(stats.fill_value(strategy))
+        fill_missing_text(df)
+
+    if outlier_column and outlier_column in columns and outlier_column in df.columns:
+        stats = columns[outlier_column]
+        if handle_missing:
+            # Границы считаются по уже заполненной колонке, как в памяти
+            stats = stats.imputed(stats.fill_value(strategy))
+        lower, upper = outlier_bounds(stats, method)
+        values = df[outlier_column].to_numpy(dtype=float, na_value=np.nan)
+        if method == 'zscore':
+            # |z| < 3 строго, как в handle_outliers
+            with np.errstate(divide='ignore', invalid='ignore'):
+                keep = np.abs((values - stats.mean) / stats.std()) < 3
+        else:
+            keep = (values >= lower) & (values <= upper)
+        df = df[keep]
+
+    if extract_features and 'characteristics' in df.columns:
+        df = extract_characteristics_features(df, as_category=False, inplace=True)
+        char_columns = [f'char_{key}' for key in statistics['feature_keys']]
+        features = pd.DataFrame(
+            {col: df[col] if col in df.columns else None for col in char_columns},
+            index=df.index,
+        ).astype('string')
+        df = pd.concat(
+            [df.drop(columns=[col for col in df.columns if col.startswith('char_')]), features],
+            axis=1,
+        )
+
+    return df
+
+
+def _to_arrow(df: pd.DataFrame, schema: Optional[pa.Schema]) -> pa.Table:
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('string')
+    if 'characteristics' in df.columns:
+        # JSONB-словари хранятся строками, как в снимке
+        df['characteristics'] = df['characteristics'].map(
+            lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+        )
+    if schema is not None:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Колонка, пустая в первой порции, иначе получила бы тип null
+    schema = pa.schema([
+        field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+        for field in table.schema
+    ])
+    return table.cast(schema)
+
+
+def preprocess_out_of_core(
+    output_path: Union[str, Path],
+    source: Optional[Callable[[], Iterable[pd.DataFrame]]] = None,
+    columns: Optional[List[str]] = None,
+    shop: Optional[str] = None,
+    chunksize: int = DEFAULT_CHUNK_SIZE,
+    handle_missing: bool = True,
+    strategy: str = 'mean',
+    handle_outliers_price: bool = True,
+    method: str = 'iqr',
+    extract_features: bool = True,
+    sketch_size: int = DEFAULT_SKETCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Предобработка порциями с записью результата в Parquet.
+
+    source — функция, возвращающая новый поток порций (вызывается дважды,
+    по разу на проход); по умолчанию — серверный курсор iter_data_from_db.
+
+    Returns:
+        Dict: rows_in, rows_out, chunks, bounds и значения заполнения
+    """
+    if source is None:
+        def source() -> Iterable[pd.DataFrame]:
+            return iter_data_from_db(columns or HOT_COLUMNS, shop=shop, chunksize=chunksize)
+
+    statistics = collect_statistics(source(), sketch_size, extract_features)
+    outlier_column = 'price' if handle_outliers_price else None
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(f'.{output_path.name}.tmp')
+    writer = None
+    rows_out = 0
+    chunks = 0
+    try:
+        for chunk in source():
+            result = apply_statistics(
+                chunk, statistics, handle_missing, strategy,
+                outlier_column, method, extract_features,
+            )
+            table = _to_arrow(result, writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+            rows_out += len(result)
+            chunks += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        tmp_path.replace(output_path)
+
+    columns_stats = statistics['columns']
+    summary: Dict[str, Any] = {
+        'rows_in': statistics['rows'],
+        'rows_out': rows_out,
+        'chunks': chunks,
+        'fill_values': {
+            col: stats.fill_value(strategy) for col, stats in columns_stats.items()
+        } if handle_missing else {},
+        'bounds': None,
+    }
+    if outlier_column in columns_stats:
+        stats = columns_stats[outlier_column]
+        if handle_missing:
+            stats = stats.imputed(stats.fill_value(strategy))
+        summary['bounds'] = list(outlier_bounds(stats, method))
+    return summary
@@ -0,0 +1,282 @@
+"""Сохраняемый конвейер предобработки без повторного обучения.
+
+PreprocessingPipeline повторяет шаги preprocess_product_data, но все
+параметры (средние для заполнения пропусков, границы выбросов, словари
+кодирования, параметры стандартизации, набор колонок char_*) вычисляются
+один раз в fit/partial_fit, хранятся в JSON и применяются к новым
+порциям через transform. Ежедневное обновление обрабатывает только
+новые строки.
+"""
+
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from preprocessing.data_preprocessor import (
+    normalize_data,
+    extract_characteristics_features,
+    iter_data_from_db,
+    HOT_COLUMNS,
+    fill_missing_text,
+)
+from config.settings import DATA_DIR
+
+DEFAULT_PIPELINE_PATH = DATA_DIR / 'preprocessing_pipeline.json'
+
+# Размер выборки для квантилей (границ выбросов) при потоковом обучении
+_RESERVOIR_SIZE = 100_000
+
+
+class PreprocessingPipeline:
+    """
+    Обученный конвейер предобработки.
+
+    Шаги transform: нормализация -> заполнение пропусков -> отсечение
+    выбросов -> признаки из характеристик -> кодирование категорий ->
+    стандартизация.
+
+    - fit: обучение с нуля
+    - partial_fit: дообучение на следующей порции (средние и дисперсии
+      объединяются точно, квантилям выбросов служит равномерная выборка)
+    - transform: только применение сохраненных параметров
+    """
+
+    def __init__(
+        self,
+        categorical_columns: Optional[List[str]] = None,
+        scale_columns: Optional[List[str]] = None,
+        outlier_column: Optional[str] = 'price',
+        extract_features: bool = True,
+        min_coverage: float = 0.0,
+    ):
+        self.categorical_columns = list(categorical_columns if categorical_columns is not None else ['shop'])
+        self.scale_columns = list(scale_columns if scale_columns is not None else ['price'])
+        self.outlier_column = outlier_column
+        self.extract_features = extract_features
+        self.min_coverage = min_coverage
+        self._reset()
+
+    def _reset(self) -> None:
+        # Моменты числовых колонок: колонка -> [n, mean, M2]
+        self.moments: Dict[str, List[float]] = {}
+        self.encoders: Dict[str, Dict[str, int]] = {col: {} for col in self.categorical_columns}
+        # Покрытие ключей характеристик: ключ -> число строк; всего строк
+        self.key_counts: Dict[str, int] = {}
+        self.rows_seen = 0
+        self._reservoir: List[float] = []
+        self._reservoir_seen = 0
+        self._rng = random.Random(0)
+
+    # --- обучение ---
+
+    def _update_moments(self, df: pd.DataFrame) -> None:
+        for col in df.select_dtypes(include=[np.number]).columns:
+            values = df[col].to_numpy(dtype=float, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            n_b = float(len(values))
+            mean_b = float(values.mean())
+            m2_b = float(((values - mean_b) ** 2).sum())
+            n_a, mean_a, m2_a = self.moments.get(col, [0.0, 0.0, 0.0])
+            # Объединение по Чану: точно для любого разбиения на порции
+            n = n_a + n_b
+            delta = mean_b - mean_a
+            self.moments[col] = [
+                n,
+                mean_a + delta * n_b / n,
+                m2_a + m2_b + delta ** 2 * n_a * n_b / n,
+            ]
+
+    def _update_reservoir(self, df: pd.DataFrame) -> None:
+        if not self.outlier_column or self.outlier_column not in df.columns:
+            return
+        values = df[self.outlier_column].dropna().to_numpy(dtype=float)
+        for value in values:
+            self._reservoir_seen += 1
+            if len(self._reservoir) < _RESERVOIR_SIZE:
+                self._reservoir.append(float(value))
+            else:
+                slot = self._rng.randrange(self._reservoir_seen)
+                if slot < _RESERVOIR_SIZE:
+                    self._reservoir[slot] = float(value)
+
+    def _update_key_counts(self, df: pd.DataFrame) -> None:
+        if not self.extract_features or 'characteristics' not in df.columns:
+            return
+        features = extract_characteristics_features(df[['characteristics']], as_category=False)
+        for col in features.columns:
+            if col.startswith('char_'):
+                key = col[len('char_'):]
+                self.key_counts[key] = self.key_counts.get(key, 0) + int(features[col].notna().sum())
+
+    def _update_encoders(self, df: pd.DataFrame) -> None:
+        for col in self.categorical_columns:
+            if col not in df.columns:
+                continue
+            mapping = self.encoders.setdefault(col, {})
+            for value in df[col].dropna().astype(str).unique():
+                if value not in mapping:
+                    mapping[value] = len(mapping)
+
+    def partial_fit(self, df: pd.DataFrame) -> 'PreprocessingPipeline':
+        """Дообучение на очередной порции строк."""
+        df = normalize_data(df)
+        self.rows_seen += len(df)
+        self._update_moments(df)
+        self._update_reservoir(df)
+        self._update_key_counts(df)
+        self._update_encoders(df)
+        return self
+
+    def fit(self, df: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> 'PreprocessingPipeline':
+        """Обучение с нуля на DataFrame или на потоке порций."""
+        self._reset()
+        chunks = [df] if isinstance(df, pd.DataFrame) else df
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    # --- параметры ---
+
+    def mean(self, col: str) -> Optional[float]:
+        stats = self.moments.get(col)
+        return stats[1] if stats else None
+
+    def std(self, col: str) -> Optional[float]:
+        """Стандартное отклонение (ddof=0, как у StandardScaler)."""
+        stats = self.moments.get(col)
+        if not stats or stats[0] == 0:
+            return None
+        return float(np.sqrt(stats[2] / stats[0]))
+
+    def outlier_bounds(self) -> Optional[List[float]]:
+        """Границы IQR по выборке (как handle_outliers(method='iqr'))."""
+        if not self._reservoir:
+            return None
+        values = pd.Series(self._reservoir)
+        q1 = values.quantile(0.25)
+        q3 = values.quantile(0.75)
+        iqr = q3 - q1
+        return [float(q1 - 1.5 * iqr), float(q3 + 1.5 * iqr)]
+
+    def feature_keys(self) -> List[str]:
+        """Ключи характеристик, проходящие порог min_coverage."""
+        min_count = self.min_coverage * self.rows_seen
+        return [key for key, count in self.key_counts.items() if count >= min_count]
+
+    # --- применение ---
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Применение обученных параметров к новой порции (без дообучения)."""
+        df = normalize_data(df)
+
+        # Заполнение пропусков обученными средними
+        # (nullable-типы вроде Int32 у цены -> float64: среднее дробное)
+        for col, (n, mean, _) in self.moments.items():
+            if col in df.columns and n:
+                df[col] = df[col].astype('float64').fillna(mean)
+        fill_missing_text(df)
+
+        # Отсечение выбросов по обученным границам
+        bounds = self.outlier_bounds()
+        if bounds and self.outlier_column in df.columns:
+            column = pd.to_numeric(df[self.outlier_column], errors='coerce')
+            df = df[(column >= bounds[0]) & (column <= bounds[1])]
+
+        # Признаки из характеристик: фиксированный набор колонок
+        if self.extract_features and 'characteristics' in df.columns:
+            df = extract_characteristics_features(df)
+            char_columns = [f'char_{key}' for key in self.feature_keys()]
+            extra = [col for col in df.columns if col.startswith('char_') and col not in char_columns]
+            df = df.drop(columns=extra)
+            for col in char_columns:
+                if col not in df.columns:
+                    df[col] = pd.Series(pd.Categorical([None] * len(df)), index=df.index)
+
+        # Кодирование категорий: незнакомые значения -> -1
+        for col, mapping in self.encoders.items():
+            if col in df.columns:
+                df[f'{col}_code'] = (
+                    df[col].astype(str).map(mapping).fillna(-1).astype('int32')
+                )
+
+        # Стандартизация
+        for col in self.scale_columns:
+            mean, std = self.mean(col), self.std(col)
+            if col in df.columns and mean is not None:
+                values = pd.to_numeric(df[col], errors='coerce')
+                df[col] = (values - mean) / std if std else values - mean
+
+        return df
+
+    def transform_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Потоковое применение к порциям."""
+        for chunk in chunks:
+            yield self.transform(chunk)
+
+    # --- сохранение ---
+
+    def save(self, path: Union[str, Path] = DEFAULT_PIPELINE_PATH) -> None:
+        """Сохранение параметров в JSON."""
+        state = {
+            'params': {
+                'categorical_columns': self.categorical_columns,
+                'scale_columns': self.scale_columns,
+                'outlier_column': self.outlier_column,
+                'extract_features': self.extract_features,
+                'min_coverage': self.min_coverage,
+            },
+            'moments': self.moments,
+            'encoders': self.encoders,
+            'key_counts': self.key_counts,
+            'rows_seen': self.rows_seen,
+            'reservoir': self._reservoir,
+            'reservoir_seen': self._reservoir_seen,
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: Union[str, Path] = DEFAULT_PIPELINE_PATH) -> 'PreprocessingPipeline':
+        """Загрузка конвейера, сохраненного save()."""
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        pipeline = cls(**state['params'])
+        pipeline.moments = state['moments']
+        pipeline.encoders = state['encoders']
+        pipeline.key_counts = state['key_counts']
+        pipeline.rows_seen = state['rows_seen']
+        pipeline._reservoir = state['reservoir']
+        pipeline._reservoir_seen = state['reservoir_seen']
+        return pipeline
+
+
+def preprocess_updates(
+    updated_after: Any,
+    path: Union[str, Path] = DEFAULT_PIPELINE_PATH,
+    columns: Optional[List[str]] = None,
+    update_statistics: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Предобработка только строк, измененных после updated_after.
+
+    Конвейер загружается с диска; при update_statistics его параметры
+    дообучаются на новых строках и сохраняются обратно.
+    """
+    pipeline = PreprocessingPipeline.load(path)
+    chunks = iter_data_from_db(
+        columns or HOT_COLUMNS, updated_after=updated_after, optimize_dtypes=False
+    )
+    for chunk in chunks:
+        if update_statistics:
+            pipeline.partial_fit(chunk)
+        yield pipeline.transform(chunk)
+    if update_statistics:
+        pipeline.save(path)
@@ -0,0 +1,299 @@
+"""Локальный снимок таблицы products в Parquet.
+
+Снимок секционирован по магазину и обновляется инкрементально: из БД
+выгружаются только строки с updated_at не раньше последней отметки
+(с небольшим перекрытием), а дубликаты по id снимаются при чтении.
+Изменения описания (product_texts) и изображений (product_images) тоже
+сдвигают updated_at товара (триггеры миграции 11), поэтому попадают в
+выгрузку и в отпечаток.
+Отпечаток (число строк, сумма id, max(updated_at)) позволяет проверить,
+не устарел ли снимок, одним дешевым запросом.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+
+from config.settings import SNAPSHOT_CONFIG
+from preprocessing.data_preprocessor import (
+    HOT_COLUMNS,
+    iter_data_from_db,
+    load_data_from_db,
+    optimize_frame_dtypes,
+)
+from src.storage import db_cursor
+
+# Колонки, которые хранятся в снимке
+SNAPSHOT_COLUMNS = HOT_COLUMNS + ['updated_at', 'description', 'image_url']
+
+# Явная схема: иначе тип колонки, пустой в одной из порций, выводится как null
+_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('shop', pa.string()),
+    ('product_url', pa.string()),
+    ('title', pa.string()),
+    ('price', pa.int64()),
+    ('characteristics', pa.string()),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+    ('updated_at', pa.timestamp('us', tz='UTC')),
+    ('description', pa.string()),
+    ('image_url', pa.string()),
+])
+
+_MANIFEST = 'manifest.json'
+_DATA = 'products'
+
+# Перекрытие окна выгрузки: строки из долгих транзакций могут
+# закоммититься позже, чем строки с более поздним updated_at
+_OVERLAP = timedelta(minutes=5)
+
+
+def _snapshot_dir(path: Optional[str] = None) -> Path:
+    return Path(path or SNAPSHOT_CONFIG['path'])
+
+
+def db_fingerprint() -> Dict[str, Any]:
+    """Отпечаток текущего состояния products в БД."""
+    with db_cursor() as (conn, cur):
+        cur.execute("""
+            SELECT count(*) AS count,
+                   coalesce(sum(id), 0)::bigint AS id_sum,
+                   max(updated_at) AS max_updated_at
+            FROM products
+        """)
+        row = cur.fetchone()
+    return {
+        'count': int(row['count']),
+        'id_sum': int(row['id_sum']),
+        'max_updated_at': row['max_updated_at'].isoformat() if row['max_updated_at'] else None,
+    }
+
+
+def _digest(fingerprint: Dict[str, Any]) -> str:
+    payload = json.dumps(fingerprint, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()
+
+
+def read_manifest(path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Описание снимка (отметка, отпечаток, число частей) или None."""
+    manifest_path = _snapshot_dir(path) / _MANIFEST
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_manifest(directory: Path, manifest: Dict[str, Any]) -> None:
+    tmp_path = directory / f'{_MANIFEST}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, directory / _MANIFEST)
+
+
+def _write_part(df: pd.DataFrame, data_dir: Path) -> None:
+    """Запись порции строк новой частью датасета (секции shop=<магазин>)."""
+    df = df.copy()
+    # JSONB-словари хранятся строками: схема характеристик не фиксирована
+    df['characteristics'] = df['characteristics'].map(
+        lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+    )
+    df.to_parquet(
+        data_dir,
+        schema=_SCHEMA,
+        partition_cols=['shop'],
+        index=False,
+        basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+    )
+
+
+def _max_updated_at(current: Optional[str], df: pd.DataFrame) -> Optional[str]:
+    if df.empty:
+        return current
+    latest = pd.Timestamp(df['updated_at'].max())
+    if current is not None and latest <= pd.Timestamp(current):
+        return current
+    return latest.isoformat()
+
+
+def _read_parts(data_dir: Path, columns: Sequence[str], deduplicate: bool) -> pd.DataFrame:
+    read_columns = list(dict.fromkeys(list(columns) + ['id', 'updated_at']))
+    df = pd.read_parquet(data_dir, columns=read_columns)
+    if deduplicate:
+        # Обновленная строка встречается в нескольких частях — берется последняя
+        df = df.sort_values('updated_at', kind='stable').drop_duplicates('id', keep='last')
+    return df
+
+
+def _rebuild(directory: Path, fingerprint: Dict[str, Any]) -> int:
+    """Полная выгрузка в новый каталог с атомарной заменой старого."""
+    tmp_dir = directory / f'.{_DATA}-{uuid.uuid4().hex}'
+    watermark = None
+    rows = 0
+    try:
+        for chunk in iter_data_from_db(SNAPSHOT_COLUMNS, optimize_dtypes=False):
+            _write_part(chunk, tmp_dir)
+            watermark = _max_updated_at(watermark, chunk)
+            rows += len(chunk)
+        _swap(directory, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _write_manifest(directory, {
+        'columns': SNAPSHOT_COLUMNS,
+        'watermark': watermark,
+        'fingerprint': _digest(fingerprint),
+        'db_fingerprint': fingerprint,
+        'parts': 1,
+        'refreshed_at': datetime.now().isoformat(),
+    })
+    return rows
+
+
+def _swap(directory: Path, new_data_dir: Path) -> None:
+    data_dir = directory / _DATA
+    shutil.rmtree(data_dir, ignore_errors=True)
+    if new_data_dir.exists():
+        os.replace(new_data_dir, data_dir)
+    else:
+        # Пустая таблица
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+
+def _compact(directory: Path) -> None:
+    """Перезапись снимка без дубликатов одной частью."""
+    data_dir = directory / _DATA
+    tmp_dir = directory / f'.{_DATA}-{uuid.uuid4().hex}'
+    try:
+        df = _read_parts(data_dir, SNAPSHOT_COLUMNS, deduplicate=True)
+        if not df.empty:
+            _write_part(df[SNAPSHOT_COLUMNS], tmp_dir)
+        _swap(directory, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def refresh_snapshot(path: Optional[str] = None, full: bool = False) -> Dict[str, Any]:
+    """
+    Обновление локального снимка.
+
+    Если отпечаток БД не изменился, в БД уходит только один запрос.
+    Иначе выгружаются строки после отметки; если после этого число
+    строк или сумма id снимка расходятся с БД (были удаления),
+    снимок пересобирается полностью.
+
+    Returns:
+        Dict: режим ('fresh', 'incremental', 'full') и число выгруженных строк
+    """
+    directory = _snapshot_dir(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    data_dir = directory / _DATA
+
+    fingerprint = db_fingerprint()
+    manifest = read_manifest(path)
+
+    if (
+        full
+        or manifest is None
+        or manifest.get('columns') != SNAPSHOT_COLUMNS
+        or not data_dir.exists()
+    ):
+        return {'mode': 'full', 'rows': _rebuild(directory, fingerprint)}
+
+    if manifest['fingerprint'] == _digest(fingerprint):
+        return {'mode': 'fresh', 'rows': 0}
+
+    watermark = manifest['watermark']
+    since = datetime.fromisoformat(watermark) - _OVERLAP if watermark else None
+    rows = 0
+    parts = manifest['parts']
+    for chunk in iter_data_from_db(SNAPSHOT_COLUMNS, optimize_dtypes=False, updated_after=since):
+        _write_part(chunk, data_dir)
+        watermark = _max_updated_at(watermark, chunk)
+        rows += len(chunk)
+        parts += 1
+
+    # Удаления инкрементальная выгрузка не видит — сверяемся с отпечатком
+    ids = _read_parts(data_dir, ['id'], deduplicate=parts > 1)['id']
+    if len(ids) != fingerprint['count'] or int(ids.sum()) != fingerprint['id_sum']:
+        return {'mode': 'full', 'rows': _rebuild(directory, fingerprint)}
+
+    if parts > SNAPSHOT_CONFIG['max_parts']:
+        _compact(directory)
+        parts = 1
+
+    manifest.update({
+        'watermark': watermark,
+        'fingerprint': _digest(fingerprint),
+        'db_fingerprint': fingerprint,
+        'parts': parts,
+        'refreshed_at': datetime.now().isoformat(),
+    })
+    _write_manifest(directory, manifest)
+    return {'mode': 'incremental', 'rows': rows}
+
+
+def snapshot_fingerprint(path: Optional[str] = None) -> Optional[str]:
+    """Отпечаток данных снимка (None, если снимка нет)."""
+    manifest = read_manifest(path)
+    return manifest['fingerprint'] if manifest else None
+
+
+def is_snapshot_stale(path: Optional[str] = None) -> bool:
+    """Отличается ли снимок от текущего состояния БД."""
+    return snapshot_fingerprint(path) != _digest(db_fingerprint())
+
+
+def load_snapshot(
+    columns: Optional[Sequence[str]] = None,
+    refresh: bool = True,
+    path: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Загрузка товаров из локального снимка.
+
+    При refresh=True снимок сначала обновляется; с refresh=False
+    БД не используется вовсе. Порядок строк и типы — как у
+    load_data_from_db (характеристики — словари, компактные типы колонок).
+    """
+    columns = list(columns or HOT_COLUMNS)
+    unknown = [col for col in columns if col not in SNAPSHOT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Колонок нет в снимке: {', '.join(unknown)}")
+
+    if refresh:
+        refresh_snapshot(path)
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"Снимок не найден: {_snapshot_dir(path)}")
+
+    data_dir = _snapshot_dir(path) / _DATA
+    if not any(data_dir.rglob('*.parquet')):
+        return pd.DataFrame(columns=columns)
+
+    df = _read_parts(data_dir, columns, deduplicate=manifest['parts'] > 1)
+    if 'created_at' in df.columns:
+        df = df.sort_values('created_at', ascending=False, kind='stable')
+    if 'characteristics' in columns:
+        df['characteristics'] = df['characteristics'].map(
+            lambda v: json.loads(v) if isinstance(v, str) else v
+        )
+    return optimize_frame_dtypes(df[columns].reset_index(drop=True), inplace=True)
+
+
+def load_products(columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Загрузка товаров для анализа: из снимка, если он включен
+    (SNAPSHOT_CONFIG['enabled']) и содержит нужные колонки, иначе из БД.
+    """
+    columns = list(columns or HOT_COLUMNS)
+    if SNAPSHOT_CONFIG['enabled'] and all(col in SNAPSHOT_COLUMNS for col in columns):
+        return load_snapshot(columns)
+    return load_data_from_db(columns)
@@ -0,0 +1,176 @@
+"""Разреженная матрица one-hot признаков для моделей sklearn.
+
+Признаки: пары «характеристика=значение», категория из URL и интервал
+цены. Словарь признаков (имя -> номер столбца) сохраняется на диск,
+поэтому новые порции данных кодируются в те же столбцы. Память матрицы
+CSR пропорциональна числу ненулевых элементов, а не строкам × значениям.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from preprocessing.data_preprocessor import _parse_characteristics
+
+_CATEGORY_RE = r'/catalog/([^/]+)/'
+
+
+class SparseFeatureBuilder:
+    """
+    Построитель CSR-матрицы one-hot признаков с постоянным словарем.
+
+    - fit: словарь по данным (редкие значения отбрасываются по min_count)
+      и границы интервалов цены по квантилям
+    - transform: кодирование без изменения словаря (незнакомые значения
+      пропускаются)
+    - partial_fit: дополнение словаря новыми значениями, номера уже
+      известных столбцов не меняются
+    """
+
+    def __init__(self, price_bins: int = 10, min_count: int = 1):
+        self.price_bins = price_bins
+        self.min_count = min_count
+        self.vocabulary: Dict[str, int] = {}
+        self.price_edges: List[float] = []
+
+    def _row_features(self, df: pd.DataFrame) -> List[List[str]]:
+        """Имена признаков каждой строки."""
+        n = len(df)
+        rows: List[List[str]] = [[] for _ in range(n)]
+
+        if 'characteristics' in df.columns:
+            for row, value in enumerate(df['characteristics'].to_numpy(dtype=object)):
+                char_dict = _parse_characteristics(value)
+                if char_dict:
+                    rows[row].extend(
+                        f'char:{key}={char_value}'
+                        for key, char_value in char_dict.items()
+                        if char_value not in (None, '')
+                    )
+
+        if 'product_url' in df.columns:
+            categories = df['product_url'].astype(object).str.extract(_CATEGORY_RE)[0]
+            for row, category in enumerate(categories.to_numpy(dtype=object)):
+                if isinstance(category, str):
+                    rows[row].append(f'category:{category}')
+
+        if 'price' in df.columns and self.price_edges:
+            prices = pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=float)
+            bins = np.searchsorted(np.asarray(self.price_edges), prices, side='right')
+            for row in np.flatnonzero(~np.isnan(prices)):
+                rows[row].append(f'price_bin:{bins[row]}')
+
+        return rows
+
+    def _fit_price_edges(self, df: pd.DataFrame) -> None:
+        if 'price' not in df.columns or self.price_bins < 2:
+            return
+        prices = pd.to_numeric(df['price'], errors='coerce').dropna()
+        if prices.empty:
+            return
+        quantiles = np.linspace(0, 1, self.price_bins + 1)[1:-1]
+        self.price_edges = sorted(set(float(q) for q in prices.quantile(quantiles)))
+
+    def _extend_vocabulary(self, rows: Iterable[List[str]]) -> None:
+        counts: Dict[str, int] = {}
+        for features in rows:
+            for name in features:
+                counts[name] = counts.get(name, 0) + 1
+        for name, count in counts.items():
+            if count >= self.min_count and name not in self.vocabulary:
+                self.vocabulary[name] = len(self.vocabulary)
+
+    def fit(self, df: pd.DataFrame) -> 'SparseFeatureBuilder':
+        """Построение словаря и интервалов цены с нуля."""
+        self.vocabulary = {}
+        self._fit_price_edges(df)
+        self._extend_vocabulary(self._row_features(df))
+        return self
+
+    def partial_fit(self, df: pd.DataFrame) -> 'SparseFeatureBuilder':
+        """Дополнение словаря по новой порции (интервалы цены не меняются)."""
+        if not self.price_edges:
+            self._fit_price_edges(df)
+        self._extend_vocabulary(self._row_features(df))
+        return self
+
+    def transform(self, df: pd.DataFrame) -> sparse.csr_matrix:
+        """CSR-матрица (строки df × столбцы словаря), значения 1.0."""
+        vocabulary = self.vocabulary
+        indptr = [0]
+        indices: List[int] = []
+        for features in self._row_features(df):
+            # set: одинаковый признак в строке — одна единица
+            indices.extend(sorted({vocabulary[name] for name in features if name in vocabulary}))
+            indptr.append(len(indices))
+
+        return sparse.csr_matrix(
+            (
+                np.ones(len(indices), dtype=np.float32),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(indptr, dtype=np.int64),
+            ),
+            shape=(len(df), len(vocabulary)),
+        )
+
+    def fit_transform(self, df: pd.DataFrame) -> sparse.csr_matrix:
+        return self.fit(df).transform(df)
+
+    def get_feature_names_out(self) -> np.ndarray:
+        """Имена столбцов матрицы в порядке номеров."""
+        names = np.empty(len(self.vocabulary), dtype=object)
+        for name, index in self.vocabulary.items():
+            names[index] = name
+        return names
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Сохранение словаря и параметров в JSON."""
+        state = {
+            'price_bins': self.price_bins,
+            'min_count': self.min_count,
+            'price_edges': self.price_edges,
+            'features': self.get_feature_names_out().tolist(),
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'SparseFeatureBuilder':
+        """Загрузка построителя, сохраненного save()."""
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        builder = cls(price_bins=state['price_bins'], min_count=state['min_count'])
+        builder.price_edges = state['price_edges']
+        builder.vocabulary = {name: index for index, name in enumerate(state['features'])}
+        return builder
+
+
+def build_sparse_features(
+    df: pd.DataFrame,
+    vocabulary_path: Optional[Union[str, Path]] = None,
+    update_vocabulary: bool = False,
+) -> sparse.csr_matrix:
+    """
+    CSR-матрица признаков с постоянным словарем на диске.
+
+    Если файла словаря нет, он строится по df и сохраняется; иначе
+    df кодируется в существующие столбцы (при update_vocabulary словарь
+    предварительно дополняется новыми значениями и пересохраняется).
+    """
+    if vocabulary_path is None or not Path(vocabulary_path).exists():
+        builder = SparseFeatureBuilder().fit(df)
+        if vocabulary_path is not None:
+            builder.save(vocabulary_path)
+        return builder.transform(df)
+
+    builder = SparseFeatureBuilder.load(vocabulary_path)
+    if update_vocabulary:
+        builder.partial_fit(df)
+        builder.save(vocabulary_path)
+    return builder.transform(df)
@@ -7,7 +7,27 @@ from .data_quality import (
     check_consistency,
     check_accuracy,
     check_validity,
+    check_validation,
+    revalidate_products,
     generate_quality_report,
+    ingest_quality_trends,
+    product_quality_metrics,
+    approximate_quality_metrics,
+    quality_gate,
+    near_duplicate_section,
+)
+from .sql_backend import sql_quality_metrics
+from .sampling import reservoir_sample, wilson_interval
+from .near_duplicates import (
+    minhash_signatures,
+    duplicate_clusters,
+    find_near_duplicates,
+    refresh_duplicate_clusters,
+)
+from .engine import (
+    compute_quality_metrics,
+    row_hashes,
+    clear_quality_cache,
 )
 
 __all__ = [
@@ -17,6 +37,23 @@ __all__ = [
     "check_consistency",
     "check_accuracy",
     "check_validity",
+    "check_validation",
+    "revalidate_products",
     "generate_quality_report",
+    "ingest_quality_trends",
+    "approximate_quality_metrics",
+    "quality_gate",
+    "near_duplicate_section",
+    "compute_quality_metrics",
+    "product_quality_metrics",
+    "sql_quality_metrics",
+    "reservoir_sample",
+    "wilson_interval",
+    "minhash_signatures",
+    "duplicate_clusters",
+    "find_near_duplicates",
+    "refresh_duplicate_clusters",
+    "row_hashes",
+    "clear_quality_cache",
 ]
 
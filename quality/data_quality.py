@@ -11,153 +11,372 @@ if str(project_root) not in sys.path:
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Optional, Sequence, Tuple, Any
 from datetime import datetime
 
-from preprocessing.data_preprocessor import load_data_from_db
+from preprocessing.data_preprocessor import HOT_COLUMNS, iter_data_from_db
+from preprocessing.snapshot import (
+    SNAPSHOT_COLUMNS,
+    db_fingerprint,
+    load_products,
+    load_snapshot,
+    refresh_snapshot,
+    snapshot_fingerprint,
+)
+from config.settings import QUALITY_CONFIG, SNAPSHOT_CONFIG
+from utils.validators import validate_products_frame, summarize_validation, VALIDATION_ERRORS
+from quality.engine import (
+    accuracy_metrics,
+    cached_quality_metrics,
+    completeness_metrics,
+    compute_quality_metrics,
+    consistency_metrics,
+    disk_cached_metrics,
+    profile_columns,
+    row_hashes,
+    validity_metrics,
+)
+from quality.sql_backend import products_row_count, sql_quality_metrics
+from quality.sampling import estimate_metrics, gate_breaches, reservoir_sample
+from quality.near_duplicates import find_near_duplicates
+from src.duplicates import duplicate_cluster_summary
+from src.ingest_metrics import RULE_NAMES, load_ingest_runs, rolling_ingest_metrics
+from src.storage import db_cursor
+
+# Полнота описаний и изображений тоже входит в оценку качества
+QUALITY_COLUMNS = HOT_COLUMNS + ['description', 'image_url']
 
 
 def check_completeness(df: pd.DataFrame) -> Dict[str, float]:
     """Проверка полноты данных (отсутствие пропусков)."""
-    completeness = {}
-    total_rows = len(df)
-    
-    for col in df.columns:
-        non_null_count = df[col].notna().sum()
-        completeness[col] = (non_null_count / total_rows) * 100 if total_rows > 0 else 0
-    
-    return completeness
+    return completeness_metrics(profile_columns(df), len(df))
 
 
 def check_consistency(df: pd.DataFrame) -> Dict[str, Any]:
-    """Проверка согласованности данных."""
-    consistency_issues = {}
-    
-    # Проверка типов данных
-    type_consistency = {}
-    for col in df.columns:
-        expected_type = df[col].dtype
-        type_consistency[col] = str(expected_type)
-    
-    # Проверка дубликатов
-    duplicates = df.duplicated().sum()
-    
-    # Проверка URL на уникальность (если есть)
-    if 'product_url' in df.columns:
-        url_duplicates = df['product_url'].duplicated().sum()
-    else:
-        url_duplicates = 0
-    
-    consistency_issues['type_consistency'] = type_consistency
-    consistency_issues['total_duplicates'] = duplicates
-    consistency_issues['url_duplicates'] = url_duplicates
-    
-    return consistency_issues
+    """Проверка согласованности данных (типы, дубликаты записей и URL)."""
+    return consistency_metrics(profile_columns(df), row_hashes(df))
 
 
 def check_accuracy(df: pd.DataFrame) -> Dict[str, Any]:
     """Проверка точности данных."""
-    accuracy_issues = {}
-    
-    # Проверка цен (должны быть положительными)
-    if 'price' in df.columns:
-        negative_prices = (df['price'] < 0).sum()
-        zero_prices = (df['price'] == 0).sum()
-        accuracy_issues['negative_prices'] = negative_prices
-        accuracy_issues['zero_prices'] = zero_prices
-    
-    # Проверка URL (должны быть валидными)
-    if 'product_url' in df.columns:
-        invalid_urls = df['product_url'].str.startswith('http', na=False).sum()
-        total_urls = df['product_url'].notna().sum()
-        accuracy_issues['valid_urls'] = invalid_urls
-        accuracy_issues['invalid_urls'] = total_urls - invalid_urls
-    
-    # Проверка длины названий
-    if 'title' in df.columns:
-        empty_titles = (df['title'].astype(str).str.strip() == '').sum()
-        accuracy_issues['empty_titles'] = empty_titles
-    
-    return accuracy_issues
+    return accuracy_metrics(profile_columns(df))
 
 
 def check_validity(df: pd.DataFrame) -> Dict[str, Any]:
     """Проверка валидности данных (соответствие ожидаемым форматам)."""
-    validity_issues = {}
-    
-    # Проверка формата цен
-    if 'price' in df.columns:
-        numeric_prices = pd.to_numeric(df['price'], errors='coerce').notna().sum()
-        total_prices = df['price'].notna().sum()
-        validity_issues['numeric_prices'] = numeric_prices
-        validity_issues['non_numeric_prices'] = total_prices - numeric_prices
-    
-    # Проверка формата дат (если есть)
-    date_cols = [col for col in df.columns if 'date' in col.lower() or 'created' in col.lower()]
-    for col in date_cols:
-        try:
-            pd.to_datetime(df[col], errors='coerce')
-            valid_dates = pd.to_datetime(df[col], errors='coerce').notna().sum()
-            validity_issues[f'valid_{col}'] = valid_dates
-        except:
-            pass
-    
-    return validity_issues
+    return validity_metrics(profile_columns(df))
+
+
+def check_validation(df: pd.DataFrame) -> Dict[str, int]:
+    """Повторная проверка данных правилами валидации парсера (по колонкам)."""
+    return summarize_validation(validate_products_frame(df))
+
+
+def revalidate_products(df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Повторная валидация сохраненных товаров.
+
+    Returns:
+        pd.DataFrame: id и битовая маска ошибок для невалидных строк
+    """
+    if df is None:
+        df = load_products(['id', 'product_url', 'title', 'price', 'characteristics',
+                            'description', 'image_url'])
+    mask = validate_products_frame(df)
+    invalid = mask.to_numpy() != 0
+    return pd.DataFrame({
+        'id': df['id'].to_numpy()[invalid] if 'id' in df.columns else df.index[invalid],
+        'validation_errors': mask.to_numpy()[invalid],
+    })
 
 
 def calculate_quality_metrics(df: pd.DataFrame) -> Dict[str, Any]:
-    """Расчет метрик качества данных."""
-    metrics = {
-        'total_records': len(df),
-        'total_columns': len(df.columns),
-        'completeness': check_completeness(df),
-        'consistency': check_consistency(df),
-        'accuracy': check_accuracy(df),
-        'validity': check_validity(df),
-    }
-    
-    # Общий score качества (0-100)
-    completeness_scores = list(metrics['completeness'].values())
-    avg_completeness = np.mean(completeness_scores) if completeness_scores else 0
-    
-    consistency_score = 100 if metrics['consistency']['total_duplicates'] == 0 else 80
-    
-    accuracy_issues = sum([
-        metrics['accuracy'].get('negative_prices', 0),
-        metrics['accuracy'].get('zero_prices', 0),
-        metrics['accuracy'].get('empty_titles', 0),
-    ])
-    accuracy_score = max(0, 100 - (accuracy_issues / len(df) * 100)) if len(df) > 0 else 0
-    
-    overall_score = (avg_completeness + consistency_score + accuracy_score) / 3
-    metrics['overall_quality_score'] = round(overall_score, 2)
+    """
+    Расчет метрик качества данных.
+
+    Все проверки выполняются движком quality.engine за один проход по
+    колонкам; повторный расчет для тех же данных берется из кэша.
+    """
+    return cached_quality_metrics(df)
+
+
+def product_quality_metrics(
+    columns: Sequence[str] = QUALITY_COLUMNS,
+    backend: Optional[str] = None,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Метрики качества сохраненных товаров.
+
+    Backends (по умолчанию QUALITY_CONFIG['backend']):
+        'sql' - агрегатный запрос в Postgres, по сети — одна строка итогов
+        'pandas' - загрузка товаров (из снимка, если он включен)
+
+    С use_cache метрики берутся из дискового кэша, пока не изменился
+    отпечаток БД (sql) или снимка (pandas).
+    """
+    columns = list(columns)
+    backend = backend or QUALITY_CONFIG['backend']
+    if backend == 'sql':
+        if not use_cache:
+            return sql_quality_metrics(columns)
+        return disk_cached_metrics(
+            [backend, db_fingerprint(), columns], lambda: sql_quality_metrics(columns)
+        )
+    if backend != 'pandas':
+        raise ValueError(f"Неизвестный backend метрик качества: {backend}")
     
-    return metrics
+    from_snapshot = SNAPSHOT_CONFIG['enabled'] and all(col in SNAPSHOT_COLUMNS for col in columns)
+    if not (use_cache and from_snapshot):
+        return compute_quality_metrics(load_products(columns))
+    refresh_snapshot()
+    return disk_cached_metrics(
+        [backend, snapshot_fingerprint(), columns],
+        lambda: compute_quality_metrics(load_snapshot(columns, refresh=False)),
+    )
+
+
+def approximate_quality_metrics(
+    df: Optional[pd.DataFrame] = None,
+    columns: Sequence[str] = QUALITY_COLUMNS,
+    backend: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Метрики качества по случайной выборке с доверительными интервалами.
+
+    Выборка: для backend 'sql' — TABLESAMPLE (QUALITY_CONFIG['sample_percent']
+    процентов строк методом QUALITY_CONFIG['sample_method'], размер
+    таблицы — products_row_count), для 'pandas' и переданного DataFrame —
+    резервуарная выборка QUALITY_CONFIG['sample_rows'] строк. Структура
+    результата — как у assess_data_quality плюс раздел 'approximate'
+    (см. estimate_metrics).
+    """
+    columns = list(columns)
+    backend = backend or QUALITY_CONFIG['backend']
+    confidence = QUALITY_CONFIG['confidence']
 
+    if df is None and backend == 'sql':
+        percent = QUALITY_CONFIG['sample_percent']
+        sample_metrics = sql_quality_metrics(columns, sample_percent=percent)
+        # Размер выборки TABLESAMPLE случаен: население — число строк таблицы,
+        # а не пересчет объема выборки через процент
+        population = products_row_count()
+        method = f"tablesample {QUALITY_CONFIG['sample_method'].lower()}"
+        return estimate_metrics(sample_metrics, population, confidence, method=method)
+    if df is None and backend != 'pandas':
+        raise ValueError(f"Неизвестный backend метрик качества: {backend}")
 
-def assess_data_quality(df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
-    """Комплексная оценка качества данных."""
+    chunks = [df] if df is not None else iter_data_from_db(columns, optimize_dtypes=False)
+    sample, population = reservoir_sample(chunks, QUALITY_CONFIG['sample_rows'])
+    return estimate_metrics(compute_quality_metrics(sample), population, confidence)
+
+
+def quality_gate(
+    df: Optional[pd.DataFrame] = None,
+    backend: Optional[str] = None,
+    thresholds: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Быстрая проверка качества по выборке с переходом на точный расчет.
+
+    Метрики считаются приближенно; полный проход (assess_data_quality)
+    выполняется, только если доверительный интервал какой-либо метрики
+    выходит за порог (QUALITY_CONFIG['thresholds']).
+
+    Returns:
+        Dict: passed, escalated (был ли точный расчет), breaches
+        (метрики за порогом) и metrics
+    """
+    thresholds = thresholds or QUALITY_CONFIG['thresholds']
+    metrics = approximate_quality_metrics(df, backend=backend)
+    breaches = gate_breaches(metrics, thresholds)
+    escalated = bool(breaches)
+    if escalated:
+        metrics = assess_data_quality(df, backend=backend)
+        breaches = gate_breaches(metrics, thresholds)
+    return {
+        'passed': not breaches,
+        'escalated': escalated,
+        'breaches': breaches,
+        'metrics': metrics,
+    }
+
+
+def assess_data_quality(
+    df: Optional[pd.DataFrame] = None,
+    backend: Optional[str] = None,
+    approximate: bool = False,
+) -> Dict[str, Any]:
+    """
+    Комплексная оценка качества данных.
+
+    Переданный DataFrame оценивается в pandas; без него метрики считаются
+    по сохраненным товарам выбранным backend (product_quality_metrics).
+    С approximate — оценка по выборке через quality_gate (точный расчет
+    только при выходе метрик за пороги).
+    """
+    if approximate:
+        return quality_gate(df, backend=backend)['metrics']
     if df is None:
-        df = load_data_from_db()
+        return product_quality_metrics(QUALITY_COLUMNS, backend=backend)
     
     metrics = calculate_quality_metrics(df)
     return metrics
 
 
-def generate_quality_report(df: Optional[pd.DataFrame] = None) -> str:
-    """Генерация текстового отчета о качестве данных."""
-    if df is None:
-        df = load_data_from_db()
-    
-    metrics = assess_data_quality(df)
-    
+def near_duplicate_section(df: Optional[pd.DataFrame] = None, limit: int = 5) -> List[str]:
+    """
+    Раздел отчета о почти дубликатах.
+
+    Для переданного DataFrame кластеры ищутся сразу (find_near_duplicates),
+    для сохраненных товаров берутся из product_duplicate_clusters
+    (refresh_duplicate_clusters).
+    """
+    lines = []
+    lines.append("\n" + "-" * 60)
+    lines.append("ПОЧТИ ДУБЛИКАТЫ (Near-duplicates)")
+    lines.append("-" * 60)
+
+    if df is not None:
+        clusters = find_near_duplicates(df)
+        ids = df['id'] if 'id' in df.columns else df.index.to_series()
+        titles = pd.Series(df['title'].to_numpy(), index=ids) if 'title' in df.columns else None
+        sizes = clusters['cluster_id'].value_counts()
+        largest = [
+            {
+                'cluster_id': cluster_id,
+                'size': size,
+                'title': titles.get(cluster_id) if titles is not None else None,
+            }
+            for cluster_id, size in sizes.head(limit).items()
+        ]
+        summary = {'clusters': len(sizes), 'products': len(clusters), 'largest': largest}
+    else:
+        with db_cursor() as (conn, cur):
+            summary = duplicate_cluster_summary(cur, limit)
+        if summary['detected_at'] is None:
+            lines.append("Поиск не выполнялся (refresh_duplicate_clusters)")
+            return lines
+        lines.append(f"Поиск выполнен: {summary['detected_at'].strftime('%Y-%m-%d %H:%M')}")
+
+    lines.append(
+        f"Кластеров: {summary['clusters']}, товаров в них: {summary['products']}, "
+        f"лишних копий: {summary['products'] - summary['clusters']}"
+    )
+    for cluster in summary['largest']:
+        lines.append(f"  #{cluster['cluster_id']} ({cluster['size']} шт.): {cluster['title']}")
+    return lines
+
+
+def _percent(part: int, total: int) -> float:
+    return (part / total) * 100 if total > 0 else 0
+
+
+def _ingest_summary(metrics: Dict[str, int]) -> str:
+    """Строка счетчиков одного запуска (или суммы за период)."""
+    seen = metrics.get('products_seen', 0)
+    rejected = metrics.get('rejected', 0)
+    rules = [
+        f"{name} {metrics[f'rejected:{name}']}"
+        for name in RULE_NAMES.values()
+        if metrics.get(f'rejected:{name}')
+    ]
+    line = (
+        f"товаров {seen}, отклонено {rejected} ({_percent(rejected, seen):.1f}%)"
+    )
+    if rules:
+        line += f" [{', '.join(rules)}]"
+    line += (
+        f", обрезано названий {metrics.get('truncated:title', 0)}"
+        f" / описаний {metrics.get('truncated:description', 0)}"
+        f", повторы URL {metrics.get('duplicates:run', 0)}"
+        f" / уже в базе {metrics.get('duplicates:existing', 0)}"
+    )
+    if metrics.get('parse_errors'):
+        line += f", ошибок разбора {metrics['parse_errors']}"
+    if metrics.get('unsaved') or metrics.get('batch_failures'):
+        line += (
+            f", не сохранено {metrics.get('unsaved', 0)}"
+            f" (сбоев записи пачек {metrics.get('batch_failures', 0)})"
+        )
+    return line
+
+
+def ingest_quality_trends(
+    runs: int = 10, days: int = 7, shop: Optional[str] = None
+) -> List[str]:
+    """
+    Раздел отчета с трендами качества загрузки.
+
+    Строится только по ingest_runs/ingest_metrics (счетчики, записанные
+    парсером), поэтому не требует чтения товаров.
+    """
+    with db_cursor() as (conn, cur):
+        recent = load_ingest_runs(cur, limit=runs, shop=shop)
+        rolling = rolling_ingest_metrics(cur, days=days, shop=shop)
+
+    lines = []
+    lines.append("\n" + "-" * 60)
+    lines.append("ТРЕНДЫ КАЧЕСТВА ЗАГРУЗКИ (Ingest)")
+    lines.append("-" * 60)
+    if not recent:
+        lines.append("Запусков парсера еще не было")
+        return lines
+
+    lines.append(f"За {days} дн.: {_ingest_summary(rolling)}")
+    seen = rolling.get('products_seen', 0)
+    if seen:
+        missing = [
+            f"{metric.split(':', 1)[1]} {_percent(value, seen):.1f}%"
+            for metric, value in sorted(rolling.items())
+            if metric.startswith('missing:') and value
+        ]
+        if missing:
+            lines.append(f"Пустые поля: {', '.join(missing)}")
+
+    lines.append("\nПоследние запуски:")
+    for run in recent:
+        started = run['started_at'].strftime('%Y-%m-%d %H:%M')
+        status = "" if run['finished_at'] else " (не завершен)"
+        lines.append(f"#{run['id']} {started}{status}: {_ingest_summary(run['metrics'])}")
+    return lines
+
+
+def generate_quality_report(
+    df: Optional[pd.DataFrame] = None,
+    backend: Optional[str] = None,
+    ingest_only: bool = False,
+    approximate: bool = False,
+) -> str:
+    """
+    Генерация текстового отчета о качестве данных.
+
+    Для отчета по БД (df не передан) добавляются тренды по запускам
+    парсера; ingest_only=True строит только их — без расчета метрик по
+    таблице товаров. С approximate метрики оцениваются по выборке, рядом
+    с ними выводятся доверительные интервалы.
+    """
     report = []
     report.append("=" * 60)
     report.append("ОТЧЕТ О КАЧЕСТВЕ ДАННЫХ")
     report.append("=" * 60)
     report.append(f"\nДата формирования: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    if ingest_only:
+        report.extend(ingest_quality_trends())
+        report.append("\n" + "=" * 60)
+        return "\n".join(report)
+
+    metrics = assess_data_quality(df, backend=backend, approximate=approximate)
+    approx = metrics.get('approximate')
+    intervals = approx['intervals'] if approx else {}
     report.append(f"\nОбщее количество записей: {metrics['total_records']}")
     report.append(f"Общее количество колонок: {metrics['total_columns']}")
+    if approx:
+        report.append(
+            f"Оценка по выборке ({approx['method']}): {approx['sample_size']} строк, "
+            f"доверительные интервалы {approx['confidence'] * 100:.0f}%"
+        )
     report.append(f"\nОБЩАЯ ОЦЕНКА КАЧЕСТВА: {metrics['overall_quality_score']}/100")
     
     report.append("\n" + "-" * 60)
@@ -165,13 +384,21 @@ def generate_quality_report(df: Optional[pd.DataFrame] = None) -> str:
     report.append("-" * 60)
     for col, score in metrics['completeness'].items():
         status = "✓" if score >= 90 else "⚠" if score >= 70 else "✗"
-        report.append(f"{status} {col}: {score:.2f}%")
+        line = f"{status} {col}: {score:.2f}%"
+        if approx:
+            low, high = intervals['completeness'][col]
+            line += f" [{low:.2f}–{high:.2f}%]"
+        report.append(line)
     
     report.append("\n" + "-" * 60)
     report.append("СОГЛАСОВАННОСТЬ ДАННЫХ (Consistency)")
     report.append("-" * 60)
-    report.append(f"Дубликаты записей: {metrics['consistency']['total_duplicates']}")
-    report.append(f"Дубликаты URL: {metrics['consistency'].get('url_duplicates', 0)}")
+    # По выборке дубликаты не пересчитываются на всю таблицу
+    sampled = " (в выборке)" if approx else ""
+    report.append(f"Дубликаты записей: {metrics['consistency']['total_duplicates']}{sampled}")
+    report.append(f"Дубликаты URL: {metrics['consistency'].get('url_duplicates', 0)}{sampled}")
+
+    report.extend(near_duplicate_section(df))
     
     report.append("\n" + "-" * 60)
     report.append("ТОЧНОСТЬ ДАННЫХ (Accuracy)")
@@ -188,6 +415,22 @@ def generate_quality_report(df: Optional[pd.DataFrame] = None) -> str:
     for key, value in validity.items():
         report.append(f"{key}: {value}")
     
+    report.append("\n" + "-" * 60)
+    report.append("ПРАВИЛА ВАЛИДАЦИИ ПАРСЕРА (Validation)")
+    report.append("-" * 60)
+    validation = metrics['validation']
+    line = f"Записей с ошибками: {validation['invalid']} из {validation['total']}"
+    if approx:
+        low, high = intervals['validation']['invalid']
+        line += f" [{low}–{high}]"
+    report.append(line)
+    for message in VALIDATION_ERRORS.values():
+        if validation[message]:
+            report.append(f"✗ {message}: {validation[message]}")
+
+    if df is None:
+        report.extend(ingest_quality_trends())
+    
     report.append("\n" + "=" * 60)
     
     return "\n".join(report)
@@ -0,0 +1,278 @@
+"""Движок метрик качества за один проход по колонкам.
+
+Каждая колонка просматривается один раз: из нее сразу берутся полнота,
+тип и специфичные проверки (цены, URL, названия, даты). Дубликаты
+строк ищутся по 64-битным хешам строк, а не сравнением JSON-строк.
+Результат кэшируется по отпечатку данных: для переданного DataFrame —
+в памяти процесса, для сохраненных товаров — на диске по отпечатку
+снимка или БД, так что повторный отчет по неизменившимся данным их даже
+не загружает.
+"""
+
+import copy
+import hashlib
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config.settings import QUALITY_CONFIG
+from utils.validators import validate_products_frame, summarize_validation
+
+# Кэш в памяти: отпечаток DataFrame -> метрики
+_MEMORY_CACHE: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+
+# Хеш пропуска: фиксированная случайная константа (hash('') == 0, поэтому
+# 0 не годится — пропуск и пустая строка давали бы одинаковые строки)
+_MISSING_HASH = 0x2D6E8F1A93C4B75E
+
+
+def _hash_value(value: Any) -> int:
+    """Хеш значения object-колонки (словари — без учета порядка ключей)."""
+    if isinstance(value, dict):
+        try:
+            return hash(frozenset(value.items()))
+        except TypeError:
+            return hash(json.dumps(value, ensure_ascii=False, sort_keys=True))
+    if isinstance(value, list):
+        return hash(json.dumps(value, ensure_ascii=False, sort_keys=True))
+    if value is None or value is pd.NA or value != value:
+        return _MISSING_HASH
+    return hash(value)
+
+
+def _column_hashes(series: pd.Series) -> np.ndarray:
+    # Для строк встроенный hash() быстрее hash_pandas_object
+    if series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+        return np.fromiter(
+            (_hash_value(value) for value in series.to_numpy(dtype=object)),
+            dtype=np.int64,
+            count=len(series),
+        ).view(np.uint64)
+    return pd.util.hash_pandas_object(series, index=False).to_numpy()
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    64-битный хеш каждой строки.
+
+    Одинаковые строки дают одинаковый хеш (словари сравниваются по
+    содержимому). Хеши object-колонок действительны только в текущем
+    процессе (hash() строк рандомизирован).
+    """
+    if len(df.columns) == 0:
+        return np.zeros(len(df), dtype=np.uint64)
+    hashed = pd.DataFrame(
+        {i: _column_hashes(df[col]) for i, col in enumerate(df.columns)},
+        index=pd.RangeIndex(len(df)),
+    )
+    return pd.util.hash_pandas_object(hashed, index=False).to_numpy()
+
+
+def frame_fingerprint(df: pd.DataFrame, hashes: Optional[np.ndarray] = None) -> str:
+    """Отпечаток DataFrame: колонки, типы и хеши строк."""
+    if hashes is None:
+        hashes = row_hashes(df)
+    digest = hashlib.sha1()
+    digest.update(json.dumps([[str(col), str(df[col].dtype)] for col in df.columns]).encode('utf-8'))
+    digest.update(np.ascontiguousarray(hashes).tobytes())
+    return digest.hexdigest()
+
+
+def _is_date_column(col: str) -> bool:
+    return 'date' in col.lower() or 'created' in col.lower()
+
+
+def profile_columns(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Все проверки колонки за один ее просмотр: колонка -> показатели."""
+    profiles = {}
+    for col in df.columns:
+        series = df[col]
+        profile: Dict[str, Any] = {
+            'non_null': int(series.notna().sum()),
+            'dtype': str(series.dtype),
+        }
+
+        if col == 'price':
+            numeric = pd.to_numeric(series, errors='coerce')
+            profile['numeric'] = int(numeric.notna().sum())
+            profile['negative'] = int((numeric < 0).sum())
+            profile['zero'] = int((numeric == 0).sum())
+        elif col == 'product_url':
+            profile['http'] = int(series.str.startswith('http', na=False).sum())
+            profile['duplicates'] = int(series.duplicated().sum())
+        elif col == 'title':
+            profile['empty'] = int((series.astype(str).str.strip() == '').sum())
+
+        if _is_date_column(str(col)):
+            if pd.api.types.is_datetime64_any_dtype(series):
+                profile['valid_dates'] = profile['non_null']
+            else:
+                try:
+                    profile['valid_dates'] = int(pd.to_datetime(series, errors='coerce').notna().sum())
+                except (TypeError, ValueError):
+                    pass
+
+        profiles[col] = profile
+    return profiles
+
+
+def completeness_metrics(profiles: Dict[str, Dict[str, Any]], total: int) -> Dict[str, float]:
+    """Полнота колонок, % (по профилям profile_columns)."""
+    return {
+        col: (profile['non_null'] / total) * 100 if total > 0 else 0
+        for col, profile in profiles.items()
+    }
+
+
+def consistency_metrics(profiles: Dict[str, Dict[str, Any]], hashes: np.ndarray) -> Dict[str, Any]:
+    """Типы колонок и дубликаты (строк — по хешам row_hashes, URL — по профилю)."""
+    return {
+        'type_consistency': {col: profile['dtype'] for col, profile in profiles.items()},
+        'total_duplicates': int(pd.Series(hashes).duplicated().sum()),
+        'url_duplicates': profiles['product_url']['duplicates'] if 'product_url' in profiles else 0,
+    }
+
+
+def accuracy_metrics(profiles: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Цены вне допустимых значений, невалидные URL и пустые названия."""
+    accuracy: Dict[str, Any] = {}
+    if 'price' in profiles:
+        accuracy['negative_prices'] = profiles['price']['negative']
+        accuracy['zero_prices'] = profiles['price']['zero']
+    if 'product_url' in profiles:
+        url = profiles['product_url']
+        accuracy['valid_urls'] = url['http']
+        accuracy['invalid_urls'] = url['non_null'] - url['http']
+    if 'title' in profiles:
+        accuracy['empty_titles'] = profiles['title']['empty']
+    return accuracy
+
+
+def validity_metrics(profiles: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Соответствие форматам: числовые цены и разбираемые даты."""
+    validity: Dict[str, Any] = {}
+    if 'price' in profiles:
+        price = profiles['price']
+        validity['numeric_prices'] = price['numeric']
+        validity['non_numeric_prices'] = price['non_null'] - price['numeric']
+    for col, profile in profiles.items():
+        if 'valid_dates' in profile:
+            validity[f'valid_{col}'] = profile['valid_dates']
+    return validity
+
+
+def compute_quality_metrics(df: pd.DataFrame, hashes: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    Метрики качества (та же структура, что у calculate_quality_metrics)
+    за один проход по колонкам.
+    """
+    total = len(df)
+    if hashes is None:
+        hashes = row_hashes(df)
+    profiles = profile_columns(df)
+
+    metrics = {
+        'total_records': total,
+        'total_columns': len(df.columns),
+        'completeness': completeness_metrics(profiles, total),
+        'consistency': consistency_metrics(profiles, hashes),
+        'accuracy': accuracy_metrics(profiles),
+        'validity': validity_metrics(profiles),
+        'validation': summarize_validation(validate_products_frame(df)),
+    }
+
+    metrics['overall_quality_score'] = quality_score(metrics)
+    return metrics
+
+
+def quality_score(metrics: Dict[str, Any]) -> float:
+    """Общий score качества (0-100) по разделам метрик."""
+    total = metrics['total_records']
+    completeness_scores = list(metrics['completeness'].values())
+    avg_completeness = np.mean(completeness_scores) if completeness_scores else 0
+    consistency_score = 100 if metrics['consistency']['total_duplicates'] == 0 else 80
+    accuracy_issues = sum([
+        metrics['accuracy'].get('negative_prices', 0),
+        metrics['accuracy'].get('zero_prices', 0),
+        metrics['accuracy'].get('empty_titles', 0),
+    ])
+    accuracy_score = max(0, 100 - (accuracy_issues / total * 100)) if total > 0 else 0
+    overall_score = (avg_completeness + consistency_score + accuracy_score) / 3
+    return round(float(overall_score), 2)
+
+
+def _remember(key: str, metrics: Dict[str, Any]) -> None:
+    _MEMORY_CACHE[key] = metrics
+    _MEMORY_CACHE.move_to_end(key)
+    while len(_MEMORY_CACHE) > QUALITY_CONFIG['cache_size']:
+        _MEMORY_CACHE.popitem(last=False)
+
+
+def cached_quality_metrics(df: pd.DataFrame) -> Dict[str, Any]:
+    """Метрики DataFrame с кэшем в памяти по отпечатку данных."""
+    hashes = row_hashes(df)
+    key = frame_fingerprint(df, hashes)
+    # Вызывающий получает копию: его изменения не попадают в кэш
+    if key in _MEMORY_CACHE:
+        _MEMORY_CACHE.move_to_end(key)
+        return copy.deepcopy(_MEMORY_CACHE[key])
+    metrics = compute_quality_metrics(df, hashes)
+    _remember(key, metrics)
+    return copy.deepcopy(metrics)
+
+
+def _read_disk_cache(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_disk_cache(path: Path, cache: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, default=str)
+    tmp_path.replace(path)
+
+
+def disk_cached_metrics(key_parts: Sequence[Any], compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Метрики из дискового кэша (QUALITY_CONFIG['cache_path']) по ключу.
+
+    key_parts должны включать отпечаток данных (снимка или БД): пока он
+    не изменился, compute не вызывается и данные не загружаются.
+    """
+    key = hashlib.sha1(json.dumps(list(key_parts), default=str).encode('utf-8')).hexdigest()
+    cache_path = Path(QUALITY_CONFIG['cache_path'])
+    cache = _read_disk_cache(cache_path)
+    if key in cache:
+        return cache[key]
+
+    # Метрики — только числа и строки; последние записи вытесняют старые
+    cache[key] = json.loads(json.dumps(compute(), default=_to_builtin))
+    for stale in list(cache)[:-QUALITY_CONFIG['cache_size']]:
+        del cache[stale]
+    _write_disk_cache(cache_path, cache)
+    return cache[key]
+
+
+def _to_builtin(value: Any) -> Any:
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    return str(value)
+
+
+def clear_quality_cache() -> None:
+    """Сброс кэша метрик в памяти и на диске."""
+    _MEMORY_CACHE.clear()
+    Path(QUALITY_CONFIG['cache_path']).unlink(missing_ok=True)
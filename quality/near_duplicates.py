@@ -0,0 +1,324 @@
+"""Поиск почти дубликатов товаров: MinHash и LSH.
+
+Текст товара (название, описание и характеристики) нормализуется и
+разбивается на байтовые k-граммы. Подписи MinHash считаются пачками
+векторными операциями numpy, кандидаты находятся LSH-полосами:
+товары с одинаковой полосой подписи попадают в одну корзину и
+сравниваются только с первым товаром корзины. Так число сравнений
+линейно по числу товаров, попарного перебора нет. Кандидаты
+проверяются по доле совпавших значений подписи (оценка сходства
+Жаккара) и объединяются в кластеры компонентами связности.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from config.settings import NEAR_DUPLICATE_CONFIG
+from preprocessing.data_preprocessor import iter_data_from_db
+from src.db_pool import db_cursor, transaction
+from src.duplicates import save_duplicate_clusters
+
+TEXT_COLUMNS = ['title', 'description', 'characteristics']
+
+# Значение подписи товара без k-грамм (слишком короткий текст)
+_EMPTY = np.uint32(0xFFFFFFFF)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_FNV_PRIME = np.uint64(0x100000001B3)
+# Сдвиг значения при заполнении пустой ячейки подписи из соседней
+_ROTATION = np.uint32(0x9E3779B1)
+
+
+def _characteristics_text(value: Any) -> str:
+    if not isinstance(value, dict):
+        return ''
+    return ' '.join(f'{key} {val}' for key, val in sorted(value.items()))
+
+
+def product_texts(df: pd.DataFrame, max_length: Optional[int] = None) -> pd.Series:
+    """Нормализованный текст товаров: название, описание, характеристики."""
+    max_length = max_length or NEAR_DUPLICATE_CONFIG['max_text_length']
+    parts = []
+    for col in TEXT_COLUMNS:
+        if col not in df.columns:
+            continue
+        if col == 'characteristics':
+            parts.append(df[col].map(_characteristics_text).astype(object))
+        else:
+            parts.append(df[col].astype(object).where(df[col].notna(), ''))
+    if not parts:
+        return pd.Series('', index=df.index)
+
+    text = parts[0].astype(str)
+    for part in parts[1:]:
+        text = text + ' ' + part.astype(str)
+    return (
+        text.str.lower()
+        # Явный набор букв: у строк pyarrow \w в регулярных выражениях — только ASCII
+        .str.replace(r'[^0-9a-zа-яё]+', ' ', regex=True)
+        .str.strip()
+        .str.slice(0, max_length)
+    )
+
+
+def _shingle_hashes(texts: Sequence[str], size: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    64-битные хеши байтовых k-грамм всех текстов подряд.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: хеши (uint64) и число k-грамм каждого текста
+    """
+    encoded = [text.encode('utf-8') for text in texts]
+    lengths = np.fromiter((len(item) for item in encoded), dtype=np.int64, count=len(encoded))
+    counts = np.maximum(lengths - size + 1, 0)
+    if not counts.sum():
+        return np.empty(0, dtype=np.uint64), counts
+
+    # Полиномиальный хеш каждого окна (переполнение uint64 — модуль 2**64)
+    buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    windows = sliding_window_view(buffer, size)
+    grams = np.full(len(windows), seed, dtype=np.uint64)
+    for j in range(size):
+        grams = grams * _FNV_PRIME + windows[:, j]
+
+    # Только k-граммы внутри одного текста, без стыков соседних
+    starts = np.cumsum(lengths) - lengths
+    first = np.cumsum(counts) - counts
+    positions = np.repeat(starts - first, counts) + np.arange(counts.sum())
+    hashes = grams[positions] * _MIX
+    hashes ^= hashes >> np.uint64(29)
+    return hashes * _MIX, counts
+
+
+def _densify(signatures: np.ndarray) -> None:
+    """
+    Заполнение пустых ячеек подписи (вращение): ячейка берет значение
+    ближайшей непустой справа по кругу, сдвинутое на расстояние до нее.
+    """
+    rows = np.flatnonzero((signatures == _EMPTY).any(axis=1) & (signatures != _EMPTY).any(axis=1))
+    if not len(rows):
+        return
+    block = signatures[rows]
+    width = block.shape[1]
+    columns = np.arange(width)
+    filled = np.where(block != _EMPTY, columns, 2 * width)
+    # Ближайшая непустая ячейка не левее текущей (по удвоенной строке)
+    nearest = np.minimum.accumulate(
+        np.concatenate([filled, filled + width], axis=1)[:, ::-1], axis=1
+    )[:, ::-1][:, :width]
+    distance = (nearest - columns).astype(np.uint32)
+    source = np.take_along_axis(block, nearest % width, axis=1)
+    signatures[rows] = source + distance * _ROTATION
+
+
+def minhash_signatures(
+    texts: Sequence[str],
+    num_perm: Optional[int] = None,
+    shingle_size: Optional[int] = None,
+    batch_bytes: Optional[int] = None,
+    seed: int = 1,
+) -> np.ndarray:
+    """
+    Подписи MinHash текстов (одна перестановка с уплотнением).
+
+    k-грамма — shingle_size байт UTF-8 (кириллица — 2 байта на букву).
+    Каждая k-грамма хешируется один раз: младшие биты хеша выбирают
+    ячейку подписи, старшие — значение, в ячейке остается минимум.
+    Пустые ячейки заполняются из соседних (_densify), так что доля
+    совпавших ячеек по-прежнему оценивает сходство Жаккара, а время
+    расчета не зависит от num_perm. Тексты обрабатываются пачками
+    примерно по batch_bytes символов.
+
+    Returns:
+        np.ndarray: матрица (len(texts), num_perm) uint32; у текстов короче
+            shingle_size все значения равны 0xFFFFFFFF
+    """
+    config = NEAR_DUPLICATE_CONFIG
+    num_perm = num_perm or config['num_perm']
+    shingle_size = shingle_size or config['shingle_size']
+    batch_bytes = batch_bytes or config['batch_bytes']
+    if shingle_size < 1:
+        raise ValueError("shingle_size должен быть положительным")
+
+    texts = list(texts)
+    signatures = np.full((len(texts), num_perm), _EMPTY, dtype=np.uint32)
+    flat = signatures.reshape(-1)
+
+    # Номер пачки — по накопленной длине текстов
+    batches = np.cumsum([len(text) for text in texts], dtype=np.int64) // batch_bytes
+    edges = np.r_[0, np.flatnonzero(np.diff(batches)) + 1, len(texts)]
+
+    for start, stop in zip(edges[:-1], edges[1:]):
+        hashes, counts = _shingle_hashes(texts[start:stop], shingle_size, seed)
+        if not len(hashes):
+            continue
+        rows = np.repeat(np.arange(start, stop, dtype=np.int64), counts)
+        cells = rows * num_perm + (hashes % np.uint64(num_perm)).astype(np.int64)
+        # 0xFFFFFFFF зарезервировано для пустых ячеек
+        values = np.minimum(hashes >> np.uint64(32), np.uint64(0xFFFFFFFE)).astype(np.uint32)
+        np.minimum.at(flat, cells, values)
+
+    _densify(signatures)
+    return signatures
+
+
+def signature_similarity(
+    signatures: np.ndarray, left: np.ndarray, right: np.ndarray, batch: int = 100_000
+) -> np.ndarray:
+    """Доля совпавших значений подписей пар (оценка сходства Жаккара)."""
+    similarity = np.empty(len(left), dtype=np.float32)
+    for start in range(0, len(left), batch):
+        stop = start + batch
+        similarity[start:stop] = (
+            signatures[left[start:stop]] == signatures[right[start:stop]]
+        ).mean(axis=1)
+    return similarity
+
+
+def lsh_candidate_pairs(
+    signatures: np.ndarray,
+    bands: Optional[int] = None,
+    threshold: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Пары почти дубликатов по LSH-полосам подписей.
+
+    В каждой полосе строки с одинаковым ключом полосы связываются с первой
+    строкой корзины; пары из всех полос проверяются по сходству подписей.
+
+    Returns:
+        Tuple: индексы строк (left < right) и сходство пар не ниже threshold
+    """
+    bands = bands or NEAR_DUPLICATE_CONFIG['bands']
+    threshold = NEAR_DUPLICATE_CONFIG['threshold'] if threshold is None else threshold
+    n, num_perm = signatures.shape
+    rows_per_band = num_perm // bands
+    if rows_per_band < 1:
+        raise ValueError("Полос больше, чем значений в подписи")
+
+    # Товары без k-грамм совпали бы друг с другом — в поиск не попадают
+    indexed = np.flatnonzero((signatures != _EMPTY).any(axis=1))
+    if not len(indexed):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    positions = np.arange(len(indexed))
+    pair_keys = []
+    for band in range(bands):
+        block = signatures[indexed, band * rows_per_band:(band + 1) * rows_per_band]
+        keys = np.zeros(len(indexed), dtype=np.uint64)
+        for j in range(rows_per_band):
+            keys = (keys ^ block[:, j].astype(np.uint64)) * _FNV_PRIME
+
+        # Стабильная сортировка: первая строка корзины — с наименьшим индексом
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        is_first = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        leaders = order[np.maximum.accumulate(np.where(is_first, positions, 0))]
+        members = ~is_first
+        left, right = indexed[leaders[members]], indexed[order[members]]
+        pair_keys.append(left.astype(np.int64) * n + right)
+
+    # Одна пара может найтись в нескольких полосах
+    unique = np.unique(np.concatenate(pair_keys)) if pair_keys else np.empty(0, dtype=np.int64)
+    left, right = unique // n, unique % n
+    similarity = signature_similarity(signatures, left, right)
+    keep = similarity >= threshold
+    return left[keep], right[keep], similarity[keep]
+
+
+def duplicate_clusters(
+    signatures: np.ndarray,
+    ids: Optional[Sequence[Any]] = None,
+    bands: Optional[int] = None,
+    threshold: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Кластеры почти дубликатов по подписям MinHash.
+
+    Представитель кластера — строка с наименьшим индексом; cluster_id —
+    ее id. similarity — сходство подписи товара с представителем.
+
+    Returns:
+        pd.DataFrame: product_id, cluster_id, similarity (только кластеры
+            из двух и более товаров)
+    """
+    n = len(signatures)
+    ids = np.asarray(ids if ids is not None else np.arange(n))
+    left, right, _ = lsh_candidate_pairs(signatures, bands, threshold)
+    if not len(left):
+        return pd.DataFrame({
+            'product_id': ids[:0],
+            'cluster_id': ids[:0],
+            'similarity': np.empty(0, dtype=np.float32),
+        })
+
+    graph = coo_matrix((np.ones(len(left), dtype=np.int8), (left, right)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    members = np.flatnonzero(np.bincount(labels)[labels] > 1)
+
+    # Первый по индексу член каждой компоненты — представитель
+    representative = np.full(labels.max() + 1, n, dtype=np.int64)
+    np.minimum.at(representative, labels[members], members)
+    leaders = representative[labels[members]]
+
+    clusters = pd.DataFrame({
+        'product_id': ids[members],
+        'cluster_id': ids[leaders],
+        'similarity': signature_similarity(signatures, members, leaders),
+    })
+    return clusters.sort_values(['cluster_id', 'similarity'], ascending=[True, False], ignore_index=True)
+
+
+def find_near_duplicates(
+    df: pd.DataFrame, id_column: str = 'id', threshold: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    Кластеры почти дубликатов в DataFrame товаров.
+
+    id товара берется из id_column, а без нее — из индекса df.
+    """
+    signatures = minhash_signatures(product_texts(df).tolist())
+    ids = df[id_column].to_numpy() if id_column in df.columns else df.index.to_numpy()
+    return duplicate_clusters(signatures, ids, threshold=threshold)
+
+
+def refresh_duplicate_clusters(
+    shop: Optional[str] = None, chunksize: int = 50_000
+) -> Dict[str, int]:
+    """
+    Пересчет кластеров почти дубликатов сохраненных товаров.
+
+    Товары читаются порциями, в памяти остаются только подписи
+    (num_perm * 4 байт на товар); результат заменяет содержимое
+    product_duplicate_clusters.
+
+    Returns:
+        Dict: products, clusters, duplicates (лишние копии)
+    """
+    ids: List[np.ndarray] = []
+    signatures: List[np.ndarray] = []
+    chunks: Iterable[pd.DataFrame] = iter_data_from_db(
+        ['id'] + TEXT_COLUMNS, shop=shop, chunksize=chunksize, optimize_dtypes=False
+    )
+    for chunk in chunks:
+        ids.append(chunk['id'].to_numpy())
+        signatures.append(minhash_signatures(product_texts(chunk).tolist()))
+
+    if signatures:
+        clusters = duplicate_clusters(np.concatenate(signatures), np.concatenate(ids))
+    else:
+        clusters = duplicate_clusters(np.empty((0, NEAR_DUPLICATE_CONFIG['num_perm']), dtype=np.uint32))
+
+    with db_cursor() as (conn, cur), transaction(cur):
+        save_duplicate_clusters(cur, clusters, shop=shop)
+
+    cluster_count = clusters['cluster_id'].nunique()
+    return {
+        'products': int(sum(len(part) for part in ids)),
+        'clusters': int(cluster_count),
+        'duplicates': int(len(clusters) - cluster_count),
+    }
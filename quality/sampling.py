@@ -0,0 +1,179 @@
+"""Приближенная оценка качества по случайной выборке.
+
+Метрики считаются по выборке строк (TABLESAMPLE в Postgres или
+резервуарная выборка из потока порций), счетчики пересчитываются на всю
+таблицу, и для каждой доли строится доверительный интервал Уилсона.
+Дубликаты по выборке не оцениваются (их доля нелинейно зависит от
+размера выборки) — в отчете это значения выборки.
+"""
+
+import math
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from quality.engine import quality_score
+
+# Разделы метрик, в которых значения — количества строк
+_COUNT_SECTIONS = ['accuracy', 'validity', 'validation']
+
+
+def wilson_interval(
+    successes: int,
+    n: int,
+    confidence: float = 0.95,
+    population: Optional[int] = None,
+) -> Tuple[float, float]:
+    """
+    Доверительный интервал доли (0..1) по Уилсону.
+
+    population — размер всей таблицы: для выборки без возвращения
+    интервал сужается и при n == population вырождается в точку.
+    """
+    if n <= 0:
+        return 0.0, 1.0
+    p = successes / n
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    if population is not None and population > 1:
+        z *= math.sqrt(max(population - n, 0) / (population - 1))
+    z2 = z * z
+    denominator = 1 + z2 / n
+    center = (p + z2 / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def reservoir_sample(
+    chunks: Iterable[pd.DataFrame], size: int, seed: int = 0
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Равномерная выборка size строк из потока порций за один проход.
+
+    Каждой строке назначается случайный ключ, в резервуаре остаются
+    строки с наименьшими ключами; строки порции, ключ которых больше
+    худшего в заполненном резервуаре, отбрасываются сразу.
+
+    Returns:
+        Tuple[pd.DataFrame, int]: выборка и общее число строк потока
+    """
+    rng = np.random.default_rng(seed)
+    reservoir: Optional[pd.DataFrame] = None
+    keys = np.empty(0)
+    total = 0
+
+    for chunk in chunks:
+        total += len(chunk)
+        chunk_keys = rng.random(len(chunk))
+        if reservoir is not None and len(reservoir) >= size:
+            candidates = chunk_keys < keys.max()
+            chunk, chunk_keys = chunk[candidates], chunk_keys[candidates]
+            if not len(chunk):
+                continue
+
+        if reservoir is None:
+            reservoir, keys = chunk.reset_index(drop=True), chunk_keys
+        else:
+            reservoir = pd.concat([reservoir, chunk], ignore_index=True)
+            keys = np.concatenate([keys, chunk_keys])
+
+        if len(reservoir) > size:
+            # Порядок строк потока сохраняется
+            keep = np.sort(np.argpartition(keys, size - 1)[:size])
+            reservoir, keys = reservoir.iloc[keep].reset_index(drop=True), keys[keep]
+
+    if reservoir is None:
+        return pd.DataFrame(), 0
+    return reservoir, total
+
+
+def estimate_metrics(
+    sample_metrics: Dict[str, Any],
+    population: int,
+    confidence: float = 0.95,
+    method: str = 'reservoir',
+) -> Dict[str, Any]:
+    """
+    Метрики всей таблицы по метрикам выборки.
+
+    Структура та же, что у compute_quality_metrics: проценты полноты —
+    по выборке, количества пересчитаны на population. В разделе
+    'approximate' — размер выборки и интервалы (полнота — в процентах,
+    количества — в строках).
+    """
+    n = sample_metrics['total_records']
+    population = max(population, n)
+
+    def scaled(count: int) -> int:
+        return int(round(count / n * population)) if n else 0
+
+    def interval(count: int) -> List[int]:
+        low, high = wilson_interval(count, n, confidence, population)
+        return [int(math.floor(low * population)), int(math.ceil(high * population))]
+
+    intervals: Dict[str, Dict[str, Any]] = {'completeness': {}}
+    completeness = {}
+    for col, percent in sample_metrics['completeness'].items():
+        completeness[col] = percent
+        low, high = wilson_interval(round(percent * n / 100), n, confidence, population)
+        intervals['completeness'][col] = [low * 100, high * 100]
+
+    metrics = {
+        'total_records': population,
+        'total_columns': sample_metrics['total_columns'],
+        'completeness': completeness,
+        'consistency': sample_metrics['consistency'],
+    }
+    for section in _COUNT_SECTIONS:
+        metrics[section] = {}
+        intervals[section] = {}
+        for key, count in sample_metrics[section].items():
+            if key == 'total':
+                metrics[section][key] = population
+                continue
+            metrics[section][key] = scaled(count)
+            intervals[section][key] = interval(count)
+
+    metrics['overall_quality_score'] = quality_score(metrics)
+    metrics['approximate'] = {
+        'method': method,
+        'sample_size': n,
+        'population': population,
+        'confidence': confidence,
+        'intervals': intervals,
+    }
+    return metrics
+
+
+def gate_breaches(metrics: Dict[str, Any], thresholds: Dict[str, float]) -> List[str]:
+    """
+    Метрики, которые не проходят пороги.
+
+    thresholds:
+        'completeness' - минимальная полнота колонки, %
+        'invalid' - максимальная доля строк с ошибками валидации, %
+
+    Для приближенных метрик порог сравнивается с худшей границей
+    доверительного интервала: метрика проходит, только если весь интервал
+    в допустимых пределах.
+    """
+    approximate = metrics.get('approximate')
+    breaches = []
+
+    if 'completeness' in thresholds:
+        for col, percent in metrics['completeness'].items():
+            if approximate:
+                percent = approximate['intervals']['completeness'][col][0]
+            if percent < thresholds['completeness']:
+                breaches.append(f'completeness:{col}')
+
+    if 'invalid' in thresholds:
+        total = metrics['total_records']
+        invalid = metrics['validation']['invalid']
+        if approximate:
+            invalid = approximate['intervals']['validation']['invalid'][1]
+        if total > 0 and invalid / total * 100 > thresholds['invalid']:
+            breaches.append('validation:invalid')
+
+    return breaches
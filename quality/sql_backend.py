@@ -0,0 +1,236 @@
+"""Расчет метрик качества агрегатным SQL в Postgres.
+
+Все проверки (полнота, дубликаты, цены, названия, URL, правила
+валидации парсера) выполняются одним запросом с агрегатами, и по сети
+передается одна строка итогов вместо всей таблицы products. Результат —
+словарь той же структуры, что у compute_quality_metrics; в
+type_consistency — типы Postgres, а не pandas.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from config.settings import QUALITY_CONFIG
+from preprocessing.data_preprocessor import PRODUCT_COLUMNS, _select_list
+from quality.engine import quality_score, _is_date_column
+from src.storage import db_cursor
+from utils.validators import (
+    VALIDATION_ERRORS,
+    ERR_URL,
+    ERR_TITLE,
+    ERR_PRICE,
+    ERR_DESCRIPTION,
+    ERR_IMAGE_URL,
+    ERR_CHARACTERISTICS,
+)
+
+# Методы TABLESAMPLE: SYSTEM читает случайные страницы, BERNOULLI — все
+# страницы, но отбирает строки независимо
+SAMPLE_METHODS = ('SYSTEM', 'BERNOULLI')
+
+# Все пробельные символы, которые убирает str.strip() (выше U+3000 их нет),
+# в виде E'...' только из \uXXXX: в строках Postgres нет \v и других
+# привычных escape-кодов. Проверка — python tests/check_sql_whitespace.py
+WHITESPACE_CHARS = ''.join(chr(code) for code in range(0x3001) if chr(code).isspace())
+_WHITESPACE = "E'" + ''.join(f'\\u{ord(char):04x}' for char in WHITESPACE_CHARS) + "'"
+
+
+def _strip(expr: str) -> str:
+    return f"btrim({expr}, {_WHITESPACE})"
+
+
+def _is_http_url(expr: str) -> str:
+    # %% — экранирование для подстановки параметров psycopg2
+    return f"({expr} LIKE 'http://%%' OR {expr} LIKE 'https://%%')"
+
+
+def _validation_mask(columns: Sequence[str]) -> str:
+    """Битовая маска ошибок строки — те же правила, что validate_products_frame."""
+    checks: List[str] = []
+
+    if 'product_url' in columns:
+        checks.append(f"CASE WHEN {_is_http_url('product_url')} THEN 0 ELSE {ERR_URL} END")
+    else:
+        checks.append(str(ERR_URL))
+
+    if 'title' in columns:
+        checks.append(
+            f"CASE WHEN char_length({_strip('title')}) BETWEEN 3 AND 500 "
+            f"THEN 0 ELSE {ERR_TITLE} END"
+        )
+    else:
+        checks.append(str(ERR_TITLE))
+
+    if 'price' in columns:
+        checks.append(f"CASE WHEN price > 0 AND price < 10000000 THEN 0 ELSE {ERR_PRICE} END")
+    else:
+        checks.append(str(ERR_PRICE))
+
+    if 'description' in columns:
+        checks.append(
+            f"CASE WHEN char_length({_strip('description')}) > 10000 "
+            f"THEN {ERR_DESCRIPTION} ELSE 0 END"
+        )
+
+    if 'image_url' in columns:
+        checks.append(
+            f"CASE WHEN image_url IS NOT NULL AND NOT {_is_http_url('image_url')} "
+            f"THEN {ERR_IMAGE_URL} ELSE 0 END"
+        )
+
+    if 'characteristics' in columns:
+        value_text = _strip("e.value #>> '{}'")
+        checks.append(f"""CASE WHEN jsonb_typeof(characteristics) IS DISTINCT FROM 'object'
+                OR EXISTS (
+                    SELECT 1 FROM jsonb_each(characteristics) e
+                    WHERE {_strip('e.key')} = ''
+                       OR jsonb_typeof(e.value) <> 'string'
+                       OR {value_text} = ''
+                )
+            THEN {ERR_CHARACTERISTICS} ELSE 0 END""")
+
+    return "\n            | ".join(f"({check})" for check in checks)
+
+
+def _aggregates(columns: Sequence[str]) -> List[str]:
+    aggregates = ["count(*) AS total"]
+    for col in columns:
+        aggregates.append(f'count({col}) AS "non_null:{col}"')
+        aggregates.append(f'min(pg_typeof({col})::text) AS "type:{col}"')
+
+    if 'price' in columns:
+        aggregates.append("count(*) FILTER (WHERE price < 0) AS negative_prices")
+        aggregates.append("count(*) FILTER (WHERE price = 0) AS zero_prices")
+    if 'product_url' in columns:
+        aggregates.append("count(*) FILTER (WHERE product_url LIKE 'http%%') AS valid_urls")
+        aggregates.append("count(DISTINCT product_url) AS distinct_urls")
+    if 'title' in columns:
+        aggregates.append(f"count(*) FILTER (WHERE {_strip('title')} = '') AS empty_titles")
+
+    # id — первичный ключ: строки с ним не повторяются, сравнивать нечего
+    if 'id' not in columns:
+        aggregates.append(f"count(DISTINCT ROW({', '.join(columns)})) AS distinct_rows")
+
+    aggregates.append("count(*) FILTER (WHERE validation_errors <> 0) AS invalid")
+    for code in VALIDATION_ERRORS:
+        aggregates.append(
+            f'count(*) FILTER (WHERE validation_errors & {code} <> 0) AS "error:{code}"'
+        )
+    return aggregates
+
+
+def _quality_query(columns: Sequence[str], sampled: bool = False) -> str:
+    join = ""
+    if 'description' in columns:
+        join = "LEFT JOIN product_texts t ON t.product_id = p.id"
+    tablesample = ""
+    if sampled:
+        method = QUALITY_CONFIG['sample_method'].upper()
+        if method not in SAMPLE_METHODS:
+            raise ValueError(f"Неизвестный метод TABLESAMPLE: {method}")
+        tablesample = f"TABLESAMPLE {method} (%(sample_percent)s)"
+    aggregates = ",\n            ".join(_aggregates(columns))
+    return f"""
+        SELECT
+            {aggregates}
+        FROM (
+            SELECT product_rows.*,
+                ({_validation_mask(columns)}) AS validation_errors
+            FROM (
+                SELECT
+                    {_select_list(columns)}
+                FROM products p {tablesample}
+                {join}
+                WHERE (%(shop)s::text IS NULL OR p.shop = %(shop)s)
+            ) product_rows
+        ) checked
+    """
+
+
+def products_row_count() -> int:
+    """
+    Число строк products для пересчета выборки на всю таблицу.
+
+    Берется оценка планировщика (pg_class.reltuples, обновляется ANALYZE
+    и autovacuum) — без прохода по таблице; если таблица еще не
+    анализировалась, строки считаются count(*).
+    """
+    with db_cursor() as (conn, cur):
+        cur.execute("SELECT reltuples::bigint AS rows FROM pg_class WHERE oid = 'products'::regclass")
+        rows = cur.fetchone()['rows']
+        if rows <= 0:
+            cur.execute("SELECT count(*) AS rows FROM products")
+            rows = cur.fetchone()['rows']
+    return int(rows)
+
+
+def sql_quality_metrics(
+    columns: Optional[Sequence[str]] = None,
+    shop: Optional[str] = None,
+    sample_percent: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Метрики качества товаров, посчитанные в БД одним агрегатным запросом.
+
+    Args:
+        columns: колонки из PRODUCT_COLUMNS (по умолчанию — все, кроме
+            вычисляемой категории)
+        shop: ограничение одним магазином
+        sample_percent: процент строк для TABLESAMPLE — метрики только
+            по выборке (QUALITY_CONFIG['sample_method'])
+    """
+    columns = list(columns or [col for col in PRODUCT_COLUMNS if col != 'category'])
+    params = {'shop': shop, 'sample_percent': sample_percent}
+    with db_cursor() as (conn, cur):
+        cur.execute(_quality_query(columns, sampled=sample_percent is not None), params)
+        row = cur.fetchone()
+
+    total = row['total']
+    completeness = {
+        col: (row[f'non_null:{col}'] / total) * 100 if total > 0 else 0
+        for col in columns
+    }
+
+    url_duplicates = 0
+    if 'product_url' in columns:
+        non_null = row['non_null:product_url']
+        # Как Series.duplicated: пропуски тоже повторяют друг друга
+        url_duplicates = non_null - row['distinct_urls'] + max(total - non_null - 1, 0)
+
+    consistency = {
+        'type_consistency': {col: row[f'type:{col}'] for col in columns},
+        'total_duplicates': 0 if 'id' in columns else total - row['distinct_rows'],
+        'url_duplicates': url_duplicates,
+    }
+
+    accuracy: Dict[str, Any] = {}
+    validity: Dict[str, Any] = {}
+    if 'price' in columns:
+        accuracy['negative_prices'] = row['negative_prices']
+        accuracy['zero_prices'] = row['zero_prices']
+        # Цена в БД — число: нечисловых значений быть не может
+        validity['numeric_prices'] = row['non_null:price']
+        validity['non_numeric_prices'] = 0
+    if 'product_url' in columns:
+        accuracy['valid_urls'] = row['valid_urls']
+        accuracy['invalid_urls'] = row['non_null:product_url'] - row['valid_urls']
+    if 'title' in columns:
+        accuracy['empty_titles'] = row['empty_titles']
+    for col in columns:
+        if _is_date_column(col):
+            validity[f'valid_{col}'] = row[f'non_null:{col}']
+
+    validation = {'total': total, 'invalid': row['invalid']}
+    for code, message in VALIDATION_ERRORS.items():
+        validation[message] = row[f'error:{code}']
+
+    metrics = {
+        'total_records': total,
+        'total_columns': len(columns),
+        'completeness': completeness,
+        'consistency': consistency,
+        'accuracy': accuracy,
+        'validity': validity,
+        'validation': validation,
+    }
+    metrics['overall_quality_score'] = quality_score(metrics)
+    return metrics
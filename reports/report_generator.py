@@ -18,7 +18,8 @@ import pandas as pd
 from analytics.data_analyzer import analyze_products
 from quality.data_quality import assess_data_quality, generate_quality_report
 from visualization.data_visualizer import create_visualizations
-from preprocessing.data_preprocessor import load_data_from_db, preprocess_product_data
+from preprocessing.data_preprocessor import preprocess_product_data
+from preprocessing.snapshot import load_products
 
 
 def ensure_reports_dir() -> Path:
@@ -120,7 +121,7 @@ def generate_summary_report(output_path: Optional[str] = None) -> str:
         reports_dir = ensure_reports_dir()
         output_path = reports_dir / f"summary_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
     
-    df = load_data_from_db()
+    df = load_products()
     
     report = []
     report.append("=" * 80)
@@ -165,7 +166,7 @@ def generate_full_report(output_dir: Optional[str] = None) -> Dict[str, str]:
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
     # Загрузка и предобработка данных
-    df = load_data_from_db()
+    df = load_products()
     df = preprocess_product_data(df)
     
     # Генерация отчетов
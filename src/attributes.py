@@ -0,0 +1,245 @@
+"""Нормализованное хранилище характеристик товаров.
+
+Ключи характеристик интернируются в attr_keys (integer id), значения
+лежат в product_attributes по строке на пару (товар, ключ) вместе с
+числовым значением, если его удалось выделить. Фильтры и подсчет
+покрытия идут по индексам, без разбора JSON.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import psycopg2.extras
+
+from src.db_pool import db_cursor
+
+# Первое число в значении: "3.5 г" -> 3.5, "585" -> 585
+_NUMBER_RE = re.compile(r"[0-9]+(?:[.,][0-9]+)?")
+
+# То же правило на стороне PostgreSQL (для пересборки и миграции)
+_SQL_NUMERIC_VALUE = (
+    "replace(substring({value} FROM '[0-9]+(?:[.,][0-9]+)?'), ',', '.')::double precision"
+)
+
+
+def parse_numeric_value(value: Optional[str]) -> Optional[float]:
+    """Числовое значение характеристики (первое число в строке)."""
+    if not value:
+        return None
+    match = _NUMBER_RE.search(value)
+    if not match:
+        return None
+    return float(match.group(0).replace(",", "."))
+
+
+def create_attributes(cur: psycopg2.extras.RealDictCursor) -> None:
+    """Миграция: таблицы attr_keys и product_attributes с начальным наполнением."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS attr_keys (
+            id   smallserial PRIMARY KEY,
+            name text NOT NULL UNIQUE
+        );
+
+        CREATE TABLE IF NOT EXISTS product_attributes (
+            product_id  integer NOT NULL REFERENCES products (id) ON DELETE CASCADE,
+            attr_key_id smallint NOT NULL REFERENCES attr_keys (id),
+            value       text NOT NULL,
+            value_num   double precision,
+            PRIMARY KEY (product_id, attr_key_id)
+        );
+
+        CREATE INDEX IF NOT EXISTS product_attributes_key_value_idx
+            ON product_attributes (attr_key_id, value);
+        CREATE INDEX IF NOT EXISTS product_attributes_key_num_idx
+            ON product_attributes (attr_key_id, value_num)
+            WHERE value_num IS NOT NULL;
+    """)
+    rebuild_attributes(cur)
+
+
+def widen_attr_key_ids(cur: psycopg2.extras.RealDictCursor) -> None:
+    """Миграция: id ключей характеристик — integer вместо smallint."""
+    cur.execute("""
+        ALTER TABLE product_attributes ALTER COLUMN attr_key_id TYPE integer;
+        ALTER TABLE attr_keys ALTER COLUMN id TYPE integer;
+        ALTER SEQUENCE attr_keys_id_seq AS integer;
+    """)
+
+
+def rebuild_attributes(cur: psycopg2.extras.RealDictCursor) -> None:
+    """Полная пересборка product_attributes из products.characteristics."""
+    # Только отсутствующие ключи: ON CONFLICT расходует значение
+    # последовательности и на уже существующих
+    cur.execute("""
+        INSERT INTO attr_keys (name)
+        SELECT DISTINCT e.key
+        FROM products p
+        CROSS JOIN LATERAL jsonb_each_text(p.characteristics) e
+        WHERE jsonb_typeof(p.characteristics) = 'object'
+          AND NOT EXISTS (SELECT 1 FROM attr_keys k WHERE k.name = e.key)
+        ORDER BY e.key
+        ON CONFLICT (name) DO NOTHING;
+    """)
+    cur.execute("TRUNCATE product_attributes")
+    cur.execute(f"""
+        INSERT INTO product_attributes (product_id, attr_key_id, value, value_num)
+        SELECT p.id, k.id, e.value, {_SQL_NUMERIC_VALUE.format(value='e.value')}
+        FROM products p
+        CROSS JOIN LATERAL jsonb_each_text(p.characteristics) e
+        JOIN attr_keys k ON k.name = e.key
+        WHERE jsonb_typeof(p.characteristics) = 'object'
+          AND e.value <> '';
+    """)
+    cur.execute("ANALYZE attr_keys; ANALYZE product_attributes;")
+
+
+_INSERT_ATTRIBUTES_SQL = """
+    INSERT INTO product_attributes (product_id, attr_key_id, value, value_num)
+    VALUES %s;
+"""
+
+
+def attr_key_ids(cur: psycopg2.extras.RealDictCursor, names: Iterable[str]) -> Dict[str, int]:
+    """
+    id ключей характеристик (недостающие ключи добавляются): имя -> id.
+
+    Сначала ключи ищутся без вставки — существующие не расходуют значения
+    последовательности и не блокируются. Недостающие вставляются в
+    порядке сортировки (параллельные загрузки не ждут друг друга
+    крест-накрест), а вставленные параллельной транзакцией находятся
+    повторным SELECT.
+    """
+    names = sorted(set(names))
+    if not names:
+        return {}
+
+    cur.execute("SELECT id, name FROM attr_keys WHERE name = ANY(%s)", (names,))
+    ids = {row["name"]: row["id"] for row in cur.fetchall()}
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        cur.execute("""
+            INSERT INTO attr_keys (name)
+            SELECT unnest(%s::text[]) AS name
+            ORDER BY name
+            ON CONFLICT (name) DO NOTHING
+            RETURNING id, name
+        """, (missing,))
+        ids.update({row["name"]: row["id"] for row in cur.fetchall()})
+
+        concurrent = [name for name in missing if name not in ids]
+        if concurrent:
+            cur.execute("SELECT id, name FROM attr_keys WHERE name = ANY(%s)", (concurrent,))
+            ids.update({row["name"]: row["id"] for row in cur.fetchall()})
+    return ids
+
+
+def save_attributes(
+    cur: psycopg2.extras.RealDictCursor,
+    characteristics_by_id: Dict[int, Dict[str, str]],
+    page_size: int = 1000,
+) -> None:
+    """
+    Замена характеристик товаров в product_attributes.
+
+    Вызывается внутри транзакции пакетной записи: старые строки товаров
+    удаляются, новые вставляются одним запросом на страницу.
+    """
+    if not characteristics_by_id:
+        return
+
+    cur.execute(
+        "DELETE FROM product_attributes WHERE product_id = ANY(%s)",
+        (list(characteristics_by_id.keys()),),
+    )
+    pairs = [
+        (product_id, key, value)
+        for product_id, characteristics in characteristics_by_id.items()
+        for key, value in (characteristics or {}).items()
+        if key and value
+    ]
+    if not pairs:
+        return
+
+    key_ids = attr_key_ids(cur, (key for _, key, _ in pairs))
+    rows = [
+        (product_id, key_ids[key], value, parse_numeric_value(value))
+        for product_id, key, value in pairs
+    ]
+    psycopg2.extras.execute_values(
+        cur,
+        _INSERT_ATTRIBUTES_SQL,
+        rows,
+        template="(%s::integer, %s::integer, %s::text, %s::double precision)",
+        page_size=page_size,
+    )
+
+
+def attribute_coverage(cur: Optional[psycopg2.extras.RealDictCursor] = None) -> List[Dict]:
+    """Сколько товаров имеют каждую характеристику (index-only scan)."""
+    if cur is None:
+        with db_cursor() as (_, pooled_cur):
+            return attribute_coverage(pooled_cur)
+
+    cur.execute("""
+        SELECT k.name AS key, c.count
+        FROM (
+            SELECT attr_key_id, count(*) AS count
+            FROM product_attributes
+            GROUP BY attr_key_id
+        ) c
+        JOIN attr_keys k ON k.id = c.attr_key_id
+        ORDER BY c.count DESC;
+    """)
+    return cur.fetchall()
+
+
+def load_attribute_values(
+    cur: Optional[psycopg2.extras.RealDictCursor] = None,
+    shop: Optional[str] = None,
+) -> pd.DataFrame:
+    """Разложенные характеристики: product_id, key, value (без разбора JSON)."""
+    if cur is None:
+        with db_cursor() as (_, pooled_cur):
+            return load_attribute_values(pooled_cur, shop)
+
+    cur.execute("""
+        SELECT a.product_id, k.name AS key, a.value
+        FROM product_attributes a
+        JOIN attr_keys k ON k.id = a.attr_key_id
+        JOIN products p ON p.id = a.product_id
+        WHERE (%s::text IS NULL OR p.shop = %s)
+        ORDER BY a.product_id;
+    """, (shop, shop))
+    return pd.DataFrame(cur.fetchall(), columns=['product_id', 'key', 'value'])
+
+
+def find_products_by_attribute(
+    key: str,
+    value: Optional[str] = None,
+    min_value: Optional[float] = None,
+    max_value: Optional[float] = None,
+    cur: Optional[psycopg2.extras.RealDictCursor] = None,
+) -> List[int]:
+    """
+    Поиск товаров по характеристике.
+
+    value — точное совпадение строки, min_value/max_value — диапазон
+    по числовому значению.
+    """
+    if cur is None:
+        with db_cursor() as (_, pooled_cur):
+            return find_products_by_attribute(key, value, min_value, max_value, pooled_cur)
+
+    cur.execute("""
+        SELECT a.product_id
+        FROM product_attributes a
+        JOIN attr_keys k ON k.id = a.attr_key_id
+        WHERE k.name = %s
+          AND (%s::text IS NULL OR a.value = %s)
+          AND (%s::double precision IS NULL OR a.value_num >= %s)
+          AND (%s::double precision IS NULL OR a.value_num <= %s)
+        ORDER BY a.product_id;
+    """, (key, value, value, min_value, min_value, max_value, max_value))
+    return [row["product_id"] for row in cur.fetchall()]
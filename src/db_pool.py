@@ -0,0 +1,292 @@
+"""Пул соединений с PostgreSQL, общий для всего процесса."""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+from config.settings import DB_CONFIG, DB_POOL_CONFIG
+
+
+class PoolTimeoutError(Exception):
+    """Не удалось получить соединение из пула за отведенное время."""
+
+    pass
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений.
+
+    - Не более max_size открытых соединений одновременно
+    - Соединения, простаивавшие дольше idle_timeout, закрываются
+    - Перед выдачей соединение проверяется запросом SELECT 1
+    - Собирается статистика ожидания и загрузки пула
+    """
+
+    def __init__(
+        self,
+        db_config: Dict[str, Any],
+        max_size: int = 10,
+        idle_timeout: float = 300.0,
+        acquire_timeout: float = 30.0,
+        health_check_interval: float = 30.0,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size должен быть не меньше 1")
+
+        self._db_config = dict(db_config)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        # Свободные соединения: (соединение, момент возврата в пул)
+        self._idle: Deque[Tuple[psycopg2.extensions.connection, float]] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+
+        # Метрики
+        self._acquired = 0
+        self._created = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._peak_in_use = 0
+
+    def _connect(self) -> psycopg2.extensions.connection:
+        conn = psycopg2.connect(**self._db_config)
+        conn.autocommit = True
+        return conn
+
+    def _is_healthy(self, conn: psycopg2.extensions.connection, idle_for: float) -> bool:
+        """Проверка живости соединения (запрос делается только после долгого простоя)."""
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn: psycopg2.extensions.connection) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def acquire(self, timeout: Optional[float] = None) -> psycopg2.extensions.connection:
+        """Получение соединения из пула."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            candidate = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Пул соединений закрыт")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Нет свободных соединений за {timeout:.1f} с "
+                            f"(max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+                if self._idle:
+                    # LIFO: берем самое «теплое» соединение
+                    candidate = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created += 1
+                return self._checkout(conn, started)
+
+            conn, released_at = candidate
+            idle_for = time.monotonic() - released_at
+            if idle_for <= self.idle_timeout and self._is_healthy(conn, idle_for):
+                return self._checkout(conn, started)
+
+            self._discard(conn)
+            with self._cond:
+                self._size -= 1
+                self._discarded += 1
+                self._cond.notify()
+
+    def _checkout(
+        self, conn: psycopg2.extensions.connection, started: float
+    ) -> psycopg2.extensions.connection:
+        waited = time.monotonic() - started
+        with self._cond:
+            self._in_use += 1
+            self._acquired += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
+
+    def release(self, conn: psycopg2.extensions.connection) -> None:
+        """Возврат соединения в пул."""
+        broken = conn.closed
+        if not broken:
+            try:
+                # Незавершенная транзакция не должна «утечь» к следующему владельцу
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    if conn.autocommit:
+                        # Транзакция открыта явным BEGIN
+                        with conn.cursor() as cur:
+                            cur.execute("ROLLBACK")
+                    else:
+                        conn.rollback()
+                if not conn.autocommit:
+                    conn.autocommit = True
+            except psycopg2.Error:
+                broken = True
+
+        with self._cond:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._size -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+        if broken or self._closed:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[psycopg2.extensions.connection]:
+        """Контекстный менеджер: соединение возвращается в пул при выходе."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def prune(self) -> int:
+        """Закрытие соединений, простаивающих дольше idle_timeout."""
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            keep: Deque[Tuple[psycopg2.extensions.connection, float]] = deque()
+            for conn, released_at in self._idle:
+                if now - released_at > self.idle_timeout:
+                    expired.append(conn)
+                else:
+                    keep.append((conn, released_at))
+            self._idle = keep
+            self._size -= len(expired)
+            self._discarded += len(expired)
+            if expired:
+                self._cond.notify_all()
+        for conn in expired:
+            self._discard(conn)
+        return len(expired)
+
+    def close(self) -> None:
+        """Закрытие всех свободных соединений и запрет выдачи новых."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики пула: время ожидания и загрузка."""
+        with self._cond:
+            acquired = self._acquired
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "peak_in_use": self._peak_in_use,
+                "utilization": self._in_use / self.max_size,
+                "peak_utilization": self._peak_in_use / self.max_size,
+                "acquired": acquired,
+                "created": self._created,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+                "wait_total_sec": round(self._wait_total, 6),
+                "wait_avg_sec": round(self._wait_total / acquired, 6) if acquired else 0.0,
+                "wait_max_sec": round(self._wait_max, 6),
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Общий для процесса пул соединений (создается при первом обращении)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+    return _pool
+
+
+@contextmanager
+def db_cursor() -> Iterator[Tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor]]:
+    """Соединение из пула и курсор; при выходе соединение возвращается в пул."""
+    with get_pool().connection() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            yield conn, cur
+        finally:
+            cur.close()
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Метрики пула соединений (время ожидания, загрузка)."""
+    return get_pool().stats()
+
+
+def close_pool() -> None:
+    """Закрытие пула соединений (при завершении процесса)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
+def transaction(cur: psycopg2.extras.RealDictCursor) -> Iterator[psycopg2.extras.RealDictCursor]:
+    """Явная транзакция на соединении в режиме autocommit."""
+    cur.execute("BEGIN")
+    try:
+        yield cur
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+    cur.execute("COMMIT")
@@ -0,0 +1,85 @@
+"""Кластеры почти дубликатов товаров.
+
+Таблица product_duplicate_clusters хранит по строке на товар, у которого
+нашелся почти дубликат: id кластера (id товара-представителя) и оценку
+сходства с представителем. Пересчитывается целиком
+(quality.near_duplicates.refresh_duplicate_clusters).
+"""
+
+from typing import Any, Dict, Optional
+
+import pandas as pd
+import psycopg2.extras
+
+_INSERT_CLUSTERS_SQL = """
+    INSERT INTO product_duplicate_clusters (product_id, cluster_id, similarity)
+    VALUES %s
+"""
+
+
+def create_duplicate_clusters(cur: psycopg2.extras.RealDictCursor) -> None:
+    """Миграция: таблица кластеров почти дубликатов."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS product_duplicate_clusters (
+            product_id  integer PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE,
+            cluster_id  integer NOT NULL,
+            similarity  real NOT NULL,
+            detected_at timestamptz NOT NULL DEFAULT now()
+        );
+
+        CREATE INDEX IF NOT EXISTS product_duplicate_clusters_cluster_idx
+            ON product_duplicate_clusters (cluster_id);
+    """)
+
+
+def save_duplicate_clusters(
+    cur: psycopg2.extras.RealDictCursor,
+    clusters: pd.DataFrame,
+    shop: Optional[str] = None,
+    page_size: int = 5000,
+) -> None:
+    """
+    Замена кластеров (всех или товаров одного магазина) новыми.
+
+    clusters — результат duplicate_clusters: product_id, cluster_id, similarity.
+    """
+    if shop is None:
+        cur.execute("TRUNCATE product_duplicate_clusters")
+    else:
+        cur.execute("""
+            DELETE FROM product_duplicate_clusters c
+            USING products p
+            WHERE p.id = c.product_id AND p.shop = %s
+        """, (shop,))
+    rows = [
+        (int(product_id), int(cluster_id), float(similarity))
+        for product_id, cluster_id, similarity in clusters[
+            ['product_id', 'cluster_id', 'similarity']
+        ].itertuples(index=False)
+    ]
+    if rows:
+        psycopg2.extras.execute_values(cur, _INSERT_CLUSTERS_SQL, rows, page_size=page_size)
+    cur.execute("ANALYZE product_duplicate_clusters")
+
+
+def duplicate_cluster_summary(
+    cur: psycopg2.extras.RealDictCursor, limit: int = 5
+) -> Dict[str, Any]:
+    """Число кластеров и товаров в них и крупнейшие кластеры с названиями."""
+    cur.execute("""
+        SELECT count(DISTINCT cluster_id) AS clusters,
+               count(*) AS products,
+               max(detected_at) AS detected_at
+        FROM product_duplicate_clusters
+    """)
+    summary = dict(cur.fetchone())
+    cur.execute("""
+        SELECT c.cluster_id, count(*) AS size, min(c.similarity) AS min_similarity,
+               (SELECT title FROM products WHERE id = c.cluster_id) AS title
+        FROM product_duplicate_clusters c
+        GROUP BY c.cluster_id
+        ORDER BY size DESC, c.cluster_id
+        LIMIT %s
+    """, (limit,))
+    summary['largest'] = [dict(row) for row in cur.fetchall()]
+    return summary
@@ -0,0 +1,122 @@
+"""Типизированные признаки товаров, разобранные из характеристик.
+
+Таблица product_features хранит по строке на товар: металл и цвет из
+перечней, пробу, вес в граммах, число камней и размер. Заполняется при
+записи товаров и пересобирается пакетно по уже сохраненным строкам.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import psycopg2.extras
+
+from cleaners.characteristics import FEATURE_DTYPES, parse_characteristics, parse_characteristics_frame
+
+FEATURE_COLUMNS: List[str] = list(FEATURE_DTYPES)
+
+_UPSERT_FEATURES_SQL = f"""
+    INSERT INTO product_features (product_id, {", ".join(FEATURE_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (product_id) DO UPDATE SET
+        {", ".join(f"{col} = EXCLUDED.{col}" for col in FEATURE_COLUMNS)};
+"""
+
+_FEATURES_TEMPLATE = (
+    "(%s::integer, %s::text, %s::text, %s::smallint, %s::real, %s::smallint, %s::real)"
+)
+
+
+def create_product_features(cur: psycopg2.extras.RealDictCursor) -> None:
+    """Миграция: таблица product_features с начальным наполнением."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS product_features (
+            product_id  integer PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE,
+            metal       text,
+            metal_color text,
+            probe       smallint,
+            weight_g    real,
+            stone_count smallint,
+            size        real
+        );
+
+        CREATE INDEX IF NOT EXISTS product_features_metal_idx
+            ON product_features (metal, probe);
+        CREATE INDEX IF NOT EXISTS product_features_weight_g_idx
+            ON product_features (weight_g)
+            WHERE weight_g IS NOT NULL;
+    """)
+    rebuild_features(cur)
+
+
+def _feature_rows(product_ids: List[int], items: List[Any]) -> List[tuple]:
+    frame = parse_characteristics_frame(items)
+    columns = []
+    for col in FEATURE_COLUMNS:
+        series = frame[col].astype(object)
+        # pd.NA / NaN -> NULL, numpy-скаляры -> типы Python для psycopg2
+        columns.append([
+            None if pd.isna(value) else getattr(value, "item", lambda: value)()
+            for value in series
+        ])
+    return [(product_id, *row) for product_id, row in zip(product_ids, zip(*columns))]
+
+
+def save_features(
+    cur: psycopg2.extras.RealDictCursor,
+    characteristics_by_id: Dict[int, Dict[str, str]],
+    page_size: int = 1000,
+) -> None:
+    """Запись типизированных признаков товаров (вызывается при пакетной записи)."""
+    if not characteristics_by_id:
+        return
+    rows = [
+        (product_id, *(parse_characteristics(characteristics or {})[col] for col in FEATURE_COLUMNS))
+        for product_id, characteristics in characteristics_by_id.items()
+    ]
+    psycopg2.extras.execute_values(
+        cur, _UPSERT_FEATURES_SQL, rows, template=_FEATURES_TEMPLATE, page_size=page_size
+    )
+
+
+def rebuild_features(
+    cur: psycopg2.extras.RealDictCursor,
+    batch_size: int = 5000,
+    shop: Optional[str] = None,
+) -> int:
+    """
+    Пакетная пересборка product_features по сохраненным товарам.
+
+    Товары читаются страницами по id (keyset), каждая страница
+    разбирается колоночно и записывается одним запросом.
+
+    Returns:
+        int: количество обработанных товаров
+    """
+    last_id = 0
+    total = 0
+    while True:
+        cur.execute("""
+            SELECT id, characteristics
+            FROM products
+            WHERE id > %s
+              AND (%s::text IS NULL OR shop = %s)
+            ORDER BY id
+            LIMIT %s
+        """, (last_id, shop, shop, batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            break
+
+        product_ids = [row["id"] for row in rows]
+        psycopg2.extras.execute_values(
+            cur,
+            _UPSERT_FEATURES_SQL,
+            _feature_rows(product_ids, [row["characteristics"] for row in rows]),
+            template=_FEATURES_TEMPLATE,
+            page_size=batch_size,
+        )
+        total += len(rows)
+        last_id = product_ids[-1]
+
+    cur.execute("ANALYZE product_features")
+    return total
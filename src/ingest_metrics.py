@@ -0,0 +1,207 @@
+"""Счетчики качества, собираемые во время загрузки.
+
+Каждый запуск парсера — строка ingest_runs; счетчики (отклонено по
+правилу валидации, пустые поля, обрезанные названия и описания,
+повторы URL, несохраненные товары) накапливаются в памяти и пишутся в
+ingest_metrics после каждой пачки товаров. Отчет о качестве строит тренды по этой маленькой
+таблице, не читая products.
+"""
+
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import psycopg2.extras
+
+from cleaners.data_cleaner import truncation_stats
+from config.settings import SHOP_NAME
+from src.db_pool import transaction
+from utils.validators import (
+    VALIDATION_ERRORS,
+    ERR_URL,
+    ERR_TITLE,
+    ERR_PRICE,
+    ERR_DESCRIPTION,
+    ERR_IMAGE_URL,
+    ERR_CHARACTERISTICS,
+)
+
+# Имена счетчиков по правилам валидации: rejected:<правило>
+RULE_NAMES = {
+    ERR_URL: 'url',
+    ERR_TITLE: 'title',
+    ERR_PRICE: 'price',
+    ERR_DESCRIPTION: 'description',
+    ERR_IMAGE_URL: 'image_url',
+    ERR_CHARACTERISTICS: 'characteristics',
+}
+_MESSAGE_TO_RULE = {VALIDATION_ERRORS[code]: name for code, name in RULE_NAMES.items()}
+
+# Поля очищенного товара, пустота которых считается в missing:<поле>
+TRACKED_FIELDS = ['title', 'price', 'description', 'image_url', 'characteristics']
+
+_UPSERT_METRICS_SQL = """
+    INSERT INTO ingest_metrics (run_id, metric, value)
+    VALUES %s
+    ON CONFLICT (run_id, metric) DO UPDATE SET
+        value = ingest_metrics.value + EXCLUDED.value;
+"""
+
+
+def create_ingest_metrics(cur: psycopg2.extras.RealDictCursor) -> None:
+    """Миграция: таблицы запусков загрузки и их счетчиков."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_runs (
+            id          serial PRIMARY KEY,
+            shop        text NOT NULL,
+            started_at  timestamptz NOT NULL DEFAULT now(),
+            finished_at timestamptz
+        );
+
+        CREATE TABLE IF NOT EXISTS ingest_metrics (
+            run_id integer NOT NULL REFERENCES ingest_runs (id) ON DELETE CASCADE,
+            metric text NOT NULL,
+            value  bigint NOT NULL DEFAULT 0,
+            PRIMARY KEY (run_id, metric)
+        );
+
+        CREATE INDEX IF NOT EXISTS ingest_runs_started_at_idx
+            ON ingest_runs (started_at DESC);
+    """)
+
+
+class IngestMetrics:
+    """
+    Счетчики качества одного запуска загрузки.
+
+    record_* только увеличивают счетчики в памяти; flush дописывает
+    накопленное в ingest_metrics одним запросом (значения суммируются).
+    """
+
+    def __init__(self, shop: str = SHOP_NAME):
+        self.shop = shop
+        self.run_id: Optional[int] = None
+        self.totals: Counter = Counter()
+        self._pending: Counter = Counter()
+        self._seen_urls = set()
+        self._truncations = truncation_stats()
+
+    def _add(self, metric: str, value: int = 1) -> None:
+        if value:
+            self._pending[metric] += value
+            self.totals[metric] += value
+
+    def start(self, cur: psycopg2.extras.RealDictCursor) -> int:
+        """Регистрация запуска в ingest_runs."""
+        cur.execute(
+            "INSERT INTO ingest_runs (shop) VALUES (%s) RETURNING id", (self.shop,)
+        )
+        self.run_id = cur.fetchone()["id"]
+        return self.run_id
+
+    def record_product(self, product: Dict[str, Any], errors: List[str]) -> None:
+        """Учет очищенного товара и результата validate_product."""
+        self._add('products_seen')
+
+        url = product.get('url')
+        if url in self._seen_urls:
+            self._add('duplicates:run')
+        elif url:
+            self._seen_urls.add(url)
+
+        for field in TRACKED_FIELDS:
+            if not product.get(field):
+                self._add(f'missing:{field}')
+
+        if errors:
+            self._add('rejected')
+            for message in errors:
+                self._add(f"rejected:{_MESSAGE_TO_RULE.get(message, 'other')}")
+        else:
+            self._add('accepted')
+
+    def record_error(self) -> None:
+        """Товар не удалось разобрать (исключение при обработке)."""
+        self._add('parse_errors')
+
+    def record_saved(self, saved: Dict[str, dict]) -> None:
+        """Учет результата save_products_batch: новые и уже известные товары."""
+        inserted = sum(1 for row in saved.values() if row["inserted"])
+        self._add('saved:inserted', inserted)
+        # Товар уже был в БД — повтор относительно прошлых запусков
+        self._add('duplicates:existing', len(saved) - inserted)
+
+    def record_batch_failure(self) -> None:
+        """Пачка товаров не записалась одним запросом (ошибка записи, а не разбора)."""
+        self._add('batch_failures')
+
+    def record_unsaved(self, count: int) -> None:
+        """Прошедшие валидацию товары, которые так и не удалось записать в БД."""
+        self._add('unsaved', count)
+
+    def _collect_truncations(self) -> None:
+        current = truncation_stats()
+        for field, count in current.items():
+            self._add(f'truncated:{field}', count - self._truncations.get(field, 0))
+        self._truncations = current
+
+    def flush(self, cur: psycopg2.extras.RealDictCursor) -> None:
+        """
+        Запись накопленных счетчиков в ingest_metrics отдельной транзакцией.
+
+        Счетчики сбрасываются только после COMMIT: если запись не удалась,
+        они уйдут со следующим flush.
+        """
+        self._collect_truncations()
+        if self.run_id is None or not self._pending:
+            return
+        rows = [(self.run_id, metric, value) for metric, value in self._pending.items()]
+        with transaction(cur):
+            psycopg2.extras.execute_values(cur, _UPSERT_METRICS_SQL, rows)
+        self._pending.clear()
+
+    def finish(self, cur: psycopg2.extras.RealDictCursor) -> None:
+        """Запись остатка счетчиков и времени окончания запуска."""
+        self.flush(cur)
+        if self.run_id is not None:
+            cur.execute(
+                "UPDATE ingest_runs SET finished_at = now() WHERE id = %s", (self.run_id,)
+            )
+
+
+def load_ingest_runs(
+    cur: psycopg2.extras.RealDictCursor,
+    limit: int = 10,
+    shop: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Последние запуски (новые первыми) со счетчиками: metric -> value."""
+    cur.execute("""
+        SELECT r.id, r.shop, r.started_at, r.finished_at,
+               coalesce(
+                   jsonb_object_agg(m.metric, m.value) FILTER (WHERE m.metric IS NOT NULL),
+                   '{}'::jsonb
+               ) AS metrics
+        FROM ingest_runs r
+        LEFT JOIN ingest_metrics m ON m.run_id = r.id
+        WHERE (%(shop)s::text IS NULL OR r.shop = %(shop)s)
+        GROUP BY r.id
+        ORDER BY r.started_at DESC
+        LIMIT %(limit)s
+    """, {'shop': shop, 'limit': limit})
+    return [dict(row) for row in cur.fetchall()]
+
+
+def rolling_ingest_metrics(
+    cur: psycopg2.extras.RealDictCursor,
+    days: int = 7,
+    shop: Optional[str] = None,
+) -> Dict[str, int]:
+    """Суммы счетчиков по запускам за последние days дней."""
+    cur.execute("""
+        SELECT m.metric, sum(m.value)::bigint AS value
+        FROM ingest_metrics m
+        JOIN ingest_runs r ON r.id = m.run_id
+        WHERE r.started_at >= now() - make_interval(days => %(days)s)
+          AND (%(shop)s::text IS NULL OR r.shop = %(shop)s)
+        GROUP BY m.metric
+    """, {'days': days, 'shop': shop})
+    return {row["metric"]: int(row["value"]) for row in cur.fetchall()}
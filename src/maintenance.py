@@ -0,0 +1,273 @@
+"""Обслуживание хранилища: очистка и сборка мусора в PostgreSQL и MinIO."""
+
+import re
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from minio import Minio
+from minio.datatypes import Object
+from minio.deleteobjects import DeleteObject
+
+from config.settings import MINIO_BUCKET
+from src.db_pool import db_cursor
+from src.storage import get_minio
+
+# <shop>/products/<product_id>/<файл>
+_OBJECT_RE = re.compile(r"^(?P<shop>[^/]+)/products/(?P<product_id>\d+)/")
+
+DELETE_BATCH_SIZE = 1000  # максимум ключей в одном запросе DeleteObjects
+DELETE_WORKERS = 8
+
+# Объекты моложе этого срока не считаются «осиротевшими»: парсер сначала
+# загружает изображение в MinIO и только потом пишет строку product_images
+ORPHAN_GRACE_PERIOD = timedelta(hours=1)
+
+
+def product_id_from_object(name: str) -> Optional[int]:
+    """Id товара из имени объекта MinIO (None, если имя не по схеме)."""
+    match = _OBJECT_RE.match(name)
+    return int(match.group("product_id")) if match else None
+
+
+def _in_range(product_id: Optional[int], id_from: Optional[int], id_to: Optional[int]) -> bool:
+    if id_from is None and id_to is None:
+        return True
+    if product_id is None:
+        return False
+    if id_from is not None and product_id < id_from:
+        return False
+    if id_to is not None and product_id > id_to:
+        return False
+    return True
+
+
+def iter_objects(
+    client: Minio,
+    shop: Optional[str] = None,
+    id_from: Optional[int] = None,
+    id_to: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Потоковый обход объектов bucket в лексикографическом порядке.
+
+    shop ограничивает обход префиксом «<shop>/», id_from/id_to —
+    диапазоном id товаров.
+    """
+    for obj in _list_objects(client, shop, id_from, id_to):
+        yield obj.object_name
+
+
+def _list_objects(
+    client: Minio,
+    shop: Optional[str] = None,
+    id_from: Optional[int] = None,
+    id_to: Optional[int] = None,
+) -> Iterator[Object]:
+    prefix = f"{shop}/" if shop else None
+    for obj in client.list_objects(MINIO_BUCKET, prefix=prefix, recursive=True):
+        if _in_range(product_id_from_object(obj.object_name), id_from, id_to):
+            yield obj
+
+
+def _remove_batch(client: Minio, names: List[str]) -> Tuple[int, int]:
+    # remove_objects ленивый: ошибки приходят только при итерации
+    errors = list(client.remove_objects(MINIO_BUCKET, [DeleteObject(n) for n in names]))
+    for error in errors:
+        print(f"   ⚠️  Не удалось удалить {error.name}: {error.message}")
+    return len(names) - len(errors), len(errors)
+
+
+def delete_objects(
+    names: Iterable[str],
+    client: Optional[Minio] = None,
+    batch_size: int = DELETE_BATCH_SIZE,
+    workers: int = DELETE_WORKERS,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Пакетное удаление объектов через remove_objects в несколько потоков.
+
+    Имена читаются из итератора по мере удаления, поэтому в памяти
+    не больше workers * 2 пачек.
+    """
+    client = client or get_minio()
+    stats = {"deleted": 0, "errors": 0}
+    pending: Set[Future] = set()
+
+    def collect(done: Iterable[Future]) -> None:
+        for future in done:
+            deleted, errors = future.result()
+            stats["deleted"] += deleted
+            stats["errors"] += errors
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        batch: List[str] = []
+        for name in names:
+            batch.append(name)
+            if len(batch) < batch_size:
+                continue
+            if dry_run:
+                stats["deleted"] += len(batch)
+            else:
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(executor.submit(_remove_batch, client, batch))
+            batch = []
+
+        if batch:
+            if dry_run:
+                stats["deleted"] += len(batch)
+            else:
+                pending.add(executor.submit(_remove_batch, client, batch))
+        collect(wait(pending).done)
+
+    return stats
+
+
+def reset_storage(
+    shop: Optional[str] = None,
+    id_from: Optional[int] = None,
+    id_to: Optional[int] = None,
+    workers: int = DELETE_WORKERS,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Удаление товаров и их изображений.
+
+    Без ограничений очищает все таблицы и весь bucket; с shop и/или
+    диапазоном id — только соответствующие товары и объекты.
+    """
+    full = shop is None and id_from is None and id_to is None
+    stats = {"products": 0, "objects": 0, "errors": 0}
+
+    with db_cursor() as (conn, cur):
+        if full:
+            cur.execute("SELECT count(*) AS count FROM products")
+            stats["products"] = cur.fetchone()["count"]
+            if not dry_run:
+                cur.execute("""
+                    TRUNCATE product_images, products
+                    RESTART IDENTITY CASCADE;
+                """)
+        else:
+            where = """
+                (%(shop)s::text IS NULL OR shop = %(shop)s)
+                AND (%(id_from)s::integer IS NULL OR id >= %(id_from)s)
+                AND (%(id_to)s::integer IS NULL OR id <= %(id_to)s)
+            """
+            params = {"shop": shop, "id_from": id_from, "id_to": id_to}
+            if dry_run:
+                cur.execute(f"SELECT count(*) AS count FROM products WHERE {where}", params)
+                stats["products"] = cur.fetchone()["count"]
+            else:
+                # product_images, product_texts и т.д. удаляются каскадно
+                cur.execute(f"DELETE FROM products WHERE {where}", params)
+                stats["products"] = cur.rowcount
+
+    client = get_minio()
+    result = delete_objects(
+        iter_objects(client, shop, id_from, id_to),
+        client=client,
+        workers=workers,
+        dry_run=dry_run,
+    )
+    stats["objects"] = result["deleted"]
+    stats["errors"] = result["errors"]
+    return stats
+
+
+def _iter_db_images(shop: Optional[str]) -> Iterator[Tuple[str, int]]:
+    """
+    Потоковое чтение (ключ объекта, id строки) из product_images.
+
+    Именованный (серверный) курсор отдает строки пачками; порядок
+    COLLATE "C" совпадает с побайтовым порядком листинга MinIO.
+    """
+    bucket_prefix = f"{MINIO_BUCKET}/"
+    key_prefix = f"{shop}/" if shop else ""
+    with db_cursor() as (conn, _):
+        conn.autocommit = False
+        with conn.cursor(name="gc_product_images") as cur:
+            cur.itersize = 10_000
+            cur.execute("""
+                SELECT substr(storage_path, %s) AS object_name, id
+                FROM product_images
+                WHERE storage_path LIKE %s
+                ORDER BY 1 COLLATE "C"
+            """, (
+                len(bucket_prefix) + 1,
+                bucket_prefix + key_prefix.replace("%", r"\%").replace("_", r"\_") + "%",
+            ))
+            for object_name, image_id in cur:
+                yield object_name, image_id
+        conn.rollback()
+
+
+def _delete_image_rows(ids: List[int]) -> None:
+    with db_cursor() as (conn, cur):
+        cur.execute("DELETE FROM product_images WHERE id = ANY(%s)", (ids,))
+
+
+def collect_garbage(
+    shop: Optional[str] = None,
+    workers: int = DELETE_WORKERS,
+    dry_run: bool = False,
+    grace_period: timedelta = ORPHAN_GRACE_PERIOD,
+) -> Dict[str, int]:
+    """
+    Сверка product_images.storage_path с содержимым bucket в обе стороны.
+
+    Оба потока отсортированы, поэтому сверка — слияние за один проход
+    без загрузки списков в память:
+    - объект без строки в БД удаляется из MinIO, если он старше
+      grace_period (более свежий может быть только что загружен парсером,
+      который еще не записал строку) — такие считаются в "recent"
+    - строка, ссылающаяся на отсутствующий объект, удаляется из БД
+
+    Сверка строк безопасна во время загрузки, только пока парсер пишет
+    строку product_images после загрузки объекта (main._save_product_image):
+    при обратном порядке свежие строки удалялись бы до появления объекта.
+    """
+    client = get_minio()
+    stats = {"orphan_objects": 0, "orphan_rows": 0, "matched": 0, "recent": 0, "errors": 0}
+    cutoff = datetime.now(timezone.utc) - grace_period
+    orphan_rows: List[int] = []
+
+    def flush_rows() -> None:
+        if orphan_rows and not dry_run:
+            _delete_image_rows(list(orphan_rows))
+        orphan_rows.clear()
+
+    def orphan_objects() -> Iterator[str]:
+        listing = _list_objects(client, shop)
+        rows = _iter_db_images(shop)
+        entry = next(listing, None)
+        row = next(rows, None)
+        while entry is not None or row is not None:
+            obj = entry.object_name if entry is not None else None
+            if row is not None and (obj is None or row[0] < obj):
+                stats["orphan_rows"] += 1
+                orphan_rows.append(row[1])
+                if len(orphan_rows) >= DELETE_BATCH_SIZE:
+                    flush_rows()
+                row = next(rows, None)
+            elif row is not None and row[0] == obj:
+                stats["matched"] += 1
+                # Несколько строк могут ссылаться на один объект
+                while row is not None and row[0] == obj:
+                    row = next(rows, None)
+                entry = next(listing, None)
+            else:
+                if entry.last_modified is not None and entry.last_modified < cutoff:
+                    stats["orphan_objects"] += 1
+                    yield obj
+                else:
+                    stats["recent"] += 1
+                entry = next(listing, None)
+
+    result = delete_objects(orphan_objects(), client=client, workers=workers, dry_run=dry_run)
+    flush_rows()
+    stats["errors"] = result["errors"]
+    return stats
@@ -0,0 +1,169 @@
+"""История цен товаров.
+
+Таблица price_history секционирована по месяцам и хранит строку только
+при изменении цены: (product_id, observed_at, price) — около 45 байт на
+изменение, без суррогатного ключа. Строки месяцев, для которых секция
+еще не создана, попадают в секцию по умолчанию и переносятся в месячную
+при ее создании (ensure_partitions).
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import psycopg2.extras
+
+from src.db_pool import db_cursor
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, months: int) -> date:
+    month_index = d.year * 12 + (d.month - 1) + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+# Секция для строк вне созданных месяцев: без нее такая вставка
+# отменяла бы весь upsert товаров
+DEFAULT_PARTITION = "price_history_default"
+
+
+def partition_name(month: date) -> str:
+    """Имя месячной секции, например price_history_y2026m10."""
+    return f"price_history_y{month.year:04d}m{month.month:02d}"
+
+
+def ensure_partitions(
+    cur: psycopg2.extras.RealDictCursor,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    months_ahead: int = 1,
+) -> List[str]:
+    """
+    Создание месячных секций price_history на интервал [start, end].
+
+    По умолчанию — текущий месяц и months_ahead следующих. Строки
+    месяца, уже записанные в секцию по умолчанию, переносятся в новую
+    секцию (иначе Postgres не даст ее создать).
+    """
+    today = date.today()
+    first = _month_start(start or today)
+    last = _month_start(end or _add_months(today, months_ahead))
+
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL AS exists", (DEFAULT_PARTITION,))
+    has_default = cur.fetchone()["exists"]
+
+    created = []
+    month = first
+    while month <= last:
+        name = partition_name(month)
+        bounds = {"from": month, "to": _add_months(month, 1)}
+        if not has_default:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {name}
+                PARTITION OF price_history
+                FOR VALUES FROM (%(from)s) TO (%(to)s);
+            """, bounds)
+        else:
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL AS exists", (name,))
+            if not cur.fetchone()["exists"]:
+                # Одним запросом — одна (неявная) транзакция
+                cur.execute(f"""
+                    CREATE TABLE {name}
+                        (LIKE price_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+                    WITH moved AS (
+                        DELETE FROM {DEFAULT_PARTITION}
+                        WHERE observed_at >= %(from)s AND observed_at < %(to)s
+                        RETURNING product_id, observed_at, price
+                    )
+                    INSERT INTO {name} (product_id, observed_at, price)
+                    SELECT product_id, observed_at, price FROM moved;
+                    ALTER TABLE price_history
+                        ATTACH PARTITION {name} FOR VALUES FROM (%(from)s) TO (%(to)s);
+                """, bounds)
+        created.append(name)
+        month = _add_months(month, 1)
+    return created
+
+
+def create_default_partition(cur: psycopg2.extras.RealDictCursor) -> None:
+    """Миграция: секция по умолчанию для строк вне месячных секций."""
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION}
+        PARTITION OF price_history DEFAULT;
+    """)
+    ensure_partitions(cur)
+
+
+def create_price_history(cur: psycopg2.extras.RealDictCursor) -> None:
+    """Миграция: таблица истории цен и начальное наполнение текущими ценами."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS price_history (
+            product_id  integer NOT NULL REFERENCES products (id) ON DELETE CASCADE,
+            observed_at timestamptz NOT NULL,
+            price       integer NOT NULL,
+            PRIMARY KEY (product_id, observed_at)
+        ) PARTITION BY RANGE (observed_at);
+    """)
+
+    cur.execute("SELECT min(updated_at)::date AS first_seen FROM products")
+    first_seen = cur.fetchone()["first_seen"]
+    ensure_partitions(cur, start=first_seen)
+
+    # Текущая цена каждого товара — первая точка его ряда
+    cur.execute("""
+        INSERT INTO price_history (product_id, observed_at, price)
+        SELECT id, updated_at, price
+        FROM products
+        WHERE price IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    """)
+
+
+def get_price_series(
+    product_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cur: Optional[psycopg2.extras.RealDictCursor] = None,
+) -> List[Dict]:
+    """Ряд изменений цены товара в хронологическом порядке."""
+    if cur is None:
+        with db_cursor() as (_, pooled_cur):
+            return get_price_series(product_id, since, until, pooled_cur)
+
+    cur.execute("""
+        SELECT observed_at, price
+        FROM price_history
+        WHERE product_id = %s
+          AND (%s::timestamptz IS NULL OR observed_at >= %s::timestamptz)
+          AND (%s::timestamptz IS NULL OR observed_at <= %s::timestamptz)
+        ORDER BY observed_at;
+    """, (product_id, since, since, until, until))
+    return cur.fetchall()
+
+
+def get_price_snapshot(
+    at: datetime,
+    shop: Optional[str] = None,
+    cur: Optional[psycopg2.extras.RealDictCursor] = None,
+) -> List[Dict]:
+    """
+    Срез каталога на момент времени: последняя известная цена каждого товара.
+
+    Секции позже `at` отсекаются планировщиком (partition pruning).
+    """
+    if cur is None:
+        with db_cursor() as (_, pooled_cur):
+            return get_price_snapshot(at, shop, pooled_cur)
+
+    cur.execute("""
+        SELECT DISTINCT ON (h.product_id)
+            h.product_id, p.product_url, p.shop, h.price, h.observed_at
+        FROM price_history h
+        JOIN products p ON p.id = h.product_id
+        WHERE h.observed_at <= %s
+          AND (%s::text IS NULL OR p.shop = %s)
+        ORDER BY h.product_id, h.observed_at DESC;
+    """, (at, shop, shop))
+    return cur.fetchall()
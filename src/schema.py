@@ -0,0 +1,264 @@
+"""Схема базы данных и миграции.
+
+Запуск: python -m src.schema
+"""
+
+from typing import Callable, List, Optional, Tuple, Union
+
+import psycopg2.extras
+
+from src.db_pool import db_cursor, transaction
+from src.price_history import create_price_history, create_default_partition
+from src.attributes import create_attributes, widen_attr_key_ids
+from src.features import create_product_features
+from src.ingest_metrics import create_ingest_metrics
+from src.duplicates import create_duplicate_clusters
+
+from cleaners.characteristics import METAL_KEY, PROBE_KEY, INSERT_KEY, WEIGHT_KEY
+
+# Произвольный ключ advisory-блокировки, чтобы миграции не шли параллельно
+_MIGRATION_LOCK_KEY = 585_0001
+
+Migration = Tuple[int, str, Union[str, Callable[[psycopg2.extras.RealDictCursor], None]]]
+
+
+_CREATE_TABLES = """
+    CREATE TABLE IF NOT EXISTS products (
+        id              serial PRIMARY KEY,
+        shop            text NOT NULL,
+        product_url     text NOT NULL UNIQUE,
+        title           text,
+        price           integer,
+        description     text,
+        characteristics jsonb NOT NULL DEFAULT '{}'::jsonb,
+        created_at      timestamptz NOT NULL DEFAULT now(),
+        updated_at      timestamptz NOT NULL DEFAULT now()
+    );
+
+    CREATE TABLE IF NOT EXISTS product_images (
+        id           serial PRIMARY KEY,
+        product_id   integer NOT NULL REFERENCES products (id) ON DELETE CASCADE,
+        image_url    text NOT NULL,
+        storage_path text NOT NULL,
+        is_main      boolean NOT NULL DEFAULT false,
+        created_at   timestamptz NOT NULL DEFAULT now(),
+        UNIQUE (product_id, image_url)
+    );
+
+    -- Таблицы, созданные до появления миграций, приводятся к той же схеме
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS created_at timestamptz NOT NULL DEFAULT now();
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+
+    DO $$
+    BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'products' AND column_name = 'characteristics') <> 'jsonb' THEN
+            ALTER TABLE products
+                ALTER COLUMN characteristics TYPE jsonb USING characteristics::jsonb;
+        END IF;
+    END
+    $$;
+
+    CREATE OR REPLACE FUNCTION products_touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := now();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS products_touch_updated_at ON products;
+    CREATE TRIGGER products_touch_updated_at
+        BEFORE UPDATE ON products
+        FOR EACH ROW EXECUTE FUNCTION products_touch_updated_at();
+"""
+
+# Типизированные колонки products вычисляются из характеристик по каноническим ключам
+_TYPED_COLUMNS_AND_INDEXES = f"""
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS metal text
+        GENERATED ALWAYS AS (characteristics ->> '{METAL_KEY}') STORED;
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS probe smallint
+        GENERATED ALWAYS AS (
+            substring(characteristics ->> '{PROBE_KEY}' FROM '[0-9]{{3}}')::smallint
+        ) STORED;
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS insert_type text
+        GENERATED ALWAYS AS (characteristics ->> '{INSERT_KEY}') STORED;
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS weight_g numeric
+        GENERATED ALWAYS AS (
+            replace(
+                substring(characteristics ->> '{WEIGHT_KEY}' FROM '[0-9]+(?:[.,][0-9]+)?'),
+                ',', '.'
+            )::numeric
+        ) STORED;
+
+    CREATE INDEX IF NOT EXISTS products_shop_idx ON products (shop);
+    CREATE INDEX IF NOT EXISTS products_created_at_idx ON products (created_at DESC);
+    CREATE INDEX IF NOT EXISTS products_updated_at_idx ON products (updated_at);
+    CREATE INDEX IF NOT EXISTS products_characteristics_gin
+        ON products USING gin (characteristics);
+    CREATE INDEX IF NOT EXISTS products_metal_idx ON products (metal);
+    CREATE INDEX IF NOT EXISTS products_probe_idx ON products (probe);
+    CREATE INDEX IF NOT EXISTS products_insert_type_idx ON products (insert_type);
+    CREATE INDEX IF NOT EXISTS products_weight_g_idx ON products (weight_g);
+
+    CREATE INDEX IF NOT EXISTS product_images_product_id_idx ON product_images (product_id);
+
+    ANALYZE products;
+    ANALYZE product_images;
+"""
+
+_SPLIT_DESCRIPTIONS = """
+    CREATE TABLE IF NOT EXISTS product_texts (
+        product_id  integer PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE,
+        description text NOT NULL
+    );
+
+    DO $$
+    BEGIN
+        -- lz4 сжимает длинные описания быстрее стандартного pglz (PostgreSQL 14+)
+        IF current_setting('server_version_num')::int >= 140000 THEN
+            EXECUTE 'ALTER TABLE product_texts ALTER COLUMN description SET COMPRESSION lz4';
+        END IF;
+
+        IF EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'products' AND column_name = 'description') THEN
+            INSERT INTO product_texts (product_id, description)
+            SELECT id, description FROM products WHERE description IS NOT NULL
+            ON CONFLICT (product_id) DO NOTHING;
+
+            -- Место в куче освобождается после перезаписи строк
+            -- (VACUUM FULL products в окно обслуживания)
+            ALTER TABLE products DROP COLUMN description;
+        END IF;
+    END
+    $$;
+
+    ANALYZE product_texts;
+"""
+
+# updated_at меняется только при реальном изменении строки: upsert всегда
+# выполняет DO UPDATE (ради RETURNING для price_history), и без условия
+# каждый повторный обход сдвигал бы updated_at. Колонки перечислены явно:
+# в WHEN BEFORE-триггера нельзя ссылаться на NEW.* при сгенерированных колонках
+_TOUCH_ONLY_ON_CHANGE = """
+    DROP TRIGGER IF EXISTS products_touch_updated_at ON products;
+    CREATE TRIGGER products_touch_updated_at
+        BEFORE UPDATE ON products
+        FOR EACH ROW
+        WHEN (
+            (OLD.shop, OLD.product_url, OLD.title, OLD.price, OLD.characteristics)
+            IS DISTINCT FROM
+            (NEW.shop, NEW.product_url, NEW.title, NEW.price, NEW.characteristics)
+        )
+        EXECUTE FUNCTION products_touch_updated_at();
+"""
+
+# Описание (product_texts) и изображения (product_images) хранятся отдельно,
+# но входят в снимок и метрики качества, которые ищут изменения по
+# products.updated_at: их изменение тоже сдвигает updated_at товара.
+# Товар, уже обновленный в этой транзакции (upsert), повторно не пишется
+_TOUCH_FROM_TEXTS_AND_IMAGES = """
+    CREATE OR REPLACE FUNCTION products_touch_from_child() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            UPDATE products SET updated_at = now()
+            WHERE id = OLD.product_id AND updated_at < now();
+        ELSE
+            UPDATE products SET updated_at = now()
+            WHERE id = NEW.product_id AND updated_at < now();
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS product_texts_touch_product ON product_texts;
+    CREATE TRIGGER product_texts_touch_product
+        AFTER INSERT OR DELETE ON product_texts
+        FOR EACH ROW EXECUTE FUNCTION products_touch_from_child();
+
+    DROP TRIGGER IF EXISTS product_texts_touch_product_on_update ON product_texts;
+    CREATE TRIGGER product_texts_touch_product_on_update
+        AFTER UPDATE ON product_texts
+        FOR EACH ROW
+        WHEN (OLD.description IS DISTINCT FROM NEW.description)
+        EXECUTE FUNCTION products_touch_from_child();
+
+    DROP TRIGGER IF EXISTS product_images_touch_product ON product_images;
+    CREATE TRIGGER product_images_touch_product
+        AFTER INSERT OR UPDATE OR DELETE ON product_images
+        FOR EACH ROW EXECUTE FUNCTION products_touch_from_child();
+"""
+
+MIGRATIONS: List[Migration] = [
+    (1, "products_and_images", _CREATE_TABLES),
+    (2, "typed_columns_and_indexes", _TYPED_COLUMNS_AND_INDEXES),
+    (3, "price_history", create_price_history),
+    (4, "split_descriptions", _SPLIT_DESCRIPTIONS),
+    (5, "product_attributes", create_attributes),
+    (6, "product_features", create_product_features),
+    (7, "ingest_metrics", create_ingest_metrics),
+    (8, "duplicate_clusters", create_duplicate_clusters),
+    (9, "touch_updated_at_on_change", _TOUCH_ONLY_ON_CHANGE),
+    (10, "attr_key_integer_ids", widen_attr_key_ids),
+    (11, "touch_products_from_texts_and_images", _TOUCH_FROM_TEXTS_AND_IMAGES),
+    (12, "price_history_default_partition", create_default_partition),
+]
+
+
+def _ensure_migrations_table(cur: psycopg2.extras.RealDictCursor) -> None:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    integer PRIMARY KEY,
+            name       text NOT NULL,
+            applied_at timestamptz NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def applied_versions(cur: psycopg2.extras.RealDictCursor) -> List[int]:
+    """Список уже примененных версий миграций."""
+    _ensure_migrations_table(cur)
+    cur.execute("SELECT version FROM schema_migrations ORDER BY version")
+    return [row["version"] for row in cur.fetchall()]
+
+
+def migrate(cur: Optional[psycopg2.extras.RealDictCursor] = None) -> List[int]:
+    """
+    Применение недостающих миграций.
+
+    Каждая миграция выполняется в отдельной транзакции.
+
+    Returns:
+        List[int]: версии, примененные в этом запуске
+    """
+    if cur is None:
+        with db_cursor() as (_, pooled_cur):
+            return migrate(pooled_cur)
+
+    cur.execute("SELECT pg_advisory_lock(%s)", (_MIGRATION_LOCK_KEY,))
+    try:
+        done = set(applied_versions(cur))
+        applied = []
+        for version, name, step in MIGRATIONS:
+            if version in done:
+                continue
+            with transaction(cur):
+                if callable(step):
+                    step(cur)
+                else:
+                    cur.execute(step)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name),
+                )
+            applied.append(version)
+        return applied
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (_MIGRATION_LOCK_KEY,))
+
+
+if __name__ == "__main__":
+    versions = migrate()
+    if versions:
+        print(f"✅ Применены миграции: {', '.join(map(str, versions))}")
+    else:
+        print("ℹ️ Схема актуальна")
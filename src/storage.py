@@ -1,50 +1,158 @@
 """Работа с базой данных и MinIO."""
 
 import json
+import threading
 import psycopg2
 import psycopg2.extras
 from minio import Minio
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
 from config.settings import DB_CONFIG, MINIO_CONFIG, MINIO_BUCKET, SHOP_NAME
+from src.db_pool import get_pool, db_cursor, transaction, pool_stats, close_pool
+from src.attributes import save_attributes
+from src.features import save_features
+
+_minio: Optional[Minio] = None
+_minio_lock = threading.Lock()
 
 
 def init_db() -> Tuple[psycopg2.extensions.connection, psycopg2.extras.RealDictCursor]:
-    """Инициализация подключения к базе данных."""
+    """
+    Инициализация отдельного подключения к базе данных.
+
+    Соединение не принадлежит пулу; для коротких операций
+    используйте db_cursor().
+    """
     conn = psycopg2.connect(**DB_CONFIG)
     conn.autocommit = True
     return conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
 
+def get_minio() -> Minio:
+    """Общий для процесса клиент MinIO; bucket проверяется один раз."""
+    global _minio
+    if _minio is None:
+        with _minio_lock:
+            if _minio is None:
+                client = Minio(**MINIO_CONFIG)
+                if not client.bucket_exists(MINIO_BUCKET):
+                    client.make_bucket(MINIO_BUCKET)
+                _minio = client
+    return _minio
+
+
 def init_minio() -> Minio:
     """Инициализация клиента MinIO."""
-    client = Minio(**MINIO_CONFIG)
-    if not client.bucket_exists(MINIO_BUCKET):
-        client.make_bucket(MINIO_BUCKET)
-    return client
+    return get_minio()
 
 
-def save_product(cur: psycopg2.extras.RealDictCursor, p: dict) -> int:
-    """Сохранение продукта в базу данных."""
-    cur.execute("""
+_UPSERT_PRODUCTS_SQL = """
+    WITH incoming (shop, product_url, title, price, description, characteristics) AS (
+        VALUES %s
+    ),
+    previous AS (
+        SELECT p.id, p.price
+        FROM products p
+        JOIN incoming i ON i.product_url = p.product_url
+    ),
+    upserted AS (
         INSERT INTO products (
-            shop, product_url, title, price, description, characteristics
+            shop, product_url, title, price, characteristics
         )
-        VALUES (%s, %s, %s, %s, %s, %s)
+        SELECT shop, product_url, title, price, characteristics
+        FROM incoming
         ON CONFLICT (product_url) DO UPDATE SET
             price = EXCLUDED.price,
-            description = EXCLUDED.description,
             characteristics = EXCLUDED.characteristics
-        RETURNING id;
-    """, (
-        SHOP_NAME,
-        p["url"],
-        p["title"],
-        p["price"],
-        p["description"],
-        json.dumps(p["characteristics"], ensure_ascii=False)
-    ))
-    return cur.fetchone()["id"]
+        RETURNING id, product_url, price, (xmax = 0) AS inserted
+    ),
+    price_changes AS (
+        INSERT INTO price_history (product_id, observed_at, price)
+        SELECT u.id, now(), u.price
+        FROM upserted u
+        LEFT JOIN previous pr ON pr.id = u.id
+        WHERE u.price IS NOT NULL
+          AND pr.price IS DISTINCT FROM u.price
+        ON CONFLICT DO NOTHING
+    ),
+    -- Описания живут в отдельной «холодной» таблице product_texts
+    texts AS (
+        INSERT INTO product_texts (product_id, description)
+        SELECT u.id, i.description
+        FROM upserted u
+        JOIN incoming i ON i.product_url = u.product_url
+        WHERE i.description IS NOT NULL
+        ON CONFLICT (product_id) DO UPDATE SET
+            description = EXCLUDED.description
+    ),
+    removed_texts AS (
+        DELETE FROM product_texts t
+        USING upserted u
+        JOIN incoming i ON i.product_url = u.product_url
+        WHERE t.product_id = u.id
+          AND i.description IS NULL
+    )
+    SELECT id, product_url, inserted FROM upserted;
+"""
+
+
+def save_products_batch(
+    cur: psycopg2.extras.RealDictCursor,
+    products: List[dict],
+    page_size: int = 500,
+) -> Dict[str, dict]:
+    """
+    Пакетное сохранение продуктов одним запросом на страницу.
+
+    Изменения цены определяются в том же запросе сравнением с ценой
+    до upsert (снимок CTE), и только они попадают в price_history.
+    Характеристики раскладываются в product_attributes в той же транзакции.
+
+    Returns:
+        Dict[str, dict]: product_url -> {"id", "inserted"}
+    """
+    # Один URL не может дважды обновляться в одном INSERT ... ON CONFLICT
+    unique = {p["url"]: p for p in products}
+    if not unique:
+        return {}
+
+    rows = [
+        (
+            SHOP_NAME,
+            p["url"],
+            p["title"],
+            p["price"],
+            p["description"],
+            json.dumps(p["characteristics"], ensure_ascii=False),
+        )
+        for p in unique.values()
+    ]
+    with transaction(cur):
+        result = psycopg2.extras.execute_values(
+            cur,
+            _UPSERT_PRODUCTS_SQL,
+            rows,
+            template="(%s, %s, %s, %s::integer, %s, %s::jsonb)",
+            page_size=page_size,
+            fetch=True,
+        )
+        saved = {
+            row["product_url"]: {"id": row["id"], "inserted": row["inserted"]}
+            for row in result
+        }
+        # Нормализованные характеристики для фильтров и подсчета покрытия
+        characteristics_by_id = {
+            saved[url]["id"]: p["characteristics"] for url, p in unique.items()
+        }
+        save_attributes(cur, characteristics_by_id)
+        # Типизированные признаки (вес, проба, металл...)
+        save_features(cur, characteristics_by_id)
+    return saved
+
+
+def save_product(cur: psycopg2.extras.RealDictCursor, p: dict) -> int:
+    """Сохранение продукта в базу данных."""
+    return save_products_batch(cur, [p])[p["url"]]["id"]
 
 
 def save_image(
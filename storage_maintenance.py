@@ -0,0 +1,96 @@
+"""Обслуживание хранилища: очистка товаров и сборка мусора.
+
+Примеры:
+    python storage_maintenance.py reset --shop 585zolotoy --id-from 1000 --id-to 2000
+    python storage_maintenance.py gc --dry-run
+    python storage_maintenance.py features --shop 585zolotoy
+"""
+
+import argparse
+import time
+from datetime import timedelta
+
+from src.maintenance import reset_storage, collect_garbage, DELETE_WORKERS, ORPHAN_GRACE_PERIOD
+from src.features import rebuild_features
+from src.storage import close_pool, db_cursor, transaction
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Обслуживание PostgreSQL и MinIO")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reset = subparsers.add_parser("reset", help="Удаление товаров и их изображений")
+    reset.add_argument("--shop", help="Только товары магазина (префикс объектов <shop>/)")
+    reset.add_argument("--id-from", type=int, help="Минимальный id товара")
+    reset.add_argument("--id-to", type=int, help="Максимальный id товара")
+
+    gc = subparsers.add_parser("gc", help="Удаление «осиротевших» объектов и строк")
+    gc.add_argument("--shop", help="Проверять только объекты магазина")
+    gc.add_argument("--grace-minutes", type=int,
+                    default=int(ORPHAN_GRACE_PERIOD.total_seconds() // 60),
+                    help="Не удалять объекты моложе стольких минут (загрузки идущего парсинга)")
+
+    for sub in (reset, gc):
+        sub.add_argument("--workers", type=int, default=DELETE_WORKERS,
+                         help="Число параллельных потоков удаления")
+        sub.add_argument("--dry-run", action="store_true",
+                         help="Только посчитать, ничего не удалять")
+
+    features = subparsers.add_parser(
+        "features", help="Пересборка типизированных признаков из характеристик"
+    )
+    features.add_argument("--shop", help="Только товары магазина")
+    features.add_argument("--batch-size", type=int, default=5000,
+                          help="Товаров на страницу чтения")
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    started = time.monotonic()
+    mode = " (dry run)" if getattr(args, "dry_run", False) else ""
+
+    try:
+        if args.command == "features":
+            print("🧬 Пересборка признаков товаров...")
+            with db_cursor() as (conn, cur), transaction(cur):
+                total = rebuild_features(cur, batch_size=args.batch_size, shop=args.shop)
+            print(f"✅ Обработано товаров: {total}")
+            print(f"⏱ Время: {time.monotonic() - started:.1f} с")
+            return
+
+        if args.command == "reset":
+            print(f"🗑 Очистка хранилища{mode}...")
+            stats = reset_storage(
+                shop=args.shop,
+                id_from=args.id_from,
+                id_to=args.id_to,
+                workers=args.workers,
+                dry_run=args.dry_run,
+            )
+            print(f"✅ Товаров удалено из PostgreSQL: {stats['products']}")
+            print(f"✅ Объектов удалено из MinIO: {stats['objects']}")
+        else:
+            print(f"🧹 Сборка мусора{mode}...")
+            stats = collect_garbage(
+                shop=args.shop,
+                workers=args.workers,
+                dry_run=args.dry_run,
+                grace_period=timedelta(minutes=args.grace_minutes),
+            )
+            print(f"✅ Совпадений: {stats['matched']}")
+            print(f"✅ Объектов без записи в БД удалено: {stats['orphan_objects']}")
+            print(f"✅ Записей без объекта в MinIO удалено: {stats['orphan_rows']}")
+            if stats["recent"]:
+                print(f"ℹ️ Свежих объектов без записи пропущено: {stats['recent']}")
+
+        if stats["errors"]:
+            print(f"⚠️  Ошибок удаления: {stats['errors']}")
+        print(f"⏱ Время: {time.monotonic() - started:.1f} с")
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
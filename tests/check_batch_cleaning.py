@@ -0,0 +1,161 @@
+"""Проверка: пакетная очистка дает то же, что clean_product по одному товару.
+
+Случайные товары (пробельные и невидимые символы, одиночные суррогаты,
+пустые значения, тексты длиннее лимитов, ключи-синонимы характеристик)
+очищаются clean_products_batch и clean_products_frame, и результат
+сравнивается поэлементно с clean_product, включая счетчики обрезанных
+текстов. Скорость — benchmarks/batch_cleaning.py.
+
+Запуск: python tests/check_batch_cleaning.py
+"""
+
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import pandas as pd
+
+from cleaners.data_cleaner import (
+    MAX_DESCRIPTION_LENGTH,
+    MAX_TITLE_LENGTH,
+    clean_product,
+    clean_products_batch,
+    clean_products_frame,
+    truncation_stats,
+)
+
+FUZZ_RECORDS = 20_000
+
+# Фрагменты, из которых собираются тексты: все виды пробелов, невидимые
+# символы, суррогаты и обычный текст
+_PIECES = [
+    'Золото', '585', 'кольцо', 'Серьги', 'с фианитом', 'Ag 925', 'ё', 'a', '-',
+    ' ', '  ', '\t', '\n', '\r\n', '\x0b', '\x0c', '\x1c', '\x85', '\xa0',
+    '\u2028', '\u3000', '\u200b', '\u200e', '\u202a', '\u2060', '\u206f',
+    '\ufeff', '\ud800', '\udfff', '\U0001f48d',
+]
+_KEYS = [
+    'металл', 'Металл', ' металл ', 'Проба', 'проба\u200b', 'вставка', 'Вес',
+    'вес изделия', '\t', '', 'Размер', 'a', 'ё',
+]
+
+
+def _random_text(rng: random.Random, max_pieces: int) -> Any:
+    roll = rng.random()
+    if roll < 0.05:
+        return None
+    if roll < 0.08:
+        return ''
+    if roll < 0.10:
+        return rng.choice([' ', '\u200b', '\n\t', '\ud800'])
+    return ''.join(rng.choice(_PIECES) for _ in range(rng.randint(1, max_pieces)))
+
+
+def _random_characteristics(rng: random.Random) -> Any:
+    roll = rng.random()
+    if roll < 0.03:
+        return None
+    if roll < 0.05:
+        return 'не словарь'
+    return {
+        rng.choice(_KEYS) + rng.choice(['', '', ' ', '\xa0']): _random_text(rng, 6)
+        for _ in range(rng.randint(0, 6))
+    }
+
+
+def fuzz_products(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Случайные «грязные» товары, в том числе длиннее лимитов очистки."""
+    rng = random.Random(seed)
+    products = []
+    for i in range(count):
+        title = _random_text(rng, 12)
+        description = _random_text(rng, 40)
+        if rng.random() < 0.02:
+            title = 'Кольцо ' * (MAX_TITLE_LENGTH // 7 + rng.randint(-2, 2))
+        if rng.random() < 0.01:
+            description = 'Описание  ' * (MAX_DESCRIPTION_LENGTH // 10 + rng.randint(-2, 2))
+        products.append({
+            'url': f'https://example.com/product/{i}',
+            'title': title,
+            'price': rng.choice([None, -1, 0, rng.randint(1, 500_000)]),
+            'description': description,
+            'characteristics': _random_characteristics(rng),
+            'image_url': rng.choice([None, f'https://example.com/{i}.jpg']),
+        })
+    return products
+
+
+def _truncations_since(before: Dict[str, int]) -> Dict[str, int]:
+    return {field: count - before[field] for field, count in truncation_stats().items()}
+
+
+def _same_price(batch_price: Any, scalar_price: Any) -> bool:
+    if scalar_price is None:
+        return pd.isna(batch_price)
+    return batch_price == scalar_price
+
+
+def check_equivalence(products: List[Dict[str, Any]]) -> List[str]:
+    """Расхождения clean_products_batch и clean_products_frame с clean_product."""
+    errors = []
+
+    before = truncation_stats()
+    expected = [clean_product(product) for product in products]
+    scalar_truncations = _truncations_since(before)
+
+    before = truncation_stats()
+    batch = clean_products_batch(products)
+    batch_truncations = _truncations_since(before)
+
+    if batch_truncations != scalar_truncations:
+        errors.append(f"обрезано: пачкой {batch_truncations}, по одному {scalar_truncations}")
+    for i, (got, want) in enumerate(zip(batch, expected)):
+        if got != want:
+            errors.append(f"clean_products_batch, товар {i}: {got!r} != {want!r}")
+
+    # Во фрейме характеристики — словари или JSON-строки (jsonb из БД);
+    # не-словари clean_product превращает в {}, во фрейме они — пропуски
+    characteristics = [p['characteristics'] for p in products]
+    frame = pd.DataFrame({
+        'title': pd.Series([p['title'] for p in products], dtype=object),
+        'price': [p['price'] for p in products],
+        'description': pd.Series([p['description'] for p in products], dtype=object),
+        'characteristics': [
+            (json.dumps(value, ensure_ascii=False) if i % 2 else value)
+            if isinstance(value, dict) else None
+            for i, value in enumerate(characteristics)
+        ],
+    })
+    cleaned = clean_products_frame(frame)
+    for i, want in enumerate(expected):
+        row = cleaned.iloc[i]
+        if (
+            row['title'] != want['title']
+            or row['description'] != want['description']
+            or row['characteristics'] != want['characteristics']
+            or not _same_price(row['price'], want['price'])
+        ):
+            errors.append(f"clean_products_frame, товар {i}: {row.to_dict()!r} != {want!r}")
+    return errors
+
+
+def main() -> int:
+    errors = check_equivalence(fuzz_products(FUZZ_RECORDS))
+    if errors:
+        print(f"❌ Пакетная очистка расходится с clean_product ({len(errors)}):")
+        for error in errors[:20]:
+            print(f"   {error}")
+        return 1
+    print(f"✅ Пакетная очистка совпадает с clean_product ({FUZZ_RECORDS} случайных товаров)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
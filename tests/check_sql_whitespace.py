@@ -0,0 +1,76 @@
+"""Проверка: btrim с _WHITESPACE в Postgres убирает то же, что str.strip().
+
+Строка E'...' разбирается по правилам escape-строк Postgres (неизвестный
+escape — сам символ: \\v — это буква v), и результат сравнивается с
+набором пробельных символов Python и с str.strip() на примерах.
+
+Запуск: python tests/check_sql_whitespace.py
+"""
+
+import re
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from quality.sql_backend import _WHITESPACE
+
+# Escape-коды строк E'...' в Postgres
+_SIMPLE_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_ESCAPE_RE = re.compile(
+    r"\\(u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)", re.DOTALL
+)
+
+
+def decode_postgres_escape_string(literal: str) -> str:
+    """Значение литерала E'...' так, как его прочитает Postgres."""
+    if not (literal.startswith("E'") and literal.endswith("'")):
+        raise ValueError(f"Не escape-строка Postgres: {literal!r}")
+
+    def replace(match: re.Match) -> str:
+        code = match.group(1)
+        if code[0] in 'uU':
+            return chr(int(code[1:], 16))
+        if code[0] == 'x' and len(code) > 1:
+            return chr(int(code[1:], 16))
+        if code[0] in '01234567':
+            return chr(int(code, 8))
+        return _SIMPLE_ESCAPES.get(code, code)
+
+    return _ESCAPE_RE.sub(replace, literal[2:-1])
+
+
+def btrim(text: str, characters: str) -> str:
+    """btrim(text, characters) Postgres."""
+    return text.strip(characters)
+
+
+def main() -> int:
+    characters = decode_postgres_escape_string(_WHITESPACE)
+    expected = {chr(code) for code in range(sys.maxunicode + 1) if chr(code).isspace()}
+    errors = []
+
+    if set(characters) != expected:
+        missing = sorted(expected - set(characters))
+        extra = sorted(set(characters) - expected)
+        errors.append(f"лишние: {extra!r}, не хватает: {missing!r}")
+
+    samples = ['v', 'Love', ' \x0b\tзолото 　', ' ', 'vvv', '\x1c585\x85', '']
+    for sample in samples:
+        if btrim(sample, characters) != sample.strip():
+            errors.append(f"{sample!r}: btrim -> {btrim(sample, characters)!r}, strip -> {sample.strip()!r}")
+
+    if errors:
+        print("❌ _WHITESPACE не совпадает с str.strip():")
+        for error in errors:
+            print(f"   {error}")
+        return 1
+    print(f"✅ _WHITESPACE совпадает с str.strip() ({len(characters)} символов)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,9 @@
 """Валидация данных продуктов."""
 
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Set, Tuple
+
+import numpy as np
+import pandas as pd
 
 
 class ValidationError(Exception):
@@ -9,6 +12,24 @@ class ValidationError(Exception):
     pass
 
 
+# Коды ошибок: биты маски, которую возвращает validate_products_frame
+ERR_URL = 1
+ERR_TITLE = 2
+ERR_PRICE = 4
+ERR_DESCRIPTION = 8
+ERR_IMAGE_URL = 16
+ERR_CHARACTERISTICS = 32
+
+VALIDATION_ERRORS = {
+    ERR_URL: "Неверный или отсутствующий URL товара",
+    ERR_TITLE: "Неверное или отсутствующее название товара",
+    ERR_PRICE: "Неверная или отсутствующая цена",
+    ERR_DESCRIPTION: "Описание слишком длинное",
+    ERR_IMAGE_URL: "Неверный URL изображения",
+    ERR_CHARACTERISTICS: "Неверные характеристики товара",
+}
+
+
 def validate_url(url: Optional[str]) -> bool:
     """Валидация URL."""
     if not url:
@@ -69,22 +90,22 @@ def validate_product(product: Dict) -> Tuple[bool, List[str]]:
     errors = []
     
     if not validate_url(product.get("url")):
-        errors.append("Неверный или отсутствующий URL товара")
+        errors.append(VALIDATION_ERRORS[ERR_URL])
     
     if not validate_title(product.get("title")):
-        errors.append("Неверное или отсутствующее название товара")
+        errors.append(VALIDATION_ERRORS[ERR_TITLE])
     
     if not validate_price(product.get("price")):
-        errors.append("Неверная или отсутствующая цена")
+        errors.append(VALIDATION_ERRORS[ERR_PRICE])
     
     if not validate_description(product.get("description")):
-        errors.append("Описание слишком длинное")
+        errors.append(VALIDATION_ERRORS[ERR_DESCRIPTION])
     
     if not validate_image_url(product.get("image_url")):
-        errors.append("Неверный URL изображения")
+        errors.append(VALIDATION_ERRORS[ERR_IMAGE_URL])
     
     if not validate_characteristics(product.get("characteristics", {})):
-        errors.append("Неверные характеристики товара")
+        errors.append(VALIDATION_ERRORS[ERR_CHARACTERISTICS])
     
     return len(errors) == 0, errors
 
@@ -100,3 +121,111 @@ def validate_product_strict(product: Dict) -> None:
     if not is_valid:
         raise ValidationError(f"Ошибки валидации: {', '.join(errors)}")
 
+
+
+def _invalid_url_mask(urls: pd.Series) -> np.ndarray:
+    """Маска строк, не проходящих validate_url (нестроковые значения — ошибка)."""
+    is_str = urls.map(type).eq(str).to_numpy()
+    valid = urls.where(is_str, "").astype(str).str.startswith(("http://", "https://"))
+    return ~valid.to_numpy(dtype=bool)
+
+
+def _stripped_length(texts: pd.Series) -> pd.Series:
+    return texts.astype(str).str.strip().str.len()
+
+
+def _invalid_characteristics_mask(characteristics: pd.Series) -> np.ndarray:
+    """Маска строк, не проходящих validate_characteristics."""
+    # Ключи и значения сильно повторяются: каждая строка проверяется один раз
+    valid_strings: Set[str] = set()
+
+    def is_invalid(value: object) -> bool:
+        if not isinstance(value, dict):
+            return True
+        for pair in value.items():
+            for text in pair:
+                # Нестроковые значения validate_characteristics не принимает
+                if type(text) is not str:
+                    return True
+                if text not in valid_strings:
+                    if not text.strip():
+                        return True
+                    valid_strings.add(text)
+        return False
+
+    return np.fromiter(
+        (is_invalid(value) for value in characteristics.to_numpy(dtype=object)),
+        dtype=bool,
+        count=len(characteristics),
+    )
+
+
+def validate_products_frame(df: pd.DataFrame) -> pd.Series:
+    """
+    Колоночная валидация товаров по тем же правилам, что validate_product.
+
+    URL берется из колонки url или product_url; отсутствующие колонки
+    description, image_url и characteristics считаются пустыми
+    (как необязательные поля словаря).
+
+    Returns:
+        pd.Series: битовая маска ошибок (uint8, коды ERR_*) с индексом df
+    """
+    n = len(df)
+    mask = np.zeros(n, dtype=np.uint8)
+
+    url_col = "url" if "url" in df.columns else "product_url"
+    if url_col in df.columns:
+        mask[_invalid_url_mask(df[url_col])] |= ERR_URL
+    else:
+        mask |= ERR_URL
+
+    if "title" in df.columns:
+        titles = df["title"]
+        is_str = titles.map(type).eq(str).to_numpy()
+        length = _stripped_length(titles.where(is_str, "")).to_numpy()
+        valid = is_str & (length >= 3) & (length <= 500)
+        mask[~valid] |= ERR_TITLE
+    else:
+        mask |= ERR_TITLE
+
+    if "price" in df.columns:
+        prices = pd.to_numeric(df["price"], errors="coerce").to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            valid = (prices > 0) & (prices < 10_000_000)
+        mask[~valid] |= ERR_PRICE
+    else:
+        mask |= ERR_PRICE
+
+    if "description" in df.columns:
+        descriptions = df["description"]
+        present = descriptions.notna().to_numpy()
+        length = _stripped_length(descriptions.where(present, "")).to_numpy()
+        mask[present & (length > 10000)] |= ERR_DESCRIPTION
+
+    if "image_url" in df.columns:
+        images = df["image_url"]
+        present = images.notna().to_numpy()
+        mask[present & _invalid_url_mask(images)] |= ERR_IMAGE_URL
+
+    if "characteristics" in df.columns:
+        mask[_invalid_characteristics_mask(df["characteristics"])] |= ERR_CHARACTERISTICS
+
+    return pd.Series(mask, index=df.index, name="validation_errors")
+
+
+def summarize_validation(mask: pd.Series) -> Dict[str, int]:
+    """Количество строк с каждой ошибкой и итог по маске validate_products_frame."""
+    values = mask.to_numpy(dtype=np.uint8)
+    summary = {
+        "total": len(values),
+        "invalid": int(np.count_nonzero(values)),
+    }
+    for code, message in VALIDATION_ERRORS.items():
+        summary[message] = int(np.count_nonzero(values & code))
+    return summary
+
+
+def decode_errors(code: int) -> List[str]:
+    """Расшифровка битовой маски в список сообщений об ошибках."""
+    return [message for bit, message in VALIDATION_ERRORS.items() if code & bit]
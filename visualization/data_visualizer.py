@@ -16,7 +16,8 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from typing import Optional, Dict, Any
 
-from preprocessing.data_preprocessor import load_data_from_db, preprocess_product_data
+from preprocessing.data_preprocessor import preprocess_product_data
+from preprocessing.snapshot import load_products
 
 # Настройка стиля графиков
 try:
@@ -146,7 +147,7 @@ def plot_characteristics_heatmap(df: pd.DataFrame, save_path: Optional[str] = No
 def create_visualizations(df: Optional[pd.DataFrame] = None, output_dir: Optional[str] = None) -> Dict[str, str]:
     """Создание всех визуализаций."""
     if df is None:
-        df = load_data_from_db()
+        df = load_products()
         df = preprocess_product_data(df)
     
     if output_dir is None: